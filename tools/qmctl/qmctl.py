@@ -18,35 +18,258 @@
 This module provides the QmController class for interacting with the 'qm'
 container managed by podman. It allows for executing commands, copying
 files, and inspecting various aspects of the container's state.
+
+Startup cost matters because qmctl is invoked from scripts and monitoring
+agents many times a minute. Only modules needed by every invocation (or
+already loaded by subprocess) are imported here; everything else is
+imported inside the function that needs it.
 """
 
+from __future__ import annotations
+
 import argparse
+import codecs
+import contextlib
 import errno
-import importlib.util
+import io
 import json
 import os
-import pty
-import shutil
+import selectors
+import signal
+import stat
+import struct
 import subprocess  # nosec B404
 import sys
+import threading
+import time
 
-from collections import defaultdict
-from typing import Any, Callable, Generator, Optional, Union
+from collections import defaultdict, deque
+from typing import IO, TYPE_CHECKING, Any, Callable, Generator, Iterable, Optional, Union
+
+if TYPE_CHECKING:
+    import http.client
+    import http.server
+    import socket
+    import tarfile
 
 
 # Constants - Default configuration values
 DEFAULT_CONFIG_PATH = "/usr/share/containers/systemd/qm.container"  # Default path to container config file
+QUADLET_UNIT_DIRS = ("/etc/containers/systemd", "/run/containers/systemd", "/usr/share/containers/systemd")  # Quadlet search path, highest priority first
+QUADLET_UNIT_DIRS_ENV = "QUADLET_UNIT_DIRS"  # Colon-separated override of the quadlet search path
+DROPIN_SUFFIX = ".conf"  # Suffix of quadlet drop-in files
 DEFAULT_CONTAINER_NAME = "qm"  # Default container name to operate on
 DEFAULT_JSON_INDENT = 4  # Number of spaces for JSON pretty-printing
+OUTPUT_FORMATS = ("json", "compact", "ndjson")  # --output: indented JSON, one-line JSON, one record per line
 BUFFER_SIZE = 1024  # Buffer size for reading output streams
+SHOW_ALL_WORKERS = 4  # Worker pool size for gathering `show all` topics
+EXECIN_FANOUT_WORKERS = 4  # Default number of nested containers `execin --all/--match` runs at once
+RESOURCES_INTERVAL = 1.0  # Default seconds between `show resources` samples
+LATENCY_HISTORY = 256  # Subprocess latencies kept per controller, bounded for long-running modes
+RESOURCES_SNAPSHOT_INTERVAL = 0.5  # Seconds measured for the resources topic of `show all`
+
+# cgroup v2 - qm.service is a top-level cgroup (Slice=-.slice in qm.container)
+CGROUP_ROOT = "/sys/fs/cgroup"  # Mount point of the unified cgroup hierarchy
+QM_CGROUP = "qm.service"  # cgroup of the QM container, relative to CGROUP_ROOT
+NESTED_SCOPE_PREFIX = "libpod-"  # Nested containers run in libpod-<64 hex id>[.scope] below QM_CGROUP
+# QM's own processes with Quadlet's --cgroups=split; conmon and podman stay in QM_CGROUP itself, in host namespaces
+QM_PAYLOAD_PREFIX = "libpod-payload-"
+PSI_RESOURCES = ("cpu", "memory", "io")  # Pressure stall information files: <resource>.pressure
+PSI_WINDOW_MS = (500, 10000)  # Trigger window range accepted by the kernel, in milliseconds
+# `qmctl pressure --watch` triggers when no --threshold is given: RESOURCE[:some|full]=STALL_MS/WINDOW_MS
+# Windows are multiples of 2s, the only ones the kernel accepts without CAP_SYS_RESOURCE.
+PSI_DEFAULT_THRESHOLDS = ("cpu=1000/2000", "memory=200/2000", "io=200/2000")
+# `show resources --per-container --sort` keys -> value ranked in descending order
+RESOURCES_SORT_KEYS: dict[str, Callable[[dict], Any]] = {
+    "cpu": lambda sample: sample["cpu_percent"] or 0,
+    "memory": lambda sample: sample["memory_current"] or 0,
+    "io": lambda sample: (sample["io_read_bytes_per_s"] or 0) + (sample["io_write_bytes_per_s"] or 0),
+}
+
+# `show --watch` - inotify(7) event masks
+IN_MODIFY = 0x2  # File was modified; cgroup v2 raises it on *.events changes
+IN_ATTRIB = 0x4  # Metadata changed
+IN_CLOSE_WRITE = 0x8  # File opened for writing was closed
+IN_MOVED_FROM = 0x40  # File moved out of a watched directory
+IN_MOVED_TO = 0x80  # File moved into a watched directory
+IN_CREATE = 0x100  # File or directory created in a watched directory
+IN_DELETE = 0x200  # File or directory deleted from a watched directory
+IN_DELETE_SELF = 0x400  # Watched file or directory was deleted
+IN_MOVE_SELF = 0x800  # Watched file or directory was moved
+IN_ONLYDIR = 0x1000000  # Only watch the path if it is a directory
+IN_IGNORED = 0x8000  # Watch was removed
+WATCH_FILE_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF
+WATCH_DIR_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+WATCH_CGROUP_EVENT_FILES = ("cgroup.events", "memory.events")  # Files the kernel modifies on cgroup state changes
+WATCH_SETTLE = 0.05  # Seconds to coalesce a burst of events, e.g. an editor saving a file
+WATCH_INTERVAL = 5.0  # Default seconds between re-checks of topics read from /proc, which has no inotify events
+WATCH_POLLED_TOPICS = frozenset({"unix-domain-sockets", "shared-memory", "namespaces", "all"})
+
+# `qmctl metrics` - OpenMetrics exposition of qm.service and its nested containers
+METRICS_PREFIX = "qm"  # Prefix of every exported metric name
+METRICS_LISTEN = "127.0.0.1:9883"  # Default address of `metrics --listen`
+METRICS_READ_SIZE = 65536  # Bytes read from each cgroup file per scrape
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"  # Read by node_exporter's textfile collector
+DEVICE_STATUSES = ("available", "missing", "not-permitted", "mismatch")  # Device states reported by available-devices
+# Metric family (without prefix) -> (type, unit, help); counters get a _total suffix on their samples
+METRIC_FAMILIES: dict[str, tuple[str, str, str]] = {
+    "up": ("gauge", "", "Whether the qm.service cgroup exists."),
+    "nested_containers": ("gauge", "", "Number of nested containers running below qm.service."),
+    "devices_configured": ("gauge", "", "Number of AddDevice entries in the container config and its drop-ins."),
+    "devices": ("gauge", "", "Configured devices by availability inside QM."),
+    "cpu_usage_seconds": ("counter", "seconds", "CPU time consumed (cpu.stat usage_usec)."),
+    "cpu_user_seconds": ("counter", "seconds", "CPU time consumed in user mode (cpu.stat user_usec)."),
+    "cpu_system_seconds": ("counter", "seconds", "CPU time consumed in kernel mode (cpu.stat system_usec)."),
+    "cpu_throttled_seconds": ("counter", "seconds", "Time throttled by the CPU bandwidth limit (cpu.stat throttled_usec)."),
+    "memory_bytes": ("gauge", "bytes", "Memory charged to the cgroup (memory.current)."),
+    "memory_anon_bytes": ("gauge", "bytes", "Anonymous memory (memory.stat anon)."),
+    "memory_file_bytes": ("gauge", "bytes", "Page cache memory (memory.stat file)."),
+    "memory_major_page_faults": ("counter", "", "Major page faults (memory.stat pgmajfault)."),
+    "memory_oom_events": ("counter", "", "Times the memory limit was reached and the OOM killer invoked (memory.events oom)."),
+    "memory_oom_kills": ("counter", "", "Processes killed by the OOM killer (memory.events oom_kill)."),
+    "io_read_bytes": ("counter", "bytes", "Bytes read from block devices (io.stat rbytes)."),
+    "io_write_bytes": ("counter", "bytes", "Bytes written to block devices (io.stat wbytes)."),
+    "io_reads": ("counter", "", "Read operations on block devices (io.stat rios)."),
+    "io_writes": ("counter", "", "Write operations on block devices (io.stat wios)."),
+    "pressure_stalled_seconds": ("counter", "seconds", "Time tasks were stalled on a resource (<resource>.pressure total)."),
+}
 
 # Command patterns - String patterns used for parsing configuration files
-ADD_DEVICE_PREFIX = "AddDevice="  # Prefix for device declarations in config files
-COMMENT_PREFIX = "#"  # Comment prefix in configuration files
+ADD_DEVICE_KEY = "AddDevice"  # Key of device declarations in config files
+ADD_DEVICE_PREFIX = f"{ADD_DEVICE_KEY}="  # Prefix for device declarations in config files
+COMMENT_PREFIXES = ("#", ";")  # Comment prefixes accepted by systemd unit files
+MULTI_VALUE_KEYS = frozenset({  # Keys that accumulate values instead of overriding
+    # [Container], [Pod], [Volume], ... of quadlet units
+    "AddCapability", "AddDevice", "AddHost", "Annotation", "DNS", "DNSOption", "DNSSearch", "DropCapability",
+    "Environment", "EnvironmentFile", "ExposeHostPort", "GIDMap", "GlobalArgs", "Label", "Mask", "Mount",
+    "Network", "PodmanArgs", "PublishPort", "Secret", "Sysctl", "Tmpfs", "UIDMap", "Ulimit", "Unmask", "Volume",
+    # [Unit], [Service] and [Install] of systemd units
+    "After", "Before", "BindsTo", "Conflicts", "ExecStartPost", "ExecStartPre", "ExecStopPost", "PartOf",
+    "RequiredBy", "Requires", "Wants", "WantedBy",
+})
 
 # Container commands - Base podman command arrays for container operations
 PODMAN_EXEC = ["podman", "exec"]  # Base command for executing in containers
 PODMAN_CP = ["podman", "cp"]  # Base command for copying files to/from containers
+PODMAN_INSPECT = ["podman", "container", "inspect"]  # Base command for inspecting containers
+
+# Device probe - shell loop that checks every declared device in a single exec.
+# Prints one tab-separated record per device: path, exists, type, readable, major:minor (hex).
+DEVICE_PROBE_SCRIPT = r"""
+for d do
+    if [ -e "$d" ]; then
+        if [ -c "$d" ]; then t=char; elif [ -b "$d" ]; then t=block; elif [ -d "$d" ]; then t=directory; else t=other; fi
+        if [ -r "$d" ]; then r=1; else r=0; fi
+        mm=$(stat -L -c '%t:%T' "$d" 2>/dev/null)
+        printf '%s\t1\t%s\t%s\t%s\n' "$d" "$t" "$r" "$mm"
+    else
+        printf '%s\t0\t\t0\t\n' "$d"
+    fi
+done
+"""
+
+# Podman REST API - libpod service socket used instead of forking the CLI
+PODMAN_SOCKET_PATH = "/run/podman/podman.sock"  # Rootful podman.socket endpoint
+PODMAN_API_VERSION = "v4.0.0"  # libpod API version prefix for request paths
+TRANSPORT_ENV = "QMCTL_TRANSPORT"  # Environment override for the transport mode
+TRANSPORT_MODES = ("auto", "api", "cli")  # Supported transport selections
+STREAM_HEADER_SIZE = 8  # Size of a multiplexed exec stream frame header
+COPY_CHUNK_SIZE = 64 * 1024  # Chunk size used when streaming archives
+
+# Container state cache - remembers container ID and init PID between invocations
+CACHE_DIR_ENV = "QMCTL_CACHE_DIR"  # Environment override for the cache directory
+SYSTEM_CACHE_DIR = "/run/qmctl"  # Cache directory for root (tmpfs, cleared on boot)
+PROC_STAT_STARTTIME_FIELD = 21  # 0-based index of starttime in /proc/<pid>/stat
+NSENTER_NAMESPACES = {  # /proc/<pid>/ns entry -> nsenter option, entered by execin's single hop
+    "user": "--user",
+    "mnt": "--mount",
+    "uts": "--uts",
+    "ipc": "--ipc",
+    "net": "--net",
+    "pid": "--pid",
+    "cgroup": "--cgroup",
+}
+NESTED_ENV_BINARIES = ("/usr/bin/env", "/bin/env")  # Used to apply the nested container's environment
+
+# Host-side introspection - show topics read /proc of the QM processes instead of exec'ing ss/ipcs/lsns
+NAMESPACE_TYPES = ("cgroup", "ipc", "mnt", "net", "pid", "time", "user", "uts")  # /proc/<pid>/ns entries
+CLONE_NEWIPC = 0x08000000  # setns(2) namespace type for reading /proc/sysvipc of another IPC namespace
+SYSVIPC_KINDS = ("shm", "msg", "sem")  # /proc/sysvipc files
+UNIX_SOCKET_TYPES = {1: "stream", 2: "dgram", 5: "seqpacket"}  # /proc/net/unix Type column
+UNIX_SOCKET_STATES = {1: "unconnected", 2: "connecting", 3: "connected", 4: "disconnecting"}  # St column
+UNIX_SOCKET_LISTENING = 0x10000  # __SO_ACCEPTCON in the Flags column
+MAX_SYMLINKS = 40  # Symlinks followed when resolving a path inside a container root, like the kernel
+DEVICE_ACCESS = "rwm"  # Device cgroup permissions: read, write, mknod
+
+# Resident server - `qmctl serve` keeps a warm controller behind a unix socket
+SERVER_SOCKET_ENV = "QMCTL_SERVER_SOCKET"  # Environment override for the server socket
+SERVER_SOCKET_NAME = "qmctl.sock"  # Socket file name inside the cache directory
+NO_SERVER_ENV = "QMCTL_NO_SERVER"  # Set to run locally even if a server is up
+SERVER_MAX_REQUEST = 1024 * 1024  # Upper bound for a forwarded request line
+SERVER_REQUEST_TIMEOUT = 2.0  # Seconds a client has to send its request line
+FRAME_STDOUT, FRAME_STDERR, FRAME_EXIT = 1, 2, 3  # Server response frame types
+LOCAL_OPTIONS = {  # Options that keep a subcommand running until interrupted, so it is never forwarded
+    "exec": ("--stream",),
+    "execin": ("--stream",),
+    "metrics": ("--listen", "--interval"),
+    "pressure": ("--watch",),
+    "show": ("--watch",),
+}
+
+# Streamed copy - `qmctl cp --stream` pipes one tar archive through a single `podman exec -i`
+COPY_COMPRESSION = {  # name -> (compress argv, decompress argv), run on both ends of the pipe
+    "none": (["cat"], ["cat"]),
+    "zstd": (["zstd", "-q", "-c"], ["zstd", "-q", "-d", "-c"]),
+    "lz4": (["lz4", "-q", "-c"], ["lz4", "-q", "-d", "-c"]),
+}
+COPY_PROGRESS_INTERVAL = 0.5  # Seconds between progress reports
+# Unpacks the archive on stdin (after "$3..." decompresses it) to "$1". If "$1" is not a
+# directory and "$2" names the single top-level entry, that entry is renamed to "$1", like cp.
+STREAM_UNPACK_SCRIPT = r"""set -e
+dst=$1 name=$2
+shift 2
+if [ -d "$dst" ] || [ -z "$name" ]; then
+    mkdir -p -- "$dst"
+    "$@" | tar -xf - -C "$dst"
+else
+    dir=$(dirname -- "$dst")
+    mkdir -p -- "$dir"
+    tmp=$(mktemp -d "$dir/.qmctl-cp.XXXXXX")
+    trap 'rm -rf -- "$tmp"' EXIT
+    "$@" | tar -xf - -C "$tmp"
+    rm -rf -- "$dst"
+    mv -f -- "$tmp/$name" "$dst"
+fi
+"""
+# Incremental sync - `qmctl sync` compares content-hash manifests and ships only the difference
+SYNC_HASH_CHUNK_SIZE = 1024 * 1024  # Read size when hashing files for a manifest
+SYNC_DELETE_BATCH = 512  # Paths removed per exec when deleting extraneous files
+# Prints "<sha256>  ./<path>" for every regular file below "$1"; nothing if "$1" is missing.
+SYNC_MANIFEST_SCRIPT = r"""[ -d "$1" ] || exit 0
+cd "$1" && find . -type f -exec sha256sum -- {} +
+"""
+# Removes the paths "$2..." relative to the directory "$1".
+SYNC_DELETE_SCRIPT = r"""cd "$1" && shift && rm -f -- "$@"
+"""
+# Archives the paths "$2..." (as their base names) to stdout through the compressor
+# command line in "$1". Missing paths are skipped; the reader notices their absence.
+# POSIX sh has no pipefail, so tar's exit status is passed out on fd 4.
+STREAM_PACK_SCRIPT = r"""set -e
+compress=$1
+shift
+n=$#
+while [ "$n" -gt 0 ]; do
+    if [ -e "$1" ] || [ -L "$1" ]; then
+        set -- "$@" -C "$(cd -- "$(dirname -- "$1")" && pwd)" "$(basename -- "$1")"
+    fi
+    shift
+    n=$((n - 1))
+done
+exec 3>&1
+status=$({ { tar -cf - -T /dev/null "$@" || echo $? >&4; } | $compress >&3; } 4>&1)
+[ -z "$status" ] || exit "$status"
+"""
 
 
 class QmError(Exception):
@@ -61,6 +284,7 @@ class QmError(Exception):
     EXIT_CODE_FILE_NOT_FOUND = errno.ENOENT  # 2
     EXIT_CODE_INVALID_ARGUMENT = errno.EINVAL  # 22
     EXIT_CODE_TEST_CUSTOM = 42 # Custom exit code for testing
+    EXIT_CODE_TIMEOUT = 124  # Same as timeout(1)
     EXIT_COMMAND_NOT_FOUND = 127
 
     def __init__(self, message: str, exit_code: int = 1) -> None:
@@ -155,6 +379,55 @@ class ValidationError(QmError):
         )
 
 
+class CommandTimeoutError(QmError):
+    """Raised when a command does not finish before its deadline.
+
+    The command's whole process group has been killed by the time this is
+    raised. It exits with the same code as timeout(1), so scripts can tell
+    a hung QM partition from a failing command.
+    """
+
+    def __init__(self, command: list[str], timeout: float) -> None:
+        """Initialize CommandTimeoutError with command and deadline.
+
+        Args:
+            command: The command that timed out
+            timeout: The deadline in seconds
+        """
+        super().__init__(
+            f"Command '{' '.join(command)}' timed out after {timeout:g}s.",
+            QmError.EXIT_CODE_TIMEOUT
+        )
+
+
+def as_qm_error(error: Exception) -> QmError:
+    """Return a QmError for an exception caught by a public method.
+
+    Timeouts keep their own exit code; anything else becomes a general
+    QmError carrying the original message.
+    """
+    return error if isinstance(error, CommandTimeoutError) else QmError(str(error))
+
+
+class PodmanApiError(QmError):
+    """Raised when the podman REST API returns an error.
+
+    This exception wraps failures reported by the libpod service, such as
+    unexpected HTTP status codes or an unreachable API socket. The error
+    message returned by podman is preserved when it is available.
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        """Initialize PodmanApiError with message and HTTP status.
+
+        Args:
+            message: Description of the API failure
+            status: HTTP status code returned by the service, if any
+        """
+        super().__init__(message)
+        self.status = status
+
+
 class OutputConfig:
     """Configuration for output formatting.
 
@@ -163,260 +436,2602 @@ class OutputConfig:
     and machine-readable JSON output with optional pretty-printing.
     """
 
-    def __init__(self, output_json: bool = False, pretty: bool = True) -> None:
+    def __init__(self, output_json: bool = False, pretty: bool = True, ndjson: bool = False) -> None:
         """Initialize OutputConfig with JSON and pretty print settings.
 
         Args:
             output_json: Enable JSON output format instead of plain text
             pretty: Enable pretty-printing for JSON output (indentation and formatting)
+            ndjson: Split JSON documents into one compact record per line
         """
         self.output_json = output_json  # Controls output format (JSON vs text)
         self.pretty = pretty  # Controls JSON formatting (pretty vs compact)
+        self.ndjson = ndjson  # Controls JSON framing (one document vs one record per line)
 
 
-class QmController:
-    """Manage and interact with the qm container.
+_optional_modules: dict[str, Any] = {}  # Optional dependencies by name, None if not installed
 
-    This is the main class for interacting with containerized environments
-    managed by podman. It provides methods for executing commands, copying
-    files, inspecting container state, and displaying various types of
-    information about the container and its contents.
 
-    The class follows a centralized error handling pattern where all public
-    methods catch exceptions and call _print_error_and_exit() for consistent
-    error reporting and proper exit codes.
+def _optional_module(name: str) -> Any:
+    """Import an optional dependency on first use; None if it is not installed."""
+    if name not in _optional_modules:
+        import importlib
+
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+
+def json_dumps(data: Any, indent: Optional[int] = None) -> str:
+    """Serialize data as JSON.
+
+    Compact output uses orjson when it is installed, which is several
+    times faster on large documents, and the json module otherwise.
+
+    Args:
+        data: JSON-serializable value
+        indent: Spaces per indentation level, None for a single line
     """
+    if indent is not None:
+        return json.dumps(data, indent=indent)
+    orjson = _optional_module("orjson")
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:  # e.g. integers beyond 64 bits, which json handles
+            pass
+    return json.dumps(data, separators=(",", ":"))
 
-    @staticmethod
-    def find_executable(binary_name: str) -> str:
-        """Find a binary in the system PATH.
 
-        Args:
-            binary_name (str): Name of the executable to find.
+def ndjson_records(data: Any, path: str = "") -> Generator[dict, None, None]:
+    """Split a JSON document into records for NDJSON output.
 
-        Returns:
-            str: Full path to the executable.
+    A list of objects yields one record per object, and an object holding
+    objects or lists of objects is split per key, recursively. The other
+    values of an object form one record of their own. Each record is
+    tagged with the slash-separated keys leading to it as "record".
 
-        Raises:
-            FileNotFoundError: If the binary cannot be found.
-        """
-        path = shutil.which(binary_name)
-        if path is None or not os.access(path, os.X_OK):
-            raise FileNotFoundError(f"Executable '{binary_name}' not found in PATH")
-        return path
+    Args:
+        data: JSON-serializable document
+        path: Keys leading to data, "" for the document root
+    """
+    def is_table(value: Any) -> bool:
+        return isinstance(value, list) and bool(value) and all(isinstance(item, dict) for item in value)
+
+    tag = {"record": path} if path else {}
+    if is_table(data):
+        for item in data:
+            yield {**tag, **item}
+        return
+    if not isinstance(data, dict):
+        yield {**tag, "value": data}
+        return
+
+    scalars, nested = {}, []
+    for key, value in data.items():
+        if (isinstance(value, dict) and value) or is_table(value):
+            nested.append((key, value))
+        else:
+            scalars[key] = value
+    if scalars or not nested:
+        yield {**tag, **scalars}
+    for key, value in nested:
+        yield from ndjson_records(value, f"{path}/{key}" if path else str(key))
 
-    def __init__(
-        self,
-        config_path: str = DEFAULT_CONFIG_PATH,
-        verbose: bool = False,
-        container_name: str = DEFAULT_CONTAINER_NAME,
-    ) -> None:
-        """Initialize the QmController class.
 
-        Args:
-            config_path: Path to the container configuration file
-            verbose: Enable verbose logging to stderr for debugging
-            container_name: Name of the container to interact with
-        """
-        self.config_path: str = config_path  # Path to container config file
-        self.container: str = container_name  # Target container name
-        self.verbose: bool = verbose  # Verbose logging flag
-        self.output_config: OutputConfig = OutputConfig()  # Output formatting configuration
+def split_container_path(path: str) -> tuple[Optional[str], str]:
+    """Split a `container:path` copy argument into its components.
 
-    def _log_path(self, action: str, path: str) -> None:
-        """Log the action being performed on a path if verbose is enabled.
+    Args:
+        path: Copy argument, either a host path or `container:/path`
 
-        Args:
-            action: Description of the action being performed (e.g., "Reading", "Writing")
-            path: File system path being acted upon
-        """
-        if self.verbose:
-            print(f"[verbose] {action}: {path}", file=sys.stderr)
+    Returns:
+        Tuple of (container_name or None, path)
+    """
+    if ":" in path and not path.startswith(("/", ".")):
+        container, _, inner = path.partition(":")
+        return container, inner
+    return None, path
 
-    def _run_subprocess(self, cmd: list[str], **kwargs: Any) -> subprocess.CompletedProcess:
-        """Safely run a subprocess command.
 
-        Args:
-            cmd (List[str]): Command to run (must be a list of args, not a string).
-            **kwargs: Additional arguments to pass to subprocess.run.
+def _quote(value: str) -> str:
+    """Percent-encode a value for use as a single URL path segment."""
+    import urllib.parse
 
-        Returns:
-            subprocess.CompletedProcess: The completed process result.
+    return urllib.parse.quote(value, safe="")
 
-        Raises:
-            TypeError: If cmd is not a list.
-            ValueError: If shell=True is passed in kwargs.
-        """
-        if not isinstance(cmd, list):
-            raise TypeError("Command must be a list, not a string")
-        if not all(isinstance(c, str) for c in cmd):
-            raise TypeError("All command arguments must be strings")
-        if kwargs.get("shell", False):
-            raise ValueError("shell=True is forbidden for security reasons")
 
-        defaults = {
-            "capture_output": True,
-            "text": True,
-            "check": False,
-        }
-        options = kwargs if kwargs else defaults  # sourcery skip=or-if-exp-identity
-        try:
-            return subprocess.run(    # nosec B603
-                cmd,
-                **options,
-            )
-        except Exception as e:
-            raise RuntimeError(f"subprocess.run failed: {e}") from e
+def _tar_extract_options() -> dict:
+    """Return extraction options that enable the PEP 706 data filter when available."""
+    import tarfile
 
-    def _print_error_and_exit(self, error: QmError) -> None:
-        """Print error and exit - centralized error handling.
+    return {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
 
-        This method provides consistent error handling across all public methods.
-        It formats the error message and exits with the appropriate code.
 
-        Args:
-            error: The error object to handle and display
-        """
-        if isinstance(error, QmError):
-            self._print_output({"Error": str(error)})
-            exit(error.exit_code)  # Use the specific exit code from the error
-        else:
-            self._print_output({"Error": str(error)})
-            exit(1)  # Default exit code for unexpected errors
+def _safe_tar_members(archive: tarfile.TarFile) -> Generator[tarfile.TarInfo, None, None]:
+    """Yield archive members that stay inside the extraction directory.
 
-    def _validate_path_exists(self, path: str) -> None:
-        """Check if a path exists on the filesystem.
+    Args:
+        archive: Open tar archive to filter
 
-        Args:
-            path: File system path to validate
+    Yields:
+        tarfile.TarInfo: Regular members with relative, non-escaping paths
 
-        Raises:
-            ConfigNotFoundError: If the path does not exist
-        """
-        if not os.path.exists(path):
-            raise ConfigNotFoundError(path)
+    Raises:
+        QmError: If a member would be written outside the destination
+    """
+    for member in archive:
+        name = os.path.normpath(member.name)
+        if os.path.isabs(name) or name.startswith(".."):
+            raise QmError(f"Refusing to extract unsafe archive member '{member.name}'")
+        if member.issym() or member.islnk():
+            link = os.path.normpath(os.path.join(os.path.dirname(name), member.linkname))
+            if os.path.isabs(member.linkname) or link.startswith(".."):
+                raise QmError(f"Refusing to extract unsafe link '{member.name}'")
+        if member.isdev():
+            continue  # Device nodes are never recreated on the host
+        yield member
 
-    def _validate_container_exists(self) -> None:
-        """Check if the target container exists and is accessible.
 
-        Raises:
-            ContainerNotFoundError: If the container is not found or not running
-        """
-        if not self._container_exists(self.container):
-            raise ContainerNotFoundError(self.container)
+def extract_archive(archive: tarfile.TarFile, dst: str, source_name: str, on_member: Optional[Callable[[tarfile.TarInfo], None]] = None) -> None:
+    """Extract a streamed archive of one source path with cp semantics.
 
-    def _validate_devices_specified(self, devices: list[str]) -> None:
-        """Validate that at least one device is specified for operations.
+    If dst is an existing directory the source lands inside it, otherwise
+    the source's top-level entry is renamed to dst.
 
-        Args:
-            devices: List of device paths to validate
+    Args:
+        archive: Archive opened for reading, possibly in stream mode
+        dst: Host destination path
+        source_name: Base name of the archived source path
+        on_member: Called for every extracted member
+    """
+    extract_options = _tar_extract_options()
+    if os.path.isdir(dst):
+        target_dir, rename = dst, None
+    else:
+        target_dir, rename = os.path.dirname(dst) or ".", os.path.basename(dst)
+    for member in _safe_tar_members(archive):
+        if rename:
+            head, _, tail = member.name.partition("/")
+            if head == source_name:
+                member.name = os.path.join(rename, tail) if tail else rename
+        archive.extract(member, target_dir, **extract_options)  # nosec B202 - members filtered above
+        if on_member:
+            on_member(member)
+
+
+def unix_http_connection(socket_path: str, timeout: Optional[float] = None) -> http.client.HTTPConnection:
+    """Return an HTTP/1.1 connection carried over a unix domain socket.
+
+    The connection is kept open between requests, so a single connect()
+    serves every call made from one thread. http.client transparently
+    reconnects when the service closes the connection, for example after
+    a hijacked exec stream. http.client is imported here because it is
+    only needed by the API transport.
 
-        Raises:
-            ValidationError: If no devices are provided
-        """
-        if not devices:
-            raise ValidationError(
-                "No devices specified in the container config. "
-                "Please add 'AddDevice=' entries to the config file."
-            )
+    Args:
+        socket_path: Filesystem path of the unix socket
+        timeout: Optional socket timeout in seconds
+    """
+    import http.client
+    import socket
 
-    def _validate_command_provided(self, command: list[str], context: str = "") -> None:
-        """Validate that a command is provided for execution.
+    class UnixHTTPConnection(http.client.HTTPConnection):
+        """HTTPConnection that connects to a unix socket instead of a TCP host."""
 
-        Args:
-            command: List of command components to validate
-            context: Additional context for error messages
+        def connect(self) -> None:
+            """Connect to the unix socket."""
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            if timeout is not None:
+                sock.settimeout(timeout)
+            try:
+                sock.connect(socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self.sock = sock
 
-        Raises:
-            ValidationError: If no command is provided
+    return UnixHTTPConnection("localhost")
+
+
+def kill_process_group(proc: subprocess.Popen) -> None:
+    """Kill a process started in its own session and everything it spawned."""
+    with contextlib.suppress(ProcessLookupError):
+        os.killpg(proc.pid, signal.SIGKILL)
+
+
+def stream_process(command: list[str], on_chunk: Callable[[str, bytes], None], timeout: Optional[float] = None) -> int:
+    """Run a host command, forwarding its output as it arrives.
+
+    Args:
+        command: Command and arguments to run
+        on_chunk: Called with ("stdout" or "stderr", data) for each chunk
+        timeout: Deadline in seconds; the command's process group is
+            killed when it expires
+
+    Returns:
+        int: Exit code of the command
+
+    Raises:
+        CommandTimeoutError: If the deadline expires
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    # Safe: the command is an argument list, no shell involved
+    proc = subprocess.Popen(  # nosec B603
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=deadline is not None,  # Own process group, killed as a whole
+    )
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(proc.stdout, selectors.EVENT_READ, "stdout")
+            selector.register(proc.stderr, selectors.EVENT_READ, "stderr")
+            while selector.get_map():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    kill_process_group(proc)
+                    raise CommandTimeoutError(command, timeout)
+                for key, _ in selector.select(remaining):
+                    data = os.read(key.fd, COPY_CHUNK_SIZE)
+                    if data:
+                        on_chunk(key.data, data)
+                    else:
+                        selector.unregister(key.fileobj)
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return proc.wait(remaining)
+        except subprocess.TimeoutExpired:
+            kill_process_group(proc)
+            raise CommandTimeoutError(command, timeout) from None
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+class CliTransport:
+    """Podman transport that forks the podman command line tool.
+
+    This is the historical behaviour of qmctl and the fallback used when
+    the podman API socket is not available.
+    """
+
+    name = "cli"
+
+    def __init__(self, runner: Callable[..., subprocess.CompletedProcess], timeout: Optional[float] = None) -> None:
+        """Initialize the transport with a subprocess runner.
+
+        Args:
+            runner: Callable with the signature of QmController._run_subprocess
+            timeout: Deadline in seconds for streamed commands
         """
-        if not command:
-            context_msg = f" {context}" if context else ""
-            raise ValidationError(f"No command provided{context_msg}.")
+        self._run = runner
+        self.timeout = timeout
+
+    def container_exists(self, name: str) -> bool:
+        """Return True if the named container exists."""
+        result = self._run(
+            ["podman", "container", "exists", name],
+            stdout=subprocess.DEVNULL,  # overrides defaults
+            stderr=subprocess.DEVNULL,  # overrides defaults
+        )
+        return result.returncode == 0  # 0 = exists, 1 = doesn't exist
 
-    def _validate_paths_for_cp(self, paths: list[str]) -> tuple[str, str]:
-        """Validate and extract source and destination paths for copy operations.
+    def inspect(self, name: str) -> dict:
+        """Return the inspect document of the named container."""
+        result = self._run(PODMAN_INSPECT + [name])
+        if result.returncode != 0 and "no such container" not in result.stderr:
+            raise QmError(f"Failed to inspect container '{name}': {result.stderr.strip()}")
+        data = json.loads(result.stdout or "[]")
+        if not data:
+            raise ContainerNotFoundError(name)
+        return data[0]
 
-        Ensures exactly two paths are provided and that exactly one contains
-        the container prefix (container_name:).
+    def exec(self, container: str, command: list[str], **kwargs: Any) -> subprocess.CompletedProcess:
+        """Run a command inside a container.
 
         Args:
-            paths: List of paths for copy operation
+            container: Name of the container
+            command: Command and arguments to run
+            **kwargs: Extra options forwarded to the subprocess runner
 
         Returns:
-            Tuple of (source_path, destination_path)
+            subprocess.CompletedProcess: Result of the command
+        """
+        return self._run(PODMAN_EXEC + [container] + command, **kwargs)
 
-        Raises:
-            ValidationError: If paths are malformed or missing container prefix
+    def stream_exec(self, container: str, command: list[str], on_chunk: Callable[[str, bytes], None]) -> int:
+        """Run a command in a container, forwarding output as it arrives.
+
+        Args:
+            container: Name of the container
+            command: Command and arguments to run
+            on_chunk: Called with ("stdout" or "stderr", data) for each chunk
+
+        Returns:
+            int: Exit code of the command
         """
-        if not paths or len(paths) != 2:
-            raise ValidationError(
-                "Please provide source and destination paths."
-            )
+        return stream_process(PODMAN_EXEC + [container] + command, on_chunk, self.timeout)
 
-        src, dst = paths
-        container_prefix = f"{self.container}:"
-        # Use XOR to ensure exactly one path has container prefix
-        if not ((container_prefix in src) ^ (container_prefix in dst)):
-            raise ValidationError(
-                f"Provide `{self.container}:` only in source or destination"
-            )
+    def copy(self, src: str, dst: str) -> subprocess.CompletedProcess:
+        """Copy files between the host and a container with `podman cp`."""
+        return self._run(PODMAN_CP + [src, dst])
 
-        return src, dst
 
-    def _validate_exec_command(self, command: list[str]) -> tuple[str, list[str]]:
-        """Validate command for nested container execution and extract components.
+class PodmanApiTransport:
+    """Podman transport that talks to the libpod REST API socket.
 
-        Args:
-            command: List containing container name and command arguments
+    A persistent HTTP connection (one per calling thread) is used for
+    container existence checks, inspection, exec and archive based copies,
+    which avoids the cost of starting the podman binary for every operation.
+    """
 
-        Returns:
-            Tuple of (container_name, command_arguments)
+    name = "api"
 
-        Raises:
-            ValidationError: If command format is invalid
-        """
-        self._validate_command_provided(command, "to execute in container")
+    def __init__(self, socket_path: str = PODMAN_SOCKET_PATH, timeout: Optional[float] = None) -> None:
+        """Initialize the transport for the given API socket.
 
-        if len(command) < 2:
-            raise ValidationError("No command provided to execute.")
-        return command[0], command[1:]  # Split container name from command args
+        Args:
+            socket_path: Path of the podman service unix socket
+            timeout: Optional socket timeout in seconds
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()  # One persistent connection per thread
+
+    @property
+    def connection(self) -> http.client.HTTPConnection:
+        """Return this thread's persistent connection, creating it on demand."""
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = self._local.connection = unix_http_connection(self.socket_path, timeout=self.timeout)
+        return conn
 
-    def _container_exists(self, name: str) -> bool:
-        """Check if a podman container with the given name exists.
+    @staticmethod
+    def default_socket_path() -> str:
+        """Return the API socket path, honouring CONTAINER_HOST."""
+        host = os.environ.get("CONTAINER_HOST", "")
+        if host.startswith("unix://"):
+            return host[len("unix://"):]
+        return PODMAN_SOCKET_PATH
+
+    def _path(self, endpoint: str, query: Optional[dict] = None) -> str:
+        """Build a versioned libpod request path."""
+        import urllib.parse
+
+        path = f"/{PODMAN_API_VERSION}/libpod{endpoint}"
+        if query:
+            path += "?" + urllib.parse.urlencode(query)
+        return path
 
-        Uses 'podman container exists' command to verify container availability.
+    def _request(self, method: str, endpoint: str, query: Optional[dict] = None, body: Any = None, headers: Optional[dict] = None) -> http.client.HTTPResponse:
+        """Send a request and return the response object.
 
         Args:
-            name: Container name to check
+            method: HTTP method
+            endpoint: libpod endpoint path, e.g. "/containers/qm/json"
+            query: Optional query string parameters
+            body: Optional request body; dicts are JSON encoded
+            headers: Optional extra request headers
 
         Returns:
-            True if container exists and is accessible, False otherwise
+            http.client.HTTPResponse: Response positioned at the body
 
         Raises:
-            QmError: If the podman command fails unexpectedly
+            PodmanApiError: If the socket cannot be reached
         """
-        try:
-            command = ["podman", "container", "exists", name]
-            result = self._run_subprocess(
-                command,
-                stdout=subprocess.DEVNULL,  # overrides defaults
-                stderr=subprocess.DEVNULL,  # overrides defaults
-            )
-            return result.returncode == 0  # 0 = exists, 1 = doesn't exist
-        except Exception as e:
-            raise QmError(str(e)) from e
-
-    def _check_subprocess_result(self, result: subprocess.CompletedProcess, context: str, command: list[str]) -> None:
-        """Check subprocess result and raise appropriate errors.
+        import http.client
 
-        Analyzes the result of a subprocess execution and raises specific
-        exceptions based on the error conditions detected.
+        headers = dict(headers or {})
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        try:
+            self.connection.request(method, self._path(endpoint, query), body=body, headers=headers)
+            return self.connection.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            self.connection.close()
+            if isinstance(e, TimeoutError) and self.timeout is not None:
+                raise CommandTimeoutError([method, endpoint], self.timeout) from e
+            raise PodmanApiError(f"Podman API socket {self.socket_path} unavailable: {e}") from e
+
+    def _call(self, method: str, endpoint: str, query: Optional[dict] = None, body: Any = None, expected: tuple[int, ...] = (200,)) -> Any:
+        """Send a request, check the status and decode a JSON reply."""
+        response = self._request(method, endpoint, query, body)
+        data = response.read()
+        if response.status not in expected:
+            raise self._api_error(response.status, data)
+        if not data:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return data
+
+    @staticmethod
+    def _api_error(status: int, data: bytes) -> PodmanApiError:
+        """Build a PodmanApiError from an error response body."""
+        message = data.decode(errors="replace").strip()
+        try:
+            message = json.loads(message).get("message", message)
+        except (ValueError, AttributeError):
+            pass
+        return PodmanApiError(f"Podman API error {status}: {message}", status)
+
+    def close(self) -> None:
+        """Close this thread's persistent connection; the next request opens a new one."""
+        conn = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if conn is not None:
+            conn.close()
+
+    def ping(self) -> bool:
+        """Return True if the service answers on the socket."""
+        try:
+            response = self._request("GET", "/_ping")
+            response.read()
+            return response.status == 200
+        except PodmanApiError:
+            return False
+
+    def container_exists(self, name: str) -> bool:
+        """Return True if the named container exists."""
+        response = self._request("GET", f"/containers/{_quote(name)}/exists")
+        data = response.read()
+        if response.status == 204:
+            return True
+        if response.status == 404:
+            return False
+        raise self._api_error(response.status, data)
+
+    def inspect(self, name: str) -> dict:
+        """Return the inspect document of the named container."""
+        try:
+            return self._call("GET", f"/containers/{_quote(name)}/json")
+        except PodmanApiError as e:
+            if e.status == 404:
+                raise ContainerNotFoundError(name) from e
+            raise
+
+    def list_containers(self) -> list[dict]:
+        """Return the list entries of all running containers."""
+        return self._call("GET", "/containers/json")
+
+    def exec_create(self, container: str, command: list[str]) -> str:
+        """Create an exec session and return its ID."""
+        body = {"Cmd": command, "AttachStdout": True, "AttachStderr": True}
+        reply = self._call(
+            "POST", f"/containers/{_quote(container)}/exec",
+            body=body, expected=(200, 201),
+        )
+        return reply["Id"]
+
+    def exec_start(self, exec_id: str) -> http.client.HTTPResponse:
+        """Start an exec session and return the attached stream response."""
+        response = self._request("POST", f"/exec/{exec_id}/start", body={"Detach": False, "Tty": False})
+        if response.status != 200:
+            raise self._api_error(response.status, response.read())
+        return response
+
+    def exec_exit_code(self, exec_id: str) -> int:
+        """Return the exit code of a finished exec session."""
+        reply = self._call("GET", f"/exec/{exec_id}/json")
+        return int(reply.get("ExitCode", 1))
+
+    @staticmethod
+    def iter_frames(stream: IO[bytes]) -> Generator[tuple[int, bytes], None, None]:
+        """Demultiplex a docker-style exec stream.
+
+        Args:
+            stream: File-like object producing the raw stream
+
+        Yields:
+            tuple: (stream_id, chunk) where 1 is stdout and 2 is stderr;
+            large frames are split into chunks of at most COPY_CHUNK_SIZE
+        """
+        while True:
+            header = stream.read(STREAM_HEADER_SIZE)
+            if len(header) < STREAM_HEADER_SIZE:
+                return
+            stream_id, remaining = struct.unpack(">BxxxL", header)
+            while remaining:
+                chunk = stream.read(min(remaining, COPY_CHUNK_SIZE))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield stream_id, chunk
+
+    def _frames_until_deadline(self, command: list[str], response: http.client.HTTPResponse) -> Generator[tuple[int, bytes], None, None]:
+        """Demultiplex an attached exec stream, bounded by the transport timeout.
+
+        Raises:
+            CommandTimeoutError: If the stream is not complete in time; the
+                connection is dropped, abandoning the exec session
+        """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        frames = self.iter_frames(response)
+        try:
+            while True:
+                if deadline is not None and self.connection.sock is not None:
+                    self.connection.sock.settimeout(max(0.001, deadline - time.monotonic()))
+                try:
+                    frame = next(frames)
+                except StopIteration:
+                    return
+                yield frame
+        except TimeoutError as e:
+            self.connection.close()
+            raise CommandTimeoutError(command, self.timeout) from e
+        finally:
+            if deadline is not None and self.connection.sock is not None:
+                self.connection.sock.settimeout(self.timeout)
+
+    def exec(self, container: str, command: list[str], **kwargs: Any) -> subprocess.CompletedProcess:
+        """Run a command inside a container through the exec API.
+
+        Args:
+            container: Name of the container
+            command: Command and arguments to run
+            **kwargs: Accepted for CliTransport compatibility and ignored
+
+        Returns:
+            subprocess.CompletedProcess: Result with decoded stdout and stderr
+        """
+        exec_id = self.exec_create(container, command)
+        response = self.exec_start(exec_id)
+        output: dict[int, list[bytes]] = {1: [], 2: []}
+        for stream_id, payload in self._frames_until_deadline(command, response):
+            output.setdefault(stream_id, []).append(payload)
+        response.read()  # Drain so the connection can be reused
+        return subprocess.CompletedProcess(
+            command,
+            self.exec_exit_code(exec_id),
+            stdout=b"".join(output[1]).decode(errors="replace"),
+            stderr=b"".join(output[2]).decode(errors="replace"),
+        )
+
+    def stream_exec(self, container: str, command: list[str], on_chunk: Callable[[str, bytes], None]) -> int:
+        """Run a command in a container, forwarding output as it arrives.
+
+        Args:
+            container: Name of the container
+            command: Command and arguments to run
+            on_chunk: Called with ("stdout" or "stderr", data) for each chunk
+
+        Returns:
+            int: Exit code of the command
+        """
+        exec_id = self.exec_create(container, command)
+        response = self.exec_start(exec_id)
+        try:
+            for stream_id, chunk in self._frames_until_deadline(command, response):
+                on_chunk("stderr" if stream_id == 2 else "stdout", chunk)
+            response.read()
+        except BaseException:
+            self.connection.close()  # Abandon the attached stream
+            raise
+        return self.exec_exit_code(exec_id)
+
+    def _stat(self, container: str, path: str) -> Optional[dict]:
+        """Return the path stat reported by the archive API, or None."""
+        response = self._request("HEAD", f"/containers/{_quote(container)}/archive", {"path": path})
+        response.read()
+        if response.status != 200:
+            return None
+        header = response.getheader("X-Docker-Container-Path-Stat")
+        if not header:
+            return {}
+        import base64
+
+        return json.loads(base64.b64decode(header))
+
+    def copy(self, src: str, dst: str) -> subprocess.CompletedProcess:
+        """Copy files between the host and a container using tar archives.
+
+        Args:
+            src: Source path, optionally prefixed with `container:`
+            dst: Destination path, optionally prefixed with `container:`
+
+        Returns:
+            subprocess.CompletedProcess: Result with a non-zero code on failure
+        """
+        import tarfile
+
+        src_container, src_path = split_container_path(src)
+        dst_container, dst_path = split_container_path(dst)
+        try:
+            if dst_container:
+                self._copy_to_container(src_path, dst_container, dst_path)
+            elif src_container:
+                self._copy_from_container(src_container, src_path, dst_path)
+            else:
+                raise ValidationError("One of the copy paths must name a container.")
+        except (QmError, OSError, tarfile.TarError) as e:
+            return subprocess.CompletedProcess([src, dst], 1, stdout="", stderr=str(e))
+        return subprocess.CompletedProcess([src, dst], 0, stdout="", stderr="")
+
+    def _copy_to_container(self, src: str, container: str, dst: str) -> None:
+        """Upload a host path into a container."""
+        import tarfile
+        import tempfile
+
+        st = self._stat(container, dst)
+        if st is not None and st.get("mode", 0) & 0o20000000000:  # Go os.ModeDir
+            target_dir, arcname = dst, os.path.basename(os.path.normpath(src))
+        else:
+            target_dir, arcname = os.path.dirname(dst) or "/", os.path.basename(dst)
+        with tempfile.SpooledTemporaryFile(max_size=COPY_CHUNK_SIZE * 16) as buf:
+            with tarfile.open(fileobj=buf, mode="w") as archive:
+                archive.add(src, arcname=arcname)
+            buf.seek(0, os.SEEK_END)
+            length = buf.tell()
+            buf.seek(0)
+            response = self._request(
+                "PUT", f"/containers/{_quote(container)}/archive",
+                {"path": target_dir}, body=buf,
+                headers={"Content-Type": "application/x-tar", "Content-Length": str(length)},
+            )
+            data = response.read()
+        if response.status != 200:
+            raise self._api_error(response.status, data)
+
+    def _copy_from_container(self, container: str, src: str, dst: str) -> None:
+        """Download a container path onto the host."""
+        import tarfile
+
+        response = self._request("GET", f"/containers/{_quote(container)}/archive", {"path": src})
+        if response.status != 200:
+            raise self._api_error(response.status, response.read())
+        with tarfile.open(fileobj=response, mode="r|") as archive:
+            extract_archive(archive, dst, os.path.basename(os.path.normpath(src)))
+        response.read()
+
+
+def read_process_start_time(pid: int, proc_root: str = "/proc") -> Optional[int]:
+    """Return the start time of a process in clock ticks since boot.
+
+    Args:
+        pid: Process ID to look up
+        proc_root: procfs mount the PID belongs to, e.g. the /proc of a
+            container seen through /proc/<pid>/root/proc
+
+    Returns:
+        The starttime field of <proc_root>/<pid>/stat, or None if the
+        process does not exist
+    """
+    try:
+        with open(f"{proc_root}/{pid}/stat", "r") as file:
+            content = file.read()
+    except OSError:
+        return None
+    # comm (field 2) may contain spaces and parentheses; split after the last ')'
+    fields = content.rpartition(")")[2].split()
+    try:
+        return int(fields[PROC_STAT_STARTTIME_FIELD - 2])
+    except (IndexError, ValueError):
+        return None
+
+
+def private_directory(path: str) -> bool:
+    """Create a directory if missing and check that only the current user controls it.
+
+    The directory must be a real directory, not a symlink, owned by the
+    effective user with mode 0700. Its parent must belong to the user or
+    root and, if others can write to it, be sticky. Without these checks,
+    another local user could pre-create a predictable path such as
+    /tmp/qmctl-<uid>/qmctl and plant entries in it.
+
+    Args:
+        path: Directory to create and check
+
+    Returns:
+        True if the directory is safe to use
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(parent, mode=0o700, exist_ok=True)
+        with contextlib.suppress(FileExistsError):
+            os.mkdir(path, 0o700)
+        parent_stat, path_stat = os.stat(parent), os.lstat(path)
+    except OSError:
+        return False
+    euid = os.geteuid()
+    if not stat.S_ISDIR(path_stat.st_mode) or path_stat.st_uid != euid or stat.S_IMODE(path_stat.st_mode) != 0o700:
+        return False
+    if parent_stat.st_uid not in (euid, 0):
+        return False
+    return not (parent_stat.st_mode & 0o022) or bool(parent_stat.st_mode & stat.S_ISVTX)
+
+
+class ContainerStateCache:
+    """On-disk cache of running container state shared across invocations.
+
+    Each container has one small JSON file holding its ID, init PID and the
+    init process start time. An entry is trusted only while a process with
+    that PID still exists and has the same start time, so restarts and PID
+    reuse invalidate it without asking podman. Nested containers are stored
+    with the procfs their PID belongs to, which disappears when QM restarts.
+    The cache is disabled if its directory fails private_directory().
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None) -> None:
+        """Initialize the cache.
+
+        Args:
+            cache_dir: Directory for cache files; defaults to $QMCTL_CACHE_DIR,
+                /run/qmctl for root or $XDG_RUNTIME_DIR/qmctl otherwise
+        """
+        self.cache_dir = cache_dir or self.default_cache_dir()
+        self._usable: Optional[bool] = None  # Result of private_directory(), checked on first use
+
+    @property
+    def usable(self) -> bool:
+        """Return True if the cache directory is private to the current user."""
+        if self._usable is None:
+            self._usable = private_directory(self.cache_dir)
+        return self._usable
+
+    @staticmethod
+    def default_cache_dir() -> str:
+        """Return the cache directory for the current user."""
+        if os.environ.get(CACHE_DIR_ENV):
+            return os.environ[CACHE_DIR_ENV]
+        if os.geteuid() == 0:
+            return SYSTEM_CACHE_DIR
+        import tempfile
+
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"qmctl-{os.geteuid()}")
+        return os.path.join(runtime_dir, "qmctl")
+
+    def _entry_path(self, name: str) -> str:
+        """Return the cache file path for a container name."""
+        return os.path.join(self.cache_dir, f"{_quote(name)}.json")
+
+    def get(self, name: str) -> Optional[dict]:
+        """Return the cached state if its init process is still the same.
+
+        Args:
+            name: Container name
+
+        Returns:
+            dict with "id", "pid" and "start_time", or None on a miss
+        """
+        if not self.usable:
+            return None
+        try:
+            with open(self._entry_path(name), "r") as file:
+                state = json.load(file)
+            pid, start_time = int(state["pid"]), int(state["start_time"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if read_process_start_time(pid, state.get("proc_root", "/proc")) != start_time:
+            self.invalidate(name)
+            return None
+        return state
+
+    def put(self, name: str, container_id: str, pid: int, proc_root: str = "/proc", **details: Any) -> Optional[dict]:
+        """Record the state of a running container.
+
+        Args:
+            name: Container name
+            container_id: Full podman container ID
+            pid: PID of the container init process as seen in proc_root
+            proc_root: procfs mount the PID belongs to
+            **details: Extra JSON-serializable fields to store with the entry
+
+        Returns:
+            The stored state, or None if it could not be recorded
+        """
+        start_time = read_process_start_time(pid, proc_root)
+        if not pid or start_time is None:
+            return None
+        state = {"id": container_id, "pid": pid, "start_time": start_time, **details}
+        if proc_root != "/proc":
+            state["proc_root"] = proc_root
+        return state if self.write_json(self._entry_path(name), state) else None
+
+    def write_json(self, path: str, data: Any) -> bool:
+        """Atomically replace a cache file with JSON data.
+
+        Args:
+            path: File path inside the cache directory
+            data: JSON-serializable content
+
+        Returns:
+            True if the file was written
+        """
+        import tempfile
+
+        if not self.usable:
+            return False
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".state-")
+            with os.fdopen(fd, "w") as file:
+                json.dump(data, file)
+            os.replace(tmp_path, path)  # Atomic for concurrent readers
+        except OSError:
+            return False
+        return True
+
+    def read_json(self, path: str) -> Any:
+        """Return the JSON content of a cache file, or None if unreadable."""
+        if not self.usable:
+            return None
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def manifest_path(self, kind: str, *key: str) -> str:
+        """Return the cache file holding a sync manifest.
+
+        Args:
+            kind: "src" for host hash caches, "dst" for destination manifests
+            *key: Values identifying the manifest, e.g. container ID and path
+        """
+        return self.keyed_path(f"sync-{kind}", *key)
+
+    def keyed_path(self, prefix: str, *key: str) -> str:
+        """Return a cache file path named after a digest of its key.
+
+        Args:
+            prefix: File name prefix naming the kind of entry
+            *key: Values identifying the entry
+        """
+        import hashlib
+
+        digest = hashlib.sha256("\0".join(key).encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{prefix}-{digest}.json")
+
+    def invalidate(self, name: str) -> None:
+        """Forget the cached state of a container."""
+        if not self.usable:
+            return
+        try:
+            os.unlink(self._entry_path(name))
+        except OSError:
+            pass
+
+
+def quadlet_unit_dirs() -> list[str]:
+    """Return the quadlet search path, highest priority first."""
+    override = os.environ.get(QUADLET_UNIT_DIRS_ENV)
+    if override:
+        return [path for path in override.split(":") if path]
+    return list(QUADLET_UNIT_DIRS)
+
+
+class ConfigEntry:
+    """One assignment of a unit file, with the file and line it came from."""
+
+    __slots__ = ("section", "key", "value", "path", "line")
+
+    def __init__(self, section: str, key: str, value: Optional[str], path: str, line: int) -> None:
+        """Initialize the entry.
+
+        Args:
+            section: Section name without brackets
+            key: Setting name
+            value: Assigned value; None for a line without "="
+            path: File holding the assignment
+            line: Line number of the assignment, the first one if continued
+        """
+        self.section = section
+        self.key = key
+        self.value = value
+        self.path = path
+        self.line = line
+
+    def __repr__(self) -> str:
+        """Return a debugging representation of the entry."""
+        return f"ConfigEntry({self.section!r}, {self.key!r}, {self.value!r}, {self.path!r}, {self.line})"
+
+    def __eq__(self, other: object) -> bool:
+        """Return True if other is an entry with the same fields."""
+        return isinstance(other, ConfigEntry) and self.as_list() == other.as_list()
+
+    def as_list(self) -> list:
+        """Return [section, key, value, path, line] for JSON caches."""
+        return [self.section, self.key, self.value, self.path, self.line]
+
+
+class QuadletConfig:
+    """A quadlet unit merged with its drop-ins, the way quadlet reads it.
+
+    Drop-ins are the ``*.conf`` files in ``<unit>.d/`` and ``<type>.d/``
+    of every quadlet directory. A drop-in masks any drop-in of the same
+    name in a lower priority directory, and the survivors are applied
+    after the unit in file name order.
+
+    The files are parsed in a single pass into ConfigEntry records, kept
+    in the order applied and indexed by section and key. Keys listed in
+    MULTI_VALUE_KEYS accumulate values, where an empty assignment clears
+    the earlier ones; any other key takes its last value.
+    """
+
+    def __init__(self, files: list[str], signature: list, entries: list[ConfigEntry]) -> None:
+        """Initialize the merged config.
+
+        Args:
+            files: Unit file followed by its drop-ins in the order applied
+            signature: Path, inode, mtime and size of every file in files
+            entries: Entries in the order applied
+        """
+        self.files = files
+        self.signature = signature
+        self.entries = entries
+        self.index: dict[str, dict[str, list[ConfigEntry]]] = {}  # section -> key -> entries
+        for entry in entries:
+            self.index.setdefault(entry.section, {}).setdefault(entry.key, []).append(entry)
+
+    @staticmethod
+    def find_files(path: str, unit_dirs: list[str]) -> list[str]:
+        """Return the unit file followed by its drop-ins in the order applied.
+
+        Args:
+            path: Path of the quadlet unit file
+            unit_dirs: Quadlet directories, highest priority first; the
+                directory holding the unit is searched last if missing
+        """
+        unit = os.path.basename(path)
+        search = list(unit_dirs)
+        if os.path.dirname(path) not in search:
+            search.append(os.path.dirname(path))
+        dropin_dirs = [f"{unit}.d", f"{os.path.splitext(unit)[1][1:]}.d"]
+
+        dropins: dict[str, str] = {}
+        for unit_dir in search:
+            for dropin_dir in dropin_dirs:
+                try:
+                    names = os.listdir(os.path.join(unit_dir, dropin_dir))
+                except OSError:
+                    continue
+                for name in names:
+                    if name.endswith(DROPIN_SUFFIX):
+                        dropins.setdefault(name, os.path.join(unit_dir, dropin_dir, name))
+        return [path] + [dropins[name] for name in sorted(dropins)]
+
+    @staticmethod
+    def file_signature(files: list[str]) -> list:
+        """Return [path, inode, mtime_ns, size] of every file that still exists."""
+        signature = []
+        for path in files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            signature.append([path, st.st_ino, st.st_mtime_ns, st.st_size])
+        return signature
+
+    @staticmethod
+    def parse_lines(lines: Iterable[str], path: str, entries: list[ConfigEntry]) -> None:
+        """Append the entries of one file to entries.
+
+        Args:
+            lines: Lines of the file
+            path: File name recorded in each entry
+            entries: List the entries are appended to
+        """
+        section, pending, start = None, "", 0
+        for number, line in enumerate(lines, 1):
+            stripped = line.strip()
+            if not pending and (not stripped or stripped.startswith(COMMENT_PREFIXES)):
+                continue
+            if stripped.endswith("\\"):  # Continued on the next line
+                pending, start = pending + stripped[:-1].rstrip() + " ", start or number
+                continue
+            stripped, start, pending = pending + stripped, start or number, ""
+            if stripped.startswith("[") and stripped.endswith("]"):
+                section = stripped[1:-1]
+            elif section:
+                key, sep, value = stripped.partition("=")
+                entries.append(ConfigEntry(section, key.strip(), value.strip() if sep else None, path, start))
+            start = 0
+
+    @classmethod
+    def parse(cls, files: list[str], signature: list) -> "QuadletConfig":
+        """Read and merge the given files.
+
+        Args:
+            files: Unit file followed by its drop-ins in the order applied
+            signature: Result of file_signature for the same files
+        """
+        entries: list[ConfigEntry] = []
+        for path in files:
+            with open(path, "r") as file:
+                cls.parse_lines(file, path, entries)
+        return cls(files, signature, entries)
+
+    @classmethod
+    def from_text(cls, content: str, path: str = "") -> "QuadletConfig":
+        """Parse the content of a single unit file."""
+        entries: list[ConfigEntry] = []
+        cls.parse_lines(content.splitlines(), path, entries)
+        return cls([path], [], entries)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuadletConfig":
+        """Rebuild a config from the output of to_dict."""
+        return cls(data["files"], data["signature"], [ConfigEntry(*entry) for entry in data["entries"]])
+
+    def to_dict(self) -> dict:
+        """Return a JSON-serializable form of the config."""
+        return {"files": self.files, "signature": self.signature, "entries": [entry.as_list() for entry in self.entries]}
+
+    def lines(self, prefix: Optional[str] = None) -> Generator[str, None, None]:
+        """Yield "Key=Value" lines in the order applied.
+
+        Args:
+            prefix: Only yield lines starting with this prefix
+        """
+        for entry in self.entries:
+            line = entry.key if entry.value is None else f"{entry.key}={entry.value}"
+            if not prefix or line.startswith(prefix):
+                yield line
+
+    def lookup(self, section: str, key: str) -> Optional[str]:
+        """Return the last value of a key, or None if it is not set."""
+        entries = self.index.get(section, {}).get(key)
+        return entries[-1].value if entries else None
+
+    def lookup_all(self, section: str, key: str) -> list[str]:
+        """Return every value of a key; an empty assignment clears earlier ones."""
+        values: list[str] = []
+        for entry in self.index.get(section, {}).get(key, ()):
+            if entry.value == "":
+                values = []
+            elif entry.value is not None:
+                values.append(entry.value)
+        return values
+
+    def sections(self) -> dict:
+        """Return {section: {key: value}} with lists for multi-value keys.
+
+        A line without "=" maps to True.
+        """
+        parsed: dict = {}
+        for section, keys in self.index.items():
+            parsed[section] = {}
+            for key, entries in keys.items():
+                if key in MULTI_VALUE_KEYS:
+                    parsed[section][key] = self.lookup_all(section, key)
+                else:
+                    parsed[section][key] = True if entries[-1].value is None else entries[-1].value
+        return parsed
+
+    def provenance(self) -> dict:
+        """Return {section: {key: [{"value", "file", "line"}]}} in the order applied."""
+        return {
+            section: {key: [{"value": entry.value, "file": entry.path, "line": entry.line} for entry in entries] for key, entries in keys.items()}
+            for section, keys in self.index.items()
+        }
+
+
+def select_transport(runner: Callable[..., subprocess.CompletedProcess], mode: str = "auto", socket_path: Optional[str] = None, timeout: Optional[float] = None) -> Union[CliTransport, PodmanApiTransport]:
+    """Choose the podman transport for a controller.
+
+    Args:
+        runner: Subprocess runner used by the CLI transport
+        mode: One of "auto", "api" or "cli"
+        socket_path: Override for the podman API socket path
+        timeout: Per-operation deadline in seconds
+
+    Returns:
+        The selected transport instance
+
+    Raises:
+        ValidationError: If the mode is unknown
+        PodmanApiError: If mode is "api" and the service is unreachable
+    """
+    if mode not in TRANSPORT_MODES:
+        raise ValidationError(f"Unknown transport '{mode}', expected one of: {', '.join(TRANSPORT_MODES)}")
+    if mode == "cli":
+        return CliTransport(runner, timeout)
+    socket_path = socket_path or PodmanApiTransport.default_socket_path()
+    if os.path.exists(socket_path):
+        api = PodmanApiTransport(socket_path, timeout)
+        if api.ping():
+            return api
+    if mode == "api":
+        raise PodmanApiError(f"Podman API socket {socket_path} is not reachable")
+    return CliTransport(runner, timeout)
+
+
+def build_manifest(root: str, previous: Optional[dict] = None) -> dict[str, list]:
+    """Return a content-hash manifest of the regular files below root.
+
+    Files whose size, mtime and inode match the previous manifest keep
+    their recorded hash, so only new or modified files are read.
+
+    Args:
+        root: Directory to scan
+        previous: Earlier result of build_manifest for the same root
+
+    Returns:
+        dict: Relative path -> [size, mtime_ns, inode, sha256 hex digest]
+    """
+    import hashlib
+
+    previous = previous or {}
+    manifest = {}
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue  # Removed while scanning
+            if not stat.S_ISREG(st.st_mode):
+                continue  # Only regular files are synced
+            relpath = os.path.relpath(path, root)
+            entry = previous.get(relpath)
+            if entry and entry[:3] == [st.st_size, st.st_mtime_ns, st.st_ino]:
+                manifest[relpath] = entry
+                continue
+            digest = hashlib.sha256()
+            with open(path, "rb") as file:
+                for chunk in iter(lambda: file.read(SYNC_HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            manifest[relpath] = [st.st_size, st.st_mtime_ns, st.st_ino, digest.hexdigest()]
+    return manifest
+
+
+class TransferProgress:
+    """Byte and file counters of a streamed copy, reported periodically."""
+
+    def __init__(self, report: Optional[Callable[[dict], None]] = None, total_bytes: Optional[int] = None, interval: float = COPY_PROGRESS_INTERVAL) -> None:
+        """Initialize the counters.
+
+        Args:
+            report: Called with snapshot() at most once per interval
+            total_bytes: Expected size of the transfer, if known
+            interval: Seconds between reports
+        """
+        self.report = report
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.bytes = 0
+        self.files = 0
+        self.sources: dict[str, dict] = {}  # Source path -> entries and file bytes moved
+        self.start = time.monotonic()
+        self._next_report = self.start + interval
+
+    def add_bytes(self, count: int) -> None:
+        """Account for archive bytes moved through the pipe."""
+        self.bytes += count
+        now = time.monotonic()
+        if self.report and now >= self._next_report:
+            self._next_report = now + self.interval
+            self.report(self.snapshot())
+
+    def add_file(self, *_: Any) -> None:
+        """Account for one archived or extracted entry."""
+        self.files += 1
+
+    def add_member(self, source: str, member: tarfile.TarInfo) -> None:
+        """Account for one entry and attribute it to the source it belongs to."""
+        self.add_file()
+        counters = self.sources.setdefault(source, {"files": 0, "bytes": 0})
+        counters["files"] += 1
+        if member.isfile():
+            counters["bytes"] += member.size
+
+    def snapshot(self) -> dict:
+        """Return the counters with elapsed time and throughput."""
+        seconds = time.monotonic() - self.start
+        data = {
+            "bytes": self.bytes,
+            "files": self.files,
+            "seconds": round(seconds, 3),
+            "throughput_bytes_per_s": int(self.bytes / seconds) if seconds > 0 else 0,
+        }
+        if self.total_bytes is not None:
+            data["total_bytes"] = self.total_bytes
+        return data
+
+
+def _format_bytes(count: Optional[float]) -> str:
+    """Format a byte count with a binary unit suffix, e.g. 1.5M."""
+    if count is None:
+        return "-"
+    for unit in ("B", "K", "M", "G"):
+        if abs(count) < 1024:
+            return f"{count:.0f}{unit}" if unit == "B" else f"{count:.1f}{unit}"
+        count /= 1024
+    return f"{count:.1f}T"
+
+
+def find_container_scopes(root: str) -> dict[str, str]:
+    """Return the cgroups of the nested containers below a cgroup.
+
+    Matches the libpod-<id>.scope directories of podman's systemd cgroup
+    manager and the libpod-<id> directories of its cgroupfs manager; the
+    conmon and QM's own libpod-payload-<id> cgroups are not containers.
+
+    Args:
+        root: cgroup directory to search, e.g. /sys/fs/cgroup/qm.service
+
+    Returns:
+        dict: Full container ID -> cgroup directory
+    """
+    scopes = {}
+    for directory, dirs, _ in os.walk(root):
+        for name in list(dirs):
+            container_id = name[len(NESTED_SCOPE_PREFIX):]
+            if container_id.endswith(".scope"):
+                container_id = container_id[:-len(".scope")]
+            if name.startswith(NESTED_SCOPE_PREFIX) and len(container_id) == 64 and all(c in "0123456789abcdef" for c in container_id):
+                scopes[container_id] = os.path.join(directory, name)
+                dirs.remove(name)  # Sub-cgroups are part of the container's totals
+    return scopes
+
+
+def read_pressure(path: str) -> dict[str, dict[str, float]]:
+    """Parse a PSI file such as cpu.pressure.
+
+    Args:
+        path: Pressure file
+
+    Returns:
+        dict: "some" and, when present, "full" -> avg10, avg60, avg300
+        (percent of time stalled) and total (microseconds stalled)
+    """
+    with open(path, "r") as file:
+        return parse_pressure(file.read())
+
+
+def parse_pressure(content: str) -> dict[str, dict[str, float]]:
+    """Parse the content of a PSI file; see read_pressure."""
+    pressure = {}
+    for line in content.splitlines():  # "some avg10=0.00 avg60=0.00 avg300=0.00 total=0"
+        kind, *fields = line.split()
+        values = dict(field.split("=", 1) for field in fields)
+        pressure[kind] = {key: int(value) if key == "total" else float(value) for key, value in values.items()}
+    return pressure
+
+
+def parse_pressure_threshold(spec: str) -> tuple[str, str, int, int]:
+    """Parse a pressure threshold of the form RESOURCE[:some|full]=STALL_MS/WINDOW_MS.
+
+    Args:
+        spec: e.g. "memory:full=100/1000" - memory fully stalled for
+            100ms within any 1s window
+
+    Returns:
+        tuple: (resource, kind, stall_us, window_us)
+
+    Raises:
+        ValidationError: If the threshold is malformed or out of range
+    """
+    try:
+        target, _, limits = spec.partition("=")
+        resource, _, kind = target.partition(":")
+        stall_ms, window_ms = (int(value) for value in limits.split("/"))
+    except ValueError:
+        raise ValidationError(f"Invalid threshold '{spec}', expected RESOURCE[:some|full]=STALL_MS/WINDOW_MS") from None
+    kind = kind or "some"
+    if resource not in PSI_RESOURCES or kind not in ("some", "full"):
+        raise ValidationError(f"Invalid threshold '{spec}': resource must be one of {', '.join(PSI_RESOURCES)} and kind some or full")
+    if not PSI_WINDOW_MS[0] <= window_ms <= PSI_WINDOW_MS[1] or not 0 < stall_ms <= window_ms:
+        raise ValidationError(f"Invalid threshold '{spec}': window must be {PSI_WINDOW_MS[0]}-{PSI_WINDOW_MS[1]}ms and the stall within it")
+    return resource, kind, stall_ms * 1000, window_ms * 1000
+
+
+def cgroup_procs(root: str) -> dict[int, str]:
+    """Return the processes of a cgroup subtree.
+
+    Args:
+        root: cgroup v2 directory, e.g. /sys/fs/cgroup/qm.service
+
+    Returns:
+        dict: PID -> cgroup directory holding it
+    """
+    procs = {}
+    for directory, _, _ in os.walk(root):
+        with contextlib.suppress(OSError, ValueError):
+            with open(os.path.join(directory, "cgroup.procs"), "r") as file:
+                procs.update((int(pid), directory) for pid in file.read().split())
+    return procs
+
+
+def shares_host_namespace(pid: int, ns_type: str = "mnt", proc_root: str = "/proc") -> bool:
+    """Return True if a process is known to be in the same namespace as PID 1.
+
+    An unreadable namespace link (e.g. a hidepid procfs) counts as not shared.
+    """
+    try:
+        return os.readlink(f"{proc_root}/{pid}/ns/{ns_type}") == os.readlink(f"{proc_root}/1/ns/{ns_type}")
+    except OSError:
+        return False
+
+
+def _setns(fd: int, nstype: int) -> None:
+    """Move the calling thread into the namespace referred to by fd."""
+    if hasattr(os, "setns"):  # Python 3.12+
+        os.setns(fd, nstype)
+        return
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.setns(fd, nstype) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+
+def resolve_in_root(root: str, path: str) -> str:
+    """Resolve path as seen from a container whose root directory is root.
+
+    Symlinks are followed relative to root, so absolute links inside the
+    container do not escape to the host's files.
+
+    Args:
+        root: Container root as seen from the host, e.g. /proc/<pid>/root
+        path: Absolute path inside the container
+
+    Returns:
+        str: Host path of the resolved file (root + resolved path)
+
+    Raises:
+        OSError: If a component is missing or there are too many links
+    """
+    parts = [part for part in path.split("/") if part]
+    current = ""
+    links = 0
+    while parts:
+        part = parts.pop(0)
+        if part == ".":
+            continue
+        if part == "..":
+            current = os.path.dirname(current) if current else ""
+            continue
+        candidate = f"{current}/{part}"
+        if stat.S_ISLNK(os.lstat(root + candidate).st_mode):
+            links += 1
+            if links > MAX_SYMLINKS:
+                raise OSError(errno.ELOOP, os.strerror(errno.ELOOP), path)
+            target = os.readlink(root + candidate)
+            parts = [part for part in target.split("/") if part] + parts
+            if target.startswith("/"):
+                current = ""
+            continue
+        current = candidate
+    return root + (current or "/")
+
+
+def device_cgroup_access(rules: list[dict], dev_type: str, major: int, minor: int) -> str:
+    """Return the access a device cgroup allow-list grants to a device.
+
+    Rules follow the OCI runtime spec (linux.resources.devices) and are
+    applied in order, so the last rule matching an access type decides.
+
+    Args:
+        rules: dicts with allow, type ("a", "c" or "b"), major, minor
+            (None or -1 for any) and access (subset of "rwm")
+        dev_type: "c" or "b"
+        major: Device major number
+        minor: Device minor number
+
+    Returns:
+        str: The granted subset of "rwm", e.g. "" if the device is denied
+    """
+    granted = ""
+    for access in DEVICE_ACCESS:
+        allowed = False
+        for rule in rules:
+            if (
+                rule.get("type", "a") in ("a", dev_type)
+                and rule.get("major") in (None, -1, major)
+                and rule.get("minor") in (None, -1, minor)
+                and access in rule.get("access", DEVICE_ACCESS)
+            ):
+                allowed = bool(rule.get("allow"))
+        if allowed:
+            granted += access
+    return granted
+
+
+def parse_devices_list(content: str) -> list[dict]:
+    """Convert a cgroup v1 devices.list into OCI device rules.
+
+    Args:
+        content: Lines such as "c 10:232 rwm" or "a *:* rwm"
+
+    Returns:
+        list: Allow rules in the format of device_cgroup_access
+    """
+    rules = []
+    for line in content.splitlines():
+        dev_type, numbers, access = line.split()
+        major, _, minor = numbers.partition(":")
+        rules.append({
+            "allow": True, "type": dev_type, "access": access,
+            "major": None if major == "*" else int(major),
+            "minor": None if minor == "*" else int(minor),
+        })
+    return rules
+
+
+class ProcIntrospector:
+    """Answer `show` topics about a container from the host's /proc.
+
+    Everything is read from /proc entries of the container's processes, so
+    no tool has to exist in the container and nothing is exec'd in it.
+    """
+
+    def __init__(self, pid: int, proc_root: str = "/proc") -> None:
+        """Initialize the introspector.
+
+        Args:
+            pid: Host PID of the container's init process
+            proc_root: Mount point of the host's procfs
+        """
+        self.pid = pid
+        self.proc_root = proc_root
+
+    def unix_sockets(self, listening_only: bool = True) -> list[dict]:
+        """Return the UNIX domain sockets of the container's network namespace.
+
+        Args:
+            listening_only: Only report listening sockets, like `ss -xl`
+
+        Returns:
+            list: dicts with type, state, listening, inode and path
+            (abstract names start with "@", unbound sockets have "")
+        """
+        sockets = []
+        with open(f"{self.proc_root}/{self.pid}/net/unix", "r") as file:
+            next(file)  # Num RefCount Protocol Flags Type St Inode Path
+            for line in file:
+                fields = line.split(None, 7)
+                listening = bool(int(fields[3], 16) & UNIX_SOCKET_LISTENING)
+                if listening_only and not listening:
+                    continue
+                sockets.append({
+                    "type": UNIX_SOCKET_TYPES.get(int(fields[4], 16), fields[4]),
+                    "state": "listening" if listening else UNIX_SOCKET_STATES.get(int(fields[5], 16), fields[5]),
+                    "inode": int(fields[6]),
+                    "path": fields[7].strip() if len(fields) > 7 else "",
+                })
+        return sockets
+
+    def sysvipc(self, pid: Optional[int] = None) -> dict[str, list[dict]]:
+        """Return the SysV shared memory, message queues and semaphores.
+
+        /proc/sysvipc shows the IPC namespace of the reading thread, so a
+        short-lived thread joins the container's IPC namespace to read it.
+
+        Args:
+            pid: Process whose IPC namespace to read; defaults to the
+                container's init process
+
+        Returns:
+            dict: "shm", "msg" and "sem" -> one dict per object, keyed by
+            the column names of the /proc/sysvipc file
+        """
+        target = f"{self.proc_root}/{pid or self.pid}/ns/ipc"
+        if os.readlink(target) == os.readlink(f"{self.proc_root}/self/ns/ipc"):
+            return self._read_sysvipc()
+
+        result: dict[str, Any] = {}
+
+        def read() -> None:
+            try:
+                fd = os.open(target, os.O_RDONLY)
+                try:
+                    _setns(fd, CLONE_NEWIPC)  # Only this thread changes namespace
+                finally:
+                    os.close(fd)
+                result["value"] = self._read_sysvipc()
+            except Exception as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=read, name="qmctl-ipc-ns")
+        thread.start()
+        thread.join()
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
+
+    def _read_sysvipc(self) -> dict[str, list[dict]]:
+        """Parse /proc/sysvipc/* as seen by the calling thread."""
+        objects = {}
+        for kind in SYSVIPC_KINDS:
+            with open(f"{self.proc_root}/sysvipc/{kind}", "r") as file:
+                columns = next(file).split()
+                objects[kind] = [
+                    {column: value if column == "perms" else int(value) for column, value in zip(columns, line.split())}
+                    for line in file
+                ]
+        return objects
+
+    def namespaces(self, processes: dict[int, str]) -> NamespaceInventory:
+        """Return the namespaces used by the given processes, like lsns.
+
+        Each process costs one readlink per namespace type and nothing
+        else; only the owner of each namespace has its command read.
+
+        Args:
+            processes: Host PID -> name of the container it runs in
+
+        Returns:
+            NamespaceInventory: The namespaces, indexed by inode
+        """
+        inventory = NamespaceInventory()
+        for pid, container in processes.items():
+            prefix = f"{self.proc_root}/{pid}/ns/"
+            for ns_type in NAMESPACE_TYPES:
+                try:
+                    link = os.readlink(prefix + ns_type)  # e.g. "net:[4026531840]"
+                except OSError:
+                    continue  # Exited, or the kernel lacks this namespace type
+                inventory.add(ns_type, int(link[link.index("[") + 1:-1]), pid, container)
+        for entry in inventory.by_inode.values():
+            try:
+                with open(f"{self.proc_root}/{entry['pid']}/comm", "r") as file:
+                    entry["command"] = file.read().strip()
+            except OSError:
+                entry["command"] = ""
+        return inventory
+
+    def devices(self, paths: list[str]) -> dict[str, dict]:
+        """Stat device paths inside the container and on the host.
+
+        Args:
+            paths: Absolute device paths inside the container
+
+        Returns:
+            dict: Device path -> {"present", "type", "major_minor",
+            "readable", "host_major_minor"}; the major:minor fields are
+            None for anything but character and block devices
+
+        Raises:
+            OSError: If the container's root cannot be looked into, e.g.
+                EACCES on /proc/<pid>/root
+        """
+        root = f"{self.proc_root}/{self.pid}/root"
+        devices = {}
+        for path in paths:
+            info: dict[str, Any] = {"present": False, "type": None, "major_minor": None, "readable": False}
+            try:
+                resolved = resolve_in_root(root, path)
+                st = os.stat(resolved)
+                info.update(present=True, type=self._file_type(st), readable=os.access(resolved, os.R_OK))
+                info["major_minor"] = self._major_minor(st)
+            except OSError as e:
+                if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    raise
+            try:
+                info["host_major_minor"] = self._major_minor(os.stat(path))
+            except OSError:
+                info["host_major_minor"] = None
+            devices[path] = info
+        return devices
+
+    @staticmethod
+    def _file_type(st: os.stat_result) -> str:
+        """Return char, block, directory or other for a stat result."""
+        if stat.S_ISCHR(st.st_mode):
+            return "char"
+        if stat.S_ISBLK(st.st_mode):
+            return "block"
+        return "directory" if stat.S_ISDIR(st.st_mode) else "other"
+
+    @staticmethod
+    def _major_minor(st: os.stat_result) -> Optional[str]:
+        """Return "major:minor" of a device node, None for other files."""
+        if not (stat.S_ISCHR(st.st_mode) or stat.S_ISBLK(st.st_mode)):
+            return None
+        return f"{os.major(st.st_rdev)}:{os.minor(st.st_rdev)}"
+
+    def shared_memory(self, processes: dict[int, str]) -> dict:
+        """Account SysV, POSIX (/dev/shm) and memfd shared memory per container.
+
+        SysV IPC is read once per IPC namespace and /dev/shm once per mount
+        namespace of the processes; both are attributed to the container
+        of the namespace's lowest PID. memfds are found in the memory maps
+        of every process and attributed to each container mapping them.
+
+        Args:
+            processes: Host PID -> name of the container it runs in
+
+        Returns:
+            dict: "containers" (per-container totals), "shm", "posix",
+            "memfd", "msg" and "sem" records
+        """
+        report: dict[str, Any] = {"containers": {}, "shm": [], "posix": [], "memfd": [], "msg": [], "sem": []}
+
+        def totals(container: str) -> dict:
+            return report["containers"].setdefault(container, {
+                "shm_bytes": 0, "shm_segments": 0, "posix_bytes": 0, "posix_files": 0,
+                "memfd_bytes": 0, "memfds": 0, "total_bytes": 0,
+            })
+
+        inventory = self.namespaces(processes)
+        for entry in inventory.records():
+            owner = processes.get(entry["pid"], "")
+            if entry["type"] == "ipc":
+                try:
+                    objects = self.sysvipc(entry["pid"])
+                except OSError:
+                    continue  # Exited meanwhile
+                for segment in objects["shm"]:
+                    report["shm"].append({**segment, "container": owner, "ipc_ns": entry["inode"], "orphaned": segment.get("nattch") == 0})
+                    totals(owner)["shm_segments"] += 1
+                    totals(owner)["shm_bytes"] += segment.get("size", 0)
+                for kind in ("msg", "sem"):
+                    report[kind].extend({**item, "container": owner, "ipc_ns": entry["inode"]} for item in objects[kind])
+            elif entry["type"] == "mnt":
+                for path, st in self._walk_files(f"{self.proc_root}/{entry['pid']}/root/dev/shm"):
+                    report["posix"].append({
+                        "container": owner, "path": "/dev/shm/" + path, "size": st.st_size,
+                        "allocated": st.st_blocks * 512, "links": st.st_nlink,
+                    })
+                    totals(owner)["posix_files"] += 1
+                    totals(owner)["posix_bytes"] += st.st_size
+
+        memfds: dict[tuple[str, int], dict] = {}
+        for pid, container in processes.items():
+            for key, name, size in self._memfd_mappings(pid):
+                memfd = memfds.setdefault(key, {"name": name, "inode": key[1], "size": 0, "nprocs": 0, "containers": set()})
+                memfd["size"] = max(memfd["size"], size)
+                memfd["nprocs"] += 1
+                memfd["containers"].add(container)
+        for memfd in memfds.values():
+            memfd["containers"] = sorted(memfd["containers"])
+            for container in memfd["containers"]:
+                totals(container)["memfds"] += 1
+                totals(container)["memfd_bytes"] += memfd["size"]
+            report["memfd"].append(memfd)
+
+        for counters in report["containers"].values():
+            counters["total_bytes"] = counters["shm_bytes"] + counters["posix_bytes"] + counters["memfd_bytes"]
+        return report
+
+    @staticmethod
+    def _walk_files(root: str) -> Generator[tuple[str, os.stat_result], None, None]:
+        """Yield (relative path, lstat) of the regular files below root."""
+        for directory, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(directory, name)
+                with contextlib.suppress(OSError):
+                    st = os.lstat(path)
+                    if stat.S_ISREG(st.st_mode):
+                        yield os.path.relpath(path, root), st
+
+    def _memfd_mappings(self, pid: int) -> list[tuple[tuple[str, int], str, int]]:
+        """Return the memfds mapped by a process.
+
+        Returns:
+            list: ((device, inode), name, size) per memfd, the size taken
+            from the file if map_files is readable, else the mapping length
+        """
+        found: dict[tuple[str, int], tuple[str, int]] = {}
+        try:
+            with open(f"{self.proc_root}/{pid}/maps", "r") as file:
+                for line in file:
+                    if "/memfd:" not in line:
+                        continue
+                    # "7f..-7f.. rw-s 00000000 00:01 1234   /memfd:name (deleted)"
+                    address, _, _, device, inode, path = line.split(None, 5)
+                    key = (device, int(inode))
+                    start, end = (int(value, 16) for value in address.split("-"))
+                    try:
+                        size = os.stat(f"{self.proc_root}/{pid}/map_files/{address}").st_size
+                    except OSError:
+                        size = end - start
+                    name = path.strip()[len("/memfd:"):].removesuffix(" (deleted)")
+                    found[key] = (name, max(size, found.get(key, ("", 0))[1]))
+        except OSError:
+            return []  # Exited meanwhile
+        return [(key, name, size) for key, (name, size) in found.items()]
+
+
+class NamespaceInventory:
+    """Namespaces of a set of processes, indexed by namespace inode.
+
+    nsfs inode numbers are unique across namespace types, so the inode
+    alone identifies a namespace.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty inventory."""
+        self.by_inode: dict[int, dict] = {}
+
+    def add(self, ns_type: str, inode: int, pid: int, container: str) -> None:
+        """Record that a process uses a namespace.
+
+        Args:
+            ns_type: Namespace type, one of NAMESPACE_TYPES
+            inode: Namespace inode
+            pid: Host PID of the process
+            container: Name of the container the process runs in
+        """
+        entry = self.by_inode.get(inode)
+        if entry is None:
+            self.by_inode[inode] = {"type": ns_type, "inode": inode, "pid": pid, "nprocs": 1, "containers": {container}}
+            return
+        entry["nprocs"] += 1
+        entry["containers"].add(container)
+        if pid < entry["pid"]:
+            entry["pid"] = pid  # Like lsns, the lowest PID represents the namespace
+
+    def records(self) -> list[dict]:
+        """Return the namespaces sorted by type and inode, JSON-serializable."""
+        return [
+            {**entry, "containers": sorted(entry["containers"])}
+            for entry in sorted(self.by_inode.values(), key=lambda entry: (entry["type"], entry["inode"]))
+        ]
+
+
+class CgroupSampler:
+    """Read the counters of one cgroup v2 directory and derive rates.
+
+    Every sample() reads cpu.stat, memory.current, memory.stat and io.stat
+    and turns the difference to the previous read into per-second rates;
+    controllers that are not enabled for the cgroup report None.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the sampler.
+
+        Args:
+            path: cgroup directory, e.g. /sys/fs/cgroup/qm.service
+        """
+        self.path = path
+        self.previous: Optional[dict] = None
+
+    def _read_keyed(self, name: str) -> Optional[dict[str, int]]:
+        """Return a flat-keyed cgroup file ("key value" lines) as a dict."""
+        try:
+            with open(os.path.join(self.path, name), "r") as file:
+                return parse_flat_keyed(file.read())
+        except (OSError, ValueError):
+            return None
+
+    def read(self) -> dict:
+        """Return the raw counters of the cgroup.
+
+        Raises:
+            QmError: If the cgroup does not exist
+        """
+        if not os.path.isdir(self.path):
+            raise QmError(f"cgroup '{self.path}' not found; is the service running on cgroup v2?")
+        counters: dict[str, Any] = {"time": time.monotonic()}
+        counters["cpu"] = self._read_keyed("cpu.stat")
+        counters["memory"] = self._read_keyed("memory.stat")
+        try:
+            with open(os.path.join(self.path, "memory.current"), "r") as file:
+                counters["memory_current"] = int(file.read())
+        except (OSError, ValueError):
+            counters["memory_current"] = None
+        try:
+            with open(os.path.join(self.path, "io.stat"), "r") as file:
+                counters["io"] = parse_io_stat(file.read())
+        except (OSError, ValueError):
+            counters["io"] = None
+        return counters
+
+    def sample(self) -> dict:
+        """Read the counters and return gauges plus rates since the last call.
+
+        Rates are None on the first call, which only establishes a baseline.
+        """
+        current = self.read()
+        previous, self.previous = self.previous, current
+        seconds = current["time"] - previous["time"] if previous else 0
+
+        def rate(group: str, key: str, scale: float = 1) -> Optional[float]:
+            if not seconds or not current[group] or not previous[group] or key not in current[group]:
+                return None
+            return max(0, current[group][key] - previous[group].get(key, 0)) / seconds / scale
+
+        memory = current["memory"] or {}
+        cpu = rate("cpu", "usage_usec", 10**4)  # usec per second -> percent of one CPU
+        return {
+            "interval": round(seconds, 3),
+            "cpu_percent": None if cpu is None else round(cpu, 2),
+            "memory_current": current["memory_current"],
+            "memory_anon": memory.get("anon"),
+            "memory_file": memory.get("file"),
+            "pgmajfault_per_s": rate("memory", "pgmajfault"),
+            "io_read_bytes_per_s": rate("io", "rbytes"),
+            "io_write_bytes_per_s": rate("io", "wbytes"),
+            "io_read_iops": rate("io", "rios"),
+            "io_write_iops": rate("io", "wios"),
+        }
+
+
+def parse_flat_keyed(content: str) -> dict[str, int]:
+    """Parse a flat-keyed cgroup file such as cpu.stat ("key value" lines).
+
+    Raises:
+        ValueError: If a line is not a key and an integer
+    """
+    return {key: int(value) for key, value in (line.split() for line in content.splitlines())}
+
+
+def parse_io_stat(content: str) -> dict[str, int]:
+    """Return the io.stat counters summed over all devices.
+
+    Raises:
+        ValueError: If a counter is not an integer
+    """
+    totals: dict[str, int] = defaultdict(int)
+    for line in content.splitlines():  # "<major>:<minor> rbytes=N wbytes=N rios=N wios=N ..."
+        for field in line.split()[1:]:
+            key, _, value = field.partition("=")
+            totals[key] += int(value)
+    return dict(totals)
+
+
+class CgroupFileReader:
+    """Re-read cgroup files through descriptors kept open between reads.
+
+    Each file is opened once and read again with pread() at offset 0,
+    which makes the kernel regenerate its content, so a scrape costs one
+    system call per file. A descriptor that fails, e.g. because its cgroup
+    was removed and created again, is reopened once.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the reader with no open files."""
+        self.fds: dict[str, int] = {}  # Path -> open descriptor
+
+    def read(self, path: str) -> Optional[str]:
+        """Return the current content of a file, or None if it is unreadable."""
+        for _attempt in range(2):
+            fd = self.fds.get(path)
+            if fd is None:
+                try:
+                    fd = self.fds[path] = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+                except OSError:
+                    return None
+            try:
+                return os.pread(fd, METRICS_READ_SIZE, 0).decode()
+            except OSError:
+                self._close(path)
+        return None
+
+    def retain(self, directories: list[str]) -> None:
+        """Close the files outside the given directories, e.g. of stopped containers."""
+        keep = set(directories)
+        for path in [path for path in self.fds if os.path.dirname(path) not in keep]:
+            self._close(path)
+
+    def _close(self, path: str) -> None:
+        """Close the descriptor of one file."""
+        with contextlib.suppress(OSError):
+            os.close(self.fds.pop(path))
+
+    def close(self) -> None:
+        """Close every descriptor."""
+        for path in list(self.fds):
+            self._close(path)
+
+
+class MetricsBuilder:
+    """Collect samples of the METRIC_FAMILIES and render them as text.
+
+    OpenMetrics 1.0 is the default. The Prometheus 0.0.4 text format,
+    which node_exporter's textfile collector reads, names the family of a
+    counter after its samples and has no UNIT lines or EOF marker.
+    """
+
+    def __init__(self, openmetrics: bool = True) -> None:
+        """Initialize an empty exposition.
+
+        Args:
+            openmetrics: Render OpenMetrics 1.0 instead of Prometheus 0.0.4
+        """
+        self.openmetrics = openmetrics
+        self.samples: dict[str, list[tuple[str, Union[int, float]]]] = defaultdict(list)
+
+    @staticmethod
+    def _label_value(value: str) -> str:
+        """Escape a label value."""
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def add(self, family: str, value: Optional[Union[int, float]], **labels: str) -> None:
+        """Add a sample to a family of METRIC_FAMILIES; None values are skipped."""
+        if value is None:
+            return
+        rendered = ",".join(f'{name}="{self._label_value(str(label))}"' for name, label in labels.items())
+        self.samples[family].append((f"{{{rendered}}}" if rendered else "", value))
+
+    def render(self) -> str:
+        """Return the exposition text."""
+        lines = []
+        for family, (metric_type, unit, help_text) in METRIC_FAMILIES.items():
+            if family not in self.samples:
+                continue
+            name = f"{METRICS_PREFIX}_{family}"
+            sample_name = f"{name}_total" if metric_type == "counter" else name
+            if self.openmetrics:
+                lines.append(f"# TYPE {name} {metric_type}")
+                if unit:
+                    lines.append(f"# UNIT {name} {unit}")
+                lines.append(f"# HELP {name} {help_text}")
+            else:
+                lines.append(f"# HELP {sample_name} {help_text}")
+                lines.append(f"# TYPE {sample_name} {metric_type}")
+            lines += [f"{sample_name}{labels} {value}" for labels, value in self.samples[family]]
+        if self.openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class CountingStream(io.RawIOBase):
+    """Pass-through file object that feeds a TransferProgress.
+
+    tarfile in stream mode only calls read() or write(), so wrapping the
+    pipe keeps progress accounting out of the copy loop.
+    """
+
+    def __init__(self, raw: IO[bytes], progress: TransferProgress) -> None:
+        """Wrap a binary file object.
+
+        Args:
+            raw: Pipe or file to read from or write to
+            progress: Counters to update
+        """
+        super().__init__()
+        self.raw = raw
+        self.progress = progress
+
+    def readable(self) -> bool:
+        """Return True; reads are forwarded to the wrapped object."""
+        return True
+
+    def writable(self) -> bool:
+        """Return True; writes are forwarded to the wrapped object."""
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        """Read into buffer and count the bytes."""
+        count = self.raw.readinto(buffer)
+        self.progress.add_bytes(count or 0)
+        return count
+
+    def write(self, data: Any) -> int:
+        """Write data and count the bytes."""
+        count = self.raw.write(data)
+        self.progress.add_bytes(count)
+        return count
+
+
+def json_patch(old: Any, new: Any, path: str = "") -> list[dict]:
+    """Return the RFC 6902 JSON Patch operations turning old into new.
+
+    Objects are compared key by key; any other value that differs is
+    replaced as a whole.
+
+    Args:
+        old: Previous JSON-serializable value
+        new: Current JSON-serializable value
+        path: JSON Pointer of the values, "" for the document root
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return [] if old == new else [{"op": "replace", "path": path, "value": new}]
+    operations = []
+    for key in old:
+        if key not in new:
+            operations.append({"op": "remove", "path": f"{path}/{_json_pointer_token(key)}"})
+    for key, value in new.items():
+        child = f"{path}/{_json_pointer_token(key)}"
+        if key not in old:
+            operations.append({"op": "add", "path": child, "value": value})
+        else:
+            operations.extend(json_patch(old[key], value, child))
+    return operations
+
+
+def _json_pointer_token(key: Any) -> str:
+    """Escape an object key for use in a JSON Pointer (RFC 6901)."""
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+class InotifyWatcher:
+    """Wait for changes to files and directories with inotify(7).
+
+    Watches are added through libc, as Python has no inotify binding, and
+    read from one non-blocking descriptor, so waiting costs no CPU.
+    Adding a path that is already watched updates its watch in place.
+    """
+
+    def __init__(self) -> None:
+        """Create the inotify instance.
+
+        Raises:
+            OSError: If inotify is not available
+        """
+        import ctypes
+
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches: dict[int, str] = {}  # Watch descriptor -> path
+
+    def add(self, path: str, mask: int) -> bool:
+        """Watch a path; returns False if it does not exist or is not watchable."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            return False
+        self.watches[wd] = path
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> list[str]:
+        """Block until events arrive and return the paths they concern.
+
+        Args:
+            timeout: Seconds to wait, None to wait indefinitely
+
+        Returns:
+            list: Changed paths, empty if the timeout expired
+        """
+        import select as select_module
+
+        ready, _, _ = select_module.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        time.sleep(WATCH_SETTLE)
+        return self._drain()
+
+    def _drain(self) -> list[str]:
+        """Read every pending event."""
+        changed = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b"\0").decode(errors="replace")
+                offset += 16 + length
+                path = self.watches.pop(wd, "") if mask & IN_IGNORED else self.watches.get(wd, "")
+                changed.append(os.path.join(path, name) if name else path)
+
+    def close(self) -> None:
+        """Remove every watch."""
+        os.close(self.fd)
+
+
+class QmController:
+    """Manage and interact with the qm container.
+
+    This is the main class for interacting with containerized environments
+    managed by podman. It provides methods for executing commands, copying
+    files, inspecting container state, and displaying various types of
+    information about the container and its contents.
+
+    The class follows a centralized error handling pattern where all public
+    methods catch exceptions and call _print_error_and_exit() for consistent
+    error reporting and proper exit codes.
+    """
+
+    @staticmethod
+    def find_executable(binary_name: str) -> str:
+        """Find a binary in the system PATH.
+
+        Args:
+            binary_name (str): Name of the executable to find.
+
+        Returns:
+            str: Full path to the executable.
+
+        Raises:
+            FileNotFoundError: If the binary cannot be found.
+        """
+        import shutil
+
+        path = shutil.which(binary_name)
+        if path is None or not os.access(path, os.X_OK):
+            raise FileNotFoundError(f"Executable '{binary_name}' not found in PATH")
+        return path
+
+    def __init__(
+        self,
+        config_path: str = DEFAULT_CONFIG_PATH,
+        verbose: bool = False,
+        container_name: str = DEFAULT_CONTAINER_NAME,
+        transport: Optional[str] = None,
+        use_cache: bool = True,
+        timeout: Optional[float] = None,
+        output_format: Optional[str] = None,
+    ) -> None:
+        """Initialize the QmController class.
+
+        Args:
+            config_path: Path to the container configuration file
+            verbose: Enable verbose logging to stderr for debugging
+            container_name: Name of the container to interact with
+            transport: Podman transport ("auto", "api" or "cli"); defaults
+                to $QMCTL_TRANSPORT or "auto"
+            use_cache: Reuse container state cached by earlier invocations
+            timeout: Deadline in seconds for each podman or host command;
+                None waits indefinitely
+            output_format: One of OUTPUT_FORMATS to print JSON in that
+                format from every command, None to follow each --json
+        """
+        self.config_path: str = config_path  # Path to container config file
+        self.container: str = container_name  # Target container name
+        self.verbose: bool = verbose  # Verbose logging flag
+        self.output_config: OutputConfig = OutputConfig()  # Output formatting configuration
+        self.transport_mode: str = transport or os.environ.get(TRANSPORT_ENV, "auto")  # Requested transport
+        self._transport: Optional[Union[CliTransport, PodmanApiTransport]] = None  # Resolved on first use
+        self.state_cache: Optional[ContainerStateCache] = ContainerStateCache() if use_cache else None  # Cross-invocation state
+        self.timeout: Optional[float] = timeout  # Per-operation deadline
+        self.latencies: deque[dict] = deque(maxlen=LATENCY_HISTORY)  # Spawn-to-exit latency of the latest subprocesses
+        self.output_format: Optional[str] = output_format  # --output format overriding per-command --json
+        self._config: Optional[QuadletConfig] = None  # Merged config, reused while its files are unchanged
+        self._config_lock = threading.Lock()  # One parse shared by concurrent `show all` topics
+        self._metrics_reader: Optional[CgroupFileReader] = None  # cgroup files kept open between scrapes
+        self._metrics_names: dict[str, str] = {}  # Nested container ID -> name label
+
+    @property
+    def transport(self) -> Union[CliTransport, PodmanApiTransport]:
+        """Return the podman transport, selecting it on first use."""
+        if self._transport is None:
+            self._transport = select_transport(self._run_subprocess, self.transport_mode, timeout=self.timeout)
+            self._log_path("Transport", self._transport.name)
+        return self._transport
+
+    def _log_path(self, action: str, path: str) -> None:
+        """Log the action being performed on a path if verbose is enabled.
+
+        Args:
+            action: Description of the action being performed (e.g., "Reading", "Writing")
+            path: File system path being acted upon
+        """
+        if self.verbose:
+            print(f"[verbose] {action}: {path}", file=sys.stderr)
+
+    def _run_subprocess(self, cmd: list[str], **kwargs: Any) -> subprocess.CompletedProcess:
+        """Safely run a subprocess command.
+
+        Args:
+            cmd (List[str]): Command to run (must be a list of args, not a string).
+            **kwargs: Additional arguments to pass to subprocess.run.
+
+        Returns:
+            subprocess.CompletedProcess: The completed process result.
+
+        Raises:
+            TypeError: If cmd is not a list.
+            ValueError: If shell=True is passed in kwargs.
+            CommandTimeoutError: If the controller deadline (or a shorter
+                `timeout` in kwargs) expires.
+        """
+        if not isinstance(cmd, list):
+            raise TypeError("Command must be a list, not a string")
+        if not all(isinstance(c, str) for c in cmd):
+            raise TypeError("All command arguments must be strings")
+        if kwargs.get("shell", False):
+            raise ValueError("shell=True is forbidden for security reasons")
+
+        defaults = {
+            "capture_output": True,
+            "text": True,
+            "check": False,
+        }
+        options = kwargs if kwargs else defaults  # sourcery skip=or-if-exp-identity
+        start = time.monotonic()
+        try:
+            if self.timeout is None:
+                return subprocess.run(    # nosec B603
+                    cmd,
+                    **options,
+                )
+            return self._run_with_deadline(cmd, dict(options))
+        except CommandTimeoutError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"subprocess.run failed: {e}") from e
+        finally:
+            self._record_latency(cmd, time.monotonic() - start)
+
+    def _run_with_deadline(self, cmd: list[str], options: dict) -> subprocess.CompletedProcess:
+        """Run a command in its own process group, killing the group at the deadline.
+
+        subprocess.run only kills the direct child on timeout, which leaves
+        e.g. conmon or shell pipelines behind; here the whole group goes.
+
+        Args:
+            cmd: Command to run
+            options: subprocess.run style options
+
+        Returns:
+            subprocess.CompletedProcess: The completed process result.
+
+        Raises:
+            CommandTimeoutError: If the deadline expires
+        """
+        timeout = min(self.timeout, options.pop("timeout", None) or self.timeout)
+        check = options.pop("check", False)
+        if options.pop("capture_output", False):
+            options["stdout"] = options["stderr"] = subprocess.PIPE
+        with subprocess.Popen(cmd, start_new_session=True, **options) as proc:  # nosec B603
+            try:
+                stdout, stderr = proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                kill_process_group(proc)
+                proc.communicate()
+                raise CommandTimeoutError(cmd, timeout) from None
+        result = subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+        if check:
+            result.check_returncode()
+        return result
+
+    def _record_latency(self, cmd: list[str], seconds: float) -> None:
+        """Remember how long a command took from spawn to exit."""
+        self.latencies.append({"command": cmd, "latency_ms": round(seconds * 1000, 3)})
+        self._log_path("Latency", f"{seconds * 1000:.1f} ms for {' '.join(cmd)}")
+
+    def _print_error_and_exit(self, error: QmError) -> None:
+        """Print error and exit - centralized error handling.
+
+        This method provides consistent error handling across all public methods.
+        It formats the error message and exits with the appropriate code.
+
+        Args:
+            error: The error object to handle and display
+        """
+        if isinstance(error, QmError):
+            self._print_output({"Error": str(error)})
+            exit(error.exit_code)  # Use the specific exit code from the error
+        else:
+            self._print_output({"Error": str(error)})
+            exit(1)  # Default exit code for unexpected errors
+
+    def _validate_path_exists(self, path: str) -> None:
+        """Check if a path exists on the filesystem.
+
+        Args:
+            path: File system path to validate
+
+        Raises:
+            ConfigNotFoundError: If the path does not exist
+        """
+        if not os.path.exists(path):
+            raise ConfigNotFoundError(path)
+
+    def _validate_container_exists(self) -> None:
+        """Check if the target container exists and is accessible.
+
+        Raises:
+            ContainerNotFoundError: If the container is not found or not running
+        """
+        if not self._container_exists(self.container):
+            raise ContainerNotFoundError(self.container)
+
+    def _validate_devices_specified(self, devices: list[str]) -> None:
+        """Validate that at least one device is specified for operations.
+
+        Args:
+            devices: List of device paths to validate
+
+        Raises:
+            ValidationError: If no devices are provided
+        """
+        if not devices:
+            raise ValidationError(
+                "No devices specified in the container config. "
+                "Please add 'AddDevice=' entries to the config file."
+            )
+
+    def _validate_command_provided(self, command: list[str], context: str = "") -> None:
+        """Validate that a command is provided for execution.
+
+        Args:
+            command: List of command components to validate
+            context: Additional context for error messages
+
+        Raises:
+            ValidationError: If no command is provided
+        """
+        if not command:
+            context_msg = f" {context}" if context else ""
+            raise ValidationError(f"No command provided{context_msg}.")
+
+    def _validate_paths_for_cp(self, paths: list[str]) -> tuple[str, str]:
+        """Validate and extract source and destination paths for copy operations.
+
+        Ensures exactly two paths are provided and that exactly one contains
+        the container prefix (container_name:).
+
+        Args:
+            paths: List of paths for copy operation
+
+        Returns:
+            Tuple of (source_path, destination_path)
+
+        Raises:
+            ValidationError: If paths are malformed or missing container prefix
+        """
+        if not paths or len(paths) != 2:
+            raise ValidationError(
+                "Please provide source and destination paths."
+            )
+
+        src, dst = paths
+        container_prefix = f"{self.container}:"
+        # Use XOR to ensure exactly one path has container prefix
+        if not ((container_prefix in src) ^ (container_prefix in dst)):
+            raise ValidationError(
+                f"Provide `{self.container}:` only in source or destination"
+            )
+
+        return src, dst
+
+    def _validate_paths_for_batch_cp(self, paths: list[str]) -> tuple[list[str], str]:
+        """Validate the paths of a copy with several sources.
+
+        Either every source or the destination carries the container
+        prefix (container_name:), never both.
+
+        Args:
+            paths: Source paths followed by the destination path
+
+        Returns:
+            Tuple of (source_paths, destination_path)
+
+        Raises:
+            ValidationError: If the paths mix directions or two sources
+                share a base name
+        """
+        if not paths or len(paths) < 2:
+            raise ValidationError(
+                "Please provide source and destination paths."
+            )
+
+        *sources, dst = paths
+        container_prefix = f"{self.container}:"
+        to_container = dst.startswith(container_prefix)
+        if any(src.startswith(container_prefix) == to_container for src in sources):
+            raise ValidationError(
+                f"Provide `{self.container}:` either in all sources or in the destination"
+            )
+        names = [os.path.basename(os.path.normpath(split_container_path(src)[1])) for src in sources]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValidationError(f"Sources would overwrite each other in the destination: {', '.join(duplicates)}")
+
+        return sources, dst
+
+    def _validate_exec_command(self, command: list[str]) -> tuple[str, list[str]]:
+        """Validate command for nested container execution and extract components.
+
+        Args:
+            command: List containing container name and command arguments
+
+        Returns:
+            Tuple of (container_name, command_arguments)
+
+        Raises:
+            ValidationError: If command format is invalid
+        """
+        self._validate_command_provided(command, "to execute in container")
+
+        if len(command) < 2:
+            raise ValidationError("No command provided to execute.")
+        return command[0], command[1:]  # Split container name from command args
+
+    def _container_exists(self, name: str) -> bool:
+        """Check if a podman container with the given name exists.
+
+        A valid entry in the container state cache answers without contacting
+        podman. On a miss the container is inspected once, which both answers
+        and refreshes the cache; without a cache the cheaper 'podman
+        container exists' (or its API equivalent) is used.
+
+        Args:
+            name: Container name to check
+
+        Returns:
+            True if container exists and is accessible, False otherwise
+
+        Raises:
+            QmError: If the podman command fails unexpectedly
+        """
+        if self.state_cache and self.state_cache.get(name):
+            self._log_path("Cache hit", name)
+            return True
+        try:
+            if not self.state_cache:
+                return self.transport.container_exists(name)
+            info = self.transport.inspect(name)
+        except ContainerNotFoundError:
+            return False
+        except Exception as e:
+            raise QmError(str(e)) from e
+        with contextlib.suppress(QmError):
+            self._store_container_state(name, info)  # Not running: nothing to cache
+        return True
+
+    def _container_state(self, name: str) -> dict:
+        """Return the state of a running container, inspecting on a cache miss.
+
+        Args:
+            name: Container name
+
+        Returns:
+            dict with "id", "pid" (host PID of the init process),
+            "start_time" and "oci_config" (path of the OCI runtime spec)
+
+        Raises:
+            ContainerNotFoundError: If the container does not exist
+            QmError: If the container is not running
+        """
+        state = self.state_cache.get(name) if self.state_cache else None
+        if state:
+            return state
+
+        return self._store_container_state(name, self.transport.inspect(name))
+
+    def _store_container_state(self, name: str, info: dict) -> dict:
+        """Cache and return the state of a container from its inspect document.
+
+        Raises:
+            QmError: If the container is not running
+        """
+        pid = int(info.get("State", {}).get("Pid") or 0)
+        if not pid:
+            raise QmError(f"Container '{name}' is not running.")
+        if self.state_cache:
+            state = self.state_cache.put(name, info.get("Id", ""), pid, oci_config=info.get("OCIConfigPath", ""))
+        return state or {
+            "id": info.get("Id", ""),
+            "pid": pid,
+            "start_time": read_process_start_time(pid),
+            "oci_config": info.get("OCIConfigPath", ""),
+        }
+
+    @staticmethod
+    def _inner_api(qm_root: str) -> Optional[PodmanApiTransport]:
+        """Return the podman API inside QM if its socket answers from the host."""
+        api = PodmanApiTransport(qm_root + PODMAN_SOCKET_PATH)
+        if os.path.exists(api.socket_path) and api.ping():
+            return api
+        return None
+
+    def _list_nested(self) -> list[str]:
+        """Return the names of the running nested containers, sorted.
+
+        Raises:
+            QmError: If the containers cannot be listed
+        """
+        api = None
+        with contextlib.suppress(QmError, OSError, KeyError, TypeError, ValueError):
+            api = self._inner_api(f"/proc/{self._container_state(self.container)['pid']}/root")
+        if api:
+            return sorted(entry["Names"][0] for entry in api.list_containers() if entry.get("Names"))
+        result = self.transport.exec(self.container, ["podman", "ps", "--format", "{{.Names}}"])
+        if result.returncode != 0:
+            raise QmError(f"Failed to list nested containers: {result.stderr.strip()}")
+        return sorted(line.strip() for line in result.stdout.splitlines() if line.strip())
+
+    def _inspect_nested(self, name: str, qm_root: str) -> dict:
+        """Inspect a nested container, preferring the podman API inside QM.
+
+        The inner podman socket is reached through QM's root directory, so
+        no process is started. When the socket is not active, a single
+        `podman inspect` is run inside QM instead.
+
+        Args:
+            name: Nested container name
+            qm_root: Host path of QM's root directory (/proc/<pid>/root)
+
+        Returns:
+            dict: The inspect document of the nested container
+        """
+        api = self._inner_api(qm_root)
+        if api:
+            return api.inspect(name)
+        result = self.transport.exec(self.container, PODMAN_INSPECT + [name])
+        if result.returncode != 0:
+            raise QmError(f"Failed to inspect container '{name}': {result.stderr.strip()}")
+        data = json.loads(result.stdout or "[]")
+        if not data:
+            raise ContainerNotFoundError(name)
+        return data[0]
+
+    def _nested_state(self, name: str) -> dict:
+        """Return the state of a nested container, inspecting on a cache miss.
+
+        Args:
+            name: Nested container name
+
+        Returns:
+            dict with "pid" (PID inside QM), "proc_root" (host path of QM's
+            procfs), "env", "user" and "workdir"
+
+        Raises:
+            ContainerNotFoundError: If the container does not exist
+            QmError: If QM or the nested container is not running
+        """
+        key = f"{self.container}/{name}"
+        state = self.state_cache.get(key) if self.state_cache else None
+        if state:
+            return state
+
+        qm_root = f"/proc/{self._container_state(self.container)['pid']}/root"
+        info = self._inspect_nested(name, qm_root)
+        pid = int(info.get("State", {}).get("Pid") or 0)
+        if not pid:
+            raise QmError(f"Container '{name}' is not running.")
+        config = info.get("Config") or {}
+        details = {"env": list(config.get("Env") or []), "user": config.get("User") or "", "workdir": config.get("WorkingDir") or ""}
+        if self.state_cache:
+            state = self.state_cache.put(key, info.get("Id", ""), pid, proc_root=f"{qm_root}/proc", **details)
+        return state or {"id": info.get("Id", ""), "pid": pid, "proc_root": f"{qm_root}/proc", **details}
+
+    def _single_hop_command(self, name: str, command: list[str]) -> Optional[list[str]]:
+        """Build a host command that runs directly in a nested container.
+
+        Instead of `podman exec qm podman exec <name>`, nsenter joins the
+        nested container's namespaces from the host, reaching them through
+        QM's procfs, and changes to the container's working directory. The
+        command starts under the container's `env` so it gets the container
+        environment; nothing from the nested container is evaluated on the
+        host. Only namespaces are entered: the command keeps the host's
+        SELinux label, capabilities, cgroup and lack of a seccomp filter,
+        which is why execin only uses it when asked to (--single-hop).
+
+        Args:
+            name: Nested container name
+            command: Command and arguments to run
+
+        Returns:
+            The nsenter command line, or None when the single hop cannot be
+            used (not root, no nsenter, a non-root container user, no `env`
+            in the container or the container cannot be resolved)
+        """
+        if os.geteuid() != 0:
+            return None
+        try:
+            nsenter = self.find_executable("nsenter")
+            state = self._nested_state(name)
+            target = f"{state['proc_root']}/{int(state['pid'])}"
+            if str(state.get("user", "")) not in ("", "0", "root", "0:0", "root:root"):
+                raise QmError(f"container runs as user '{state['user']}'")
+            env_binary = next((path for path in NESTED_ENV_BINARIES if os.path.lexists(f"{target}/root{path}")), None)
+            if env_binary is None:
+                raise QmError("no env binary in the container")
+            namespaces = [
+                f"{option}={target}/ns/{ns}"
+                for ns, option in NSENTER_NAMESPACES.items()
+                if os.stat(f"{target}/ns/{ns}").st_ino != os.stat(f"/proc/self/ns/{ns}").st_ino
+            ]
+            workdir = resolve_in_root(f"{target}/root", state.get("workdir") or "/")
+        except (QmError, OSError, ValueError, KeyError, TypeError) as e:
+            self._log_path("Single hop unavailable", f"{name}: {e}")
+            return None
+        # Only KEY=VALUE entries are passed, so none can be taken for an env option
+        env = [entry for entry in state.get("env", []) if "=" in entry and not entry.startswith("-")]
+        return [nsenter, *namespaces, f"--wd={workdir}", "--", env_binary, "-i", *env, *command]
+
+    def _check_subprocess_result(self, result: subprocess.CompletedProcess, context: str, command: list[str], allow_empty: bool = False) -> None:
+        """Check subprocess result and raise appropriate errors.
+
+        Analyzes the result of a subprocess execution and raises specific
+        exceptions based on the error conditions detected.
 
         Args:
             result: Completed subprocess result to analyze
             context: Description of the operation for error messages
             command: Original command that was executed
+            allow_empty: Accept a successful command without output
 
         Raises:
             CommandNotFoundError: If command was not found in container
@@ -435,39 +3050,55 @@ class QmController:
             )
 
         # Check for empty output (might indicate a problem)
-        if not result.stdout.strip():
+        if not allow_empty and not result.stdout.strip():
             raise QmError(f"{context} No output returned.")
 
     def _extract_devices_from_config(self) -> list[str]:
-        """Extract device paths from config file."""
-        devices = []
-        for line in self._read_config_lines(ADD_DEVICE_PREFIX):
-            # Extract path after "AddDevice=" and remove leading "-" if present
-            path = line.split("=", 1)[1].lstrip("-").strip()
-            devices.append(path)
-        return devices
+        """Extract device paths from the config file and its drop-ins."""
+        # Remove the leading "-" that marks a device as optional
+        return [value.lstrip("-").strip() for value in self._load_config().lookup_all("Container", ADD_DEVICE_KEY)]
 
-    def _run_command_for_each_device(self, devices, base_command):
-        """Run a command for each device in the container.
+    def _probe_devices(self, devices: list[str]) -> dict[str, dict]:
+        """Probe every device in the container with a single exec.
 
         Args:
-            devices (list): List of device paths to test
-            base_command (list): Base command to run (e.g., ["test", "-e"])
+            devices: List of device paths to probe
 
         Returns:
-            dict: Device path -> success boolean mapping
-        """
-        results = {}
-        for device in devices:
-            command = base_command + [device]
-            full_command = PODMAN_EXEC + [self.container] + command
-            result = self._run_subprocess(
-                full_command,
-                stdout=subprocess.DEVNULL,  # overrides defaults
-                stderr=subprocess.DEVNULL,  # overrides defaults
+            dict: Device path -> {"present", "type", "major_minor", "readable"}
+
+        Raises:
+            QmError: If the probe script cannot be run in the container
+        """
+        command = ["sh", "-c", DEVICE_PROBE_SCRIPT, "sh", *devices]
+        result = self.transport.exec(self.container, command)
+        if result.returncode != 0:
+            raise QmError(
+                f"Failed to probe devices in container '{self.container}': "
+                f"{result.stderr.strip()}"
             )
-            results[device] = result.returncode == 0
-        return results
+
+        details = {
+            device: {"present": False, "type": None, "major_minor": None, "readable": False}
+            for device in devices
+        }
+        for line in result.stdout.splitlines():
+            fields = line.split("\t")
+            if len(fields) != 5 or fields[0] not in details:
+                continue
+            path, present, dev_type, readable, major_minor = fields
+            if present != "1":
+                continue
+            if major_minor:
+                major, minor = major_minor.split(":")
+                major_minor = f"{int(major, 16)}:{int(minor, 16)}"
+            details[path] = {
+                "present": True,
+                "type": dev_type,
+                "major_minor": major_minor or None,
+                "readable": readable == "1",
+            }
+        return details
 
     def _print_output(self, data: dict) -> None:
         """Print data as either plain text or JSON.
@@ -484,11 +3115,11 @@ class QmController:
             self._print_text_output(data)
 
     def _print_json_output(self, data: dict) -> None:
-        """Print data as JSON."""
-        print(json.dumps(
-            data,
-            indent=DEFAULT_JSON_INDENT if self.output_config.pretty else None
-        ))
+        """Print data as JSON, or as one JSON record per line for NDJSON."""
+        if self.output_config.ndjson:
+            print("".join(f"{json_dumps(record)}\n" for record in ndjson_records(data)), end="", flush=True)
+            return
+        print(json_dumps(data, indent=DEFAULT_JSON_INDENT if self.output_config.pretty else None), flush=True)
 
     def _print_text_output(self, data: dict) -> None:
         """Print data as formatted text."""
@@ -523,73 +3154,413 @@ class QmController:
         """Check if data contains only boolean values."""
         return all(isinstance(v, bool) for v in data.values())
 
-    def _verify_devices_existence(self) -> None:
-        """Verify that devices specified in the config exist on the system."""
-        self._log_path("Reading", self.config_path)
-        devices = self._extract_devices_from_config()
+    def parse_to_dict(self, content: str) -> dict:
+        """Parse an INI-style string content into a dictionary.
 
-        self._validate_devices_specified(devices)
+        Args:
+            content (str): The string content to parse.
+
+        Returns:
+            dict: {section: {key: value}}, where keys in MULTI_VALUE_KEYS
+                map to the list of their values in order.
+        """
+        return QuadletConfig.from_text(content).sections()
+
+    def _show_collectors(self) -> dict[str, Callable[[], Union[dict, str]]]:
+        """Return the data collector for every `show all` topic, in order."""
+        return {
+            "container": self._collect_container,
+            "unix-domain-sockets": self._collect_unix_sockets,
+            "shared-memory": self._collect_shared_memory,
+            "resources": self._collect_resources_snapshot,
+            "available-devices": self._collect_available_devices,
+            "namespaces": self._collect_namespaces,
+        }
+
+    def _gather(self, collectors: dict[str, Callable[[], Union[dict, str]]], workers: int = SHOW_ALL_WORKERS, action: str = "Gathering", label: str = "topics") -> list[tuple[str, Union[dict, str, QmError]]]:
+        """Run collectors concurrently on a bounded worker pool.
+
+        Args:
+            collectors: Ordered mapping of key (topic, container name) -> collector
+            workers: Maximum number of collectors running at once
+            action: Verbose log action, e.g. "Gathering"
+            label: What the collectors are counted as in the verbose log
+
+        Returns:
+            list: (key, data or QmError) pairs in the order of collectors
+        """
+        # Resolving the transport here keeps its lazy setup out of the workers
+        self._log_path(action, f"{len(collectors)} {label} via {self.transport.name} transport")
+
+        def run(collector: Callable[[], Union[dict, str]]) -> Union[dict, str, QmError]:
+            try:
+                return collector()
+            except QmError as e:
+                return e
+            except Exception as e:
+                return QmError(f"Failed to execute command: {e}")
+
+        import concurrent.futures
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {topic: pool.submit(run, collector) for topic, collector in collectors.items()}
+            return [(topic, future.result()) for topic, future in futures.items()]
+
+    def _emit_topic(self, data: Union[dict, str]) -> None:
+        """Print collected topic data; strings are printed verbatim."""
+        if isinstance(data, str):
+            print(data, end="")
+        else:
+            self._print_output(data)
+
+    def show_all(self, output_json: bool = False, pretty: bool = True) -> None:
+        """Display every show topic, gathered concurrently.
+
+        Topics are collected on a bounded worker pool and printed in a
+        fixed order. With JSON output they are merged into one document
+        keyed by topic name. Resource usage is a one-shot sample.
+
+        Args:
+            output_json (bool): If True, format the output as JSON.
+            pretty (bool): If True and output_json is True, pretty-print
+                the JSON.
+        """
+        self._configure_output(output_json, pretty)
+        results = self._gather(self._show_collectors())
+
+        failures = [data for _, data in results if isinstance(data, QmError)]
+        if self.output_config.output_json:
+            self._print_output({
+                topic: {"Error": str(data)} if isinstance(data, QmError) else data
+                for topic, data in results
+            })
+        else:
+            for _, data in results:
+                if isinstance(data, QmError):
+                    self._print_error_output({"Error": str(data)})
+                else:
+                    self._emit_topic(data)
+
+        if failures:
+            exit(failures[0].exit_code)
+
+    def _collect_container(self) -> Union[dict, str]:
+        """Return the raw config and drop-ins in text mode, or the merged sections for JSON."""
+        config = self._load_config()
+
+        if self.output_config.output_json:
+            return {
+                "path": self.config_path,
+                "dropins": config.files[1:],
+                "sections": config.sections(),
+                "provenance": config.provenance(),
+            }
+
+        content = []
+        for path in config.files:  # Laid out like `systemctl cat`
+            with open(path, "r") as file:
+                content.append(f"# {path}\n{file.read()}")
+        return "\n".join(content)
+
+    def show_container(self, output_json: bool = False, pretty: bool = True) -> None:
+        """Display the content of the container configuration file.
+
+        Args:
+            output_json (bool): If True, format the output as JSON.
+            pretty (bool): If True and output_json is True, pretty-print
+                the JSON.
+        """
+        self._configure_output(output_json, pretty)
+
+        try:
+            self._emit_topic(self._collect_container())
+        except Exception as e:
+            self._print_error_and_exit(as_qm_error(e))
+
+    def _watch_paths(self, topic: str) -> list[tuple[str, int]]:
+        """Return the paths whose inotify events can change a show topic.
+
+        Args:
+            topic: Show topic name, or "all"
+
+        Returns:
+            list: (path, inotify mask) pairs; missing paths are skipped
+                when the watches are added
+        """
+        paths = []
+        if topic in ("container", "available-devices", "all"):
+            unit = os.path.basename(self.config_path)
+            for unit_dir in quadlet_unit_dirs() + [os.path.dirname(self.config_path)]:
+                paths.append((unit_dir, WATCH_DIR_MASK))  # A drop-in directory may be created later
+                for dropin_dir in (f"{unit}.d", f"{os.path.splitext(unit)[1][1:]}.d"):
+                    paths.append((os.path.join(unit_dir, dropin_dir), WATCH_DIR_MASK))
+            paths += [(path, WATCH_FILE_MASK) for path in QuadletConfig.find_files(self.config_path, quadlet_unit_dirs())]
+        if topic == "container":
+            return paths
+
+        cgroup = self._qm_cgroup()
+        paths += [(os.path.join(cgroup, name), IN_MODIFY) for name in WATCH_CGROUP_EVENT_FILES]
+        for directory, _, _ in os.walk(cgroup):  # Nested containers start and stop as cgroups come and go
+            paths.append((directory, IN_CREATE | IN_DELETE | IN_ONLYDIR))
+        if topic in ("available-devices", "all"):
+            try:
+                root = f"/proc/{self._container_state(self.container)['pid']}/root"
+                devices = self._extract_devices_from_config()
+            except QmError:
+                return paths  # QM is not running; cgroup.events reports when it starts
+            for directory in sorted({"/dev"} | {os.path.dirname(device) for device in devices}):
+                paths.append((root + directory, WATCH_DIR_MASK))
+        return paths
+
+    def _watch_collector(self, topic: str, details: bool = False) -> Callable[[], Union[dict, str]]:
+        """Return a function collecting a show topic that reports errors as data."""
+        if topic == "all":
+            collectors = {name: collector for name, collector in self._show_collectors().items() if name != "resources"}
+
+            def collect() -> Union[dict, str]:
+                return {name: {"Error": str(data)} if isinstance(data, QmError) else data for name, data in self._gather(collectors)}
+        else:
+            collector = self._show_collectors()[topic]
+
+            def collect() -> Union[dict, str]:
+                try:
+                    if topic == "available-devices" and details:
+                        return self._collect_available_devices(details=True)
+                    return collector()
+                except Exception as e:  # e.g. the config being replaced or QM restarting
+                    return {"Error": str(as_qm_error(e))}
+        return collect
+
+    def _emit_watch_update(self, topic: str, previous: Optional[Union[dict, str]], data: Union[dict, str]) -> None:
+        """Print a changed topic: one NDJSON line, or the re-rendered text."""
+        timestamp = round(time.time(), 3)
+        if self.output_config.output_json:
+            update: dict = {"timestamp": timestamp, "topic": topic}
+            if previous is None:
+                update["snapshot"] = data
+            else:
+                update["patch"] = json_patch(previous, data)
+            print(json_dumps(update), flush=True)
+            return
+
+        if sys.stdout.isatty():
+            print("\033[H\033[2J", end="")  # Redraw in place like watch(1)
+        print(f"{time.strftime('%H:%M:%S', time.localtime(timestamp))} qmctl show {topic}\n")
+        for value in data.values() if topic == "all" else [data]:
+            self._emit_topic(value)
+        sys.stdout.flush()
+
+    def watch_topic(self, topic: str, output_json: bool = False, pretty: bool = True, interval: Optional[float] = None, count: int = 0, details: bool = False) -> None:
+        """Print a show topic whenever its data changes.
+
+        The process sleeps on inotify watches of the config file and its
+        drop-ins and of the cgroup event files of qm.service, and collects
+        the topic again only when one of them changes. Topics read from
+        /proc, which has no inotify events, are also re-checked every
+        interval. Output is printed only if the collected data differs:
+        re-rendered text, or with output_json one JSON object per line, a
+        snapshot first and then RFC 6902 patches against the previous one.
+
+        Args:
+            topic (str): Show topic name, or "all" for every topic except
+                resources.
+            output_json (bool): If True, print newline-delimited JSON.
+            pretty (bool): This parameter is ignored; JSON updates are one
+                per line.
+            interval (float): Seconds between re-checks of /proc topics,
+                0 to rely on inotify alone; defaults to WATCH_INTERVAL.
+            count (int): Stop after this many updates, 0 to run until
+                interrupted with Ctrl+C.
+            details (bool): Report device details (available-devices).
+        """
+        self._configure_output(output_json, False)
+        watcher = None
+        try:
+            if topic == "resources":
+                raise ValidationError("'show resources' already samples continuously; use --interval and --count instead of --watch.")
+            if count < 0 or (interval is not None and interval < 0):
+                raise ValidationError("The interval and count must be non-negative.")
+            if interval is None:
+                interval = WATCH_INTERVAL if topic in WATCH_POLLED_TOPICS else 0
+            collect = self._watch_collector(topic, details)
+            watcher = InotifyWatcher()
+
+            previous, emitted = None, 0
+            while True:
+                for path, mask in self._watch_paths(topic):  # Before collecting, so no change is missed
+                    watcher.add(path, mask)
+                data = collect()
+                if data != previous:
+                    self._emit_watch_update(topic, previous, data)
+                    previous, emitted = data, emitted + 1
+                    if count and emitted >= count:
+                        return
+                changed = watcher.wait(interval or None)
+                self._log_path("Changed", ", ".join(sorted(set(changed))) or "(interval)")
+        except KeyboardInterrupt:
+            msg = "KeyboardInterrupt: Exiting show watch."
+            self._print_error_and_exit(QmError(msg, exit_code=0))
+        except Exception as e:
+            self._print_error_and_exit(as_qm_error(e))
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+    def _introspector(self) -> ProcIntrospector:
+        """Return a host-side /proc introspector for the QM container."""
+        return ProcIntrospector(self._container_state(self.container)["pid"])
+
+    @staticmethod
+    def _format_table(records: list[dict], columns: list[str]) -> str:
+        """Format records as a text table with upper-case column headers."""
+        rows = [[column.upper() for column in columns]]
+        rows += [[str(record.get(column, "")) for column in columns] for record in records]
+        widths = [max(len(row[index]) for row in rows) for index in range(len(columns))]
+        return "".join(" ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() + "\n" for row in rows)
+
+    def _collect_unix_sockets(self) -> Union[dict, str]:
+        """Return the UNIX domain sockets listening inside the container."""
+        sockets = self._introspector().unix_sockets()
+        if self.output_config.output_json:
+            return {"UNIX domain sockets": sockets}
+        return self._format_table(sockets, ["type", "state", "inode", "path"])
+
+    def show_unix_sockets(self, output_json: bool = False, pretty: bool = True) -> None:
+        """Show listening UNIX domain sockets of the container.
+
+        Read from /proc/<pid>/net/unix of the QM init process on the host.
+
+        Args:
+            output_json (bool): If True, format the output as JSON.
+            pretty (bool): If True and output_json is True, pretty-print
+                the JSON.
+        """
+        self._configure_output(output_json, pretty)
+        try:
+            self._emit_topic(self._collect_unix_sockets())
+        except Exception as e:
+            self._print_error_and_exit(as_qm_error(e))
 
-        base_command = ["test", "-e"]
-        results = self._run_command_for_each_device(devices, base_command)
+    def _collect_shared_memory(self) -> Union[dict, str]:
+        """Return shared memory usage of QM and its nested containers."""
+        report = self._introspector().shared_memory(self._container_processes())
+        if self.output_config.output_json:
+            return {"Shared memory": report}
+        containers = [{"container": name, **counters} for name, counters in sorted(report["containers"].items())]
+        for row in containers:
+            for key in ("shm_bytes", "posix_bytes", "memfd_bytes", "total_bytes"):
+                row[key] = _format_bytes(row[key])
+        orphaned = [segment for segment in report["shm"] if segment["orphaned"]]
+        return "".join([
+            "Shared memory per container:\n" + self._format_table(
+                containers, ["container", "shm_segments", "shm_bytes", "posix_files", "posix_bytes", "memfds", "memfd_bytes", "total_bytes"]),
+            "SysV segments:\n" + self._format_table(report["shm"], ["container", "key", "shmid", "perms", "size", "nattch", "cpid"]),
+            "Orphaned SysV segments (no attachments):\n" + self._format_table(orphaned, ["container", "key", "shmid", "size", "cpid"]),
+            "POSIX shared memory:\n" + self._format_table(report["posix"], ["container", "path", "size", "allocated"]),
+            "memfd mappings:\n" + self._format_table(
+                [{**memfd, "containers": ",".join(memfd["containers"])} for memfd in report["memfd"]],
+                ["name", "inode", "size", "nprocs", "containers"]),
+        ])
 
-        self._print_output(results)
+    def show_shared_memory(self, output_json: bool = False, pretty: bool = True) -> None:
+        """Show shared memory pinned by QM and each nested container.
 
-    def _run_show_command_func(self, show_command_func: Callable) -> None:
-        """Run a command and print its output.
+        Reports SysV segments (with attach counts; unattached ones are
+        flagged as orphaned), files in /dev/shm and mapped memfds, with
+        totals per container. Everything is read from the host's /proc.
 
         Args:
-            show_command_func (callable): The function to run.
+            output_json (bool): If True, format the output as JSON.
+            pretty (bool): If True and output_json is True, pretty-print
+                the JSON.
         """
+        self._configure_output(output_json, pretty)
         try:
-            show_command_func()
+            self._emit_topic(self._collect_shared_memory())
         except Exception as e:
-            self._print_error_and_exit(
-                QmError(f"Failed to execute command: {str(e)}")
-            )
+            self._print_error_and_exit(as_qm_error(e))
 
-    class HandleLineInContent:
-        """Helper class to parse a single line of INI-style content."""
+    @staticmethod
+    def _qm_cgroup() -> str:
+        """Return the cgroup v2 directory of qm.service."""
+        return os.path.join(CGROUP_ROOT, QM_CGROUP)
 
-        def __init__(self, parsed: dict, current_section: Optional[str] = None) -> None:
-            """Initialize the handler for a line in the content."""
-            self.parsed = parsed
-            self.current_section = current_section
+    def _collect_resources_snapshot(self) -> dict:
+        """Return one resource sample of qm.service over a short interval."""
+        sampler = CgroupSampler(self._qm_cgroup())
+        sampler.sample()
+        time.sleep(RESOURCES_SNAPSHOT_INTERVAL)
+        return {"Resources": {"cgroup": QM_CGROUP, **sampler.sample()}}
 
-        def handle(self, stripped_line: str) -> None:
-            """Handle a line in the content based on its format."""
-            if not stripped_line or stripped_line.startswith("#"):
-                return
-            if stripped_line.startswith("[") and stripped_line.endswith("]"):
-                self.current_section = stripped_line[1:-1]
-                self.parsed[self.current_section] = {}
-            elif "=" in stripped_line and self.current_section:
-                key, value = map(str.strip, stripped_line.split("=", 1))
-                self.parsed[self.current_section][key] = value
-            elif self.current_section:
-                self.parsed[self.current_section][stripped_line] = True
-
-        def get_parsed(self) -> dict:
-            """Return the parsed content."""
-            return self.parsed
+    def show_resources(self, output_json: bool = False, pretty: bool = True, interval: float = RESOURCES_INTERVAL, count: int = 0, per_container: bool = False, sort: str = "cpu", top: int = 0) -> None:
+        """Sample resource usage of qm.service from its cgroup v2 files.
 
-    def parse_to_dict(self, content: str) -> dict:
-        """Parse an INI-style string content into a dictionary.
+        CPU, memory and IO counters are read directly from the cgroup every
+        interval and reported with rates computed from the deltas: as a
+        table, or as one JSON object per line with output_json.
 
         Args:
-            content (str): The string content to parse.
-
-        Returns:
-            dict: A dictionary representing the parsed content.
+            output_json (bool): If True, print newline-delimited JSON.
+            pretty (bool): This parameter is ignored; samples are one per
+                line.
+            interval (float): Seconds between samples.
+            count (int): Number of samples to print, 0 to run until
+                interrupted with Ctrl+C. Use 1 for a one-shot measurement.
+            per_container (bool): If True, report every nested container
+                below qm.service instead of the qm.service total.
+            sort (str): Per-container ranking, one of RESOURCES_SORT_KEYS.
+            top (int): Per-container row limit per sample, 0 for all.
         """
-        handle_line_in_context = self.HandleLineInContent(defaultdict(dict))
+        self._configure_output(output_json, pretty)
+        try:
+            if interval <= 0 or count < 0 or top < 0:
+                raise ValidationError("The interval must be positive and the count and top non-negative.")
+            if sort not in RESOURCES_SORT_KEYS:
+                raise ValidationError(f"Unknown sort key '{sort}', expected one of: {', '.join(RESOURCES_SORT_KEYS)}")
+            if per_container:
+                self._show_container_resources(interval, count, sort, top)
+                return
+            sampler = CgroupSampler(self._qm_cgroup())
+            self._log_path("Sampling", sampler.path)
+            sampler.sample()  # Baseline for the first rates
+            printed = 0
+            while not count or printed < count:
+                time.sleep(interval)
+                self._print_resources_sample(
+                    {"timestamp": round(time.time(), 3), "cgroup": QM_CGROUP, **sampler.sample()}, header=not printed
+                )
+                printed += 1
+        except KeyboardInterrupt:
+            msg = "KeyboardInterrupt: Exiting resource sampling."
+            self._print_error_and_exit(QmError(msg, exit_code=0))
+        except Exception as e:
+            self._print_error_and_exit(as_qm_error(e))
 
-        for line in content.splitlines():
-            handle_line_in_context.handle(line.strip())
-        return handle_line_in_context.get_parsed()
+    def _pressure_cgroups(self) -> list[dict]:
+        """Return qm.service and its nested container cgroups.
 
-    def show_all(self, output_json: bool = False, pretty: bool = True) -> None:
-        """Display the content of the container configuration file.
+        Returns:
+            list: dicts with "cgroup" (relative to CGROUP_ROOT), "container"
+            (nested container name, None for qm.service) and "path"
+
+        Raises:
+            QmError: If the qm.service cgroup does not exist
+        """
+        root = self._qm_cgroup()
+        if not os.path.isdir(root):
+            raise QmError(f"cgroup '{root}' not found; is the service running on cgroup v2?")
+        scopes = find_container_scopes(root)
+        names: dict[str, str] = {}
+        if scopes:
+            with contextlib.suppress(QmError):
+                names = self._nested_container_ids()
+        cgroups = [{"cgroup": QM_CGROUP, "container": None, "path": root}]
+        for container_id, path in sorted(scopes.items(), key=lambda item: names.get(item[0], item[0])):
+            cgroups.append({"cgroup": os.path.relpath(path, CGROUP_ROOT), "container": names.get(container_id, container_id[:12]), "path": path})
+        return cgroups
+
+    def show_pressure(self, output_json: bool = False, pretty: bool = True) -> None:
+        """Show CPU, memory and IO pressure of qm.service and nested containers.
 
         Args:
             output_json (bool): If True, format the output as JSON.
@@ -597,135 +3568,566 @@ class QmController:
                 the JSON.
         """
         self._configure_output(output_json, pretty)
-        all_show_commands_functions = [
-            self.show_container,
-            self.show_unix_sockets,
-            self.show_shared_memory,
-            self.show_resources,
-            self.show_available_devices,
-            self.show_namespaces,
-        ]
-
-        for func in all_show_commands_functions:
-            self._run_show_command_func(
-                func
-            )
+        try:
+            entries = []
+            for cgroup in self._pressure_cgroups():
+                entry = {"cgroup": cgroup["cgroup"], "container": cgroup["container"]}
+                for resource in PSI_RESOURCES:
+                    with contextlib.suppress(OSError):
+                        entry[resource] = read_pressure(os.path.join(cgroup["path"], f"{resource}.pressure"))
+                entries.append(entry)
+        except Exception as e:
+            self._print_error_and_exit(as_qm_error(e))
+            return
 
-    def show_container(self, output_json: bool = False, pretty: bool = True) -> None:
-        """Display the content of the container configuration file.
+        if self.output_config.output_json:
+            self._print_output({"pressure": entries})
+            return
+        print(f"{'CGROUP':<24} {'RESOURCE':<8} {'KIND':<4} {'AVG10':>6} {'AVG60':>6} {'AVG300':>6} {'TOTAL(ms)':>12}")
+        for entry in entries:
+            for resource in PSI_RESOURCES:
+                for kind, values in entry.get(resource, {}).items():
+                    print(
+                        f"{entry['container'] or entry['cgroup']:<24} {resource:<8} {kind:<4} {values['avg10']:>6.2f} "
+                        f"{values['avg60']:>6.2f} {values['avg300']:>6.2f} {values['total'] // 1000:>12}"
+                    )
+
+    def watch_pressure(self, thresholds: Optional[list[str]] = None, output_json: bool = False, count: int = 0) -> None:
+        """Report pressure threshold crossings using kernel PSI triggers.
+
+        A trigger is registered on each <resource>.pressure file of
+        qm.service and its nested containers; the process then sleeps in
+        poll() until the kernel reports a crossing, so it costs no CPU
+        while idle. The kernel reports each trigger at most once per window.
 
         Args:
-            output_json (bool): If True, format the output as JSON.
-            pretty (bool): If True and output_json is True, pretty-print
-                the JSON.
+            thresholds (list): Threshold specs, see parse_pressure_threshold;
+                defaults to PSI_DEFAULT_THRESHOLDS.
+            output_json (bool): If True, print one JSON object per event.
+            count (int): Stop after this many events, 0 to run until
+                interrupted with Ctrl+C.
         """
-        self._configure_output(output_json, pretty)
+        import select
 
+        self._configure_output(output_json, False)
+        triggers: dict[int, dict] = {}
         try:
-            self._validate_path_exists(self.config_path)
-            self._log_path("Reading", self.config_path)
+            if count < 0:
+                raise ValidationError("The count must be non-negative.")
+            parsed = [parse_pressure_threshold(spec) for spec in thresholds or PSI_DEFAULT_THRESHOLDS]
+            poller = select.poll()
+            for cgroup in self._pressure_cgroups():
+                for resource, kind, stall_us, window_us in parsed:
+                    path = os.path.join(cgroup["path"], f"{resource}.pressure")
+                    try:
+                        fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+                    except FileNotFoundError:
+                        continue  # Controller not enabled for this cgroup
+                    triggers[fd] = {**cgroup, "resource": resource, "kind": kind, "threshold_ms": stall_us // 1000, "window_ms": window_us // 1000}
+                    try:
+                        os.write(fd, f"{kind} {stall_us} {window_us}\0".encode())
+                    except OSError as e:
+                        if e.errno != errno.EINVAL:
+                            raise
+                        raise ValidationError(
+                            f"The kernel rejected the trigger '{kind} {stall_us // 1000}ms/{window_us // 1000}ms' on {path}; "
+                            "without CAP_SYS_RESOURCE the window must be a multiple of 2000ms"
+                        ) from None
+                    poller.register(fd, select.POLLPRI)
+            if not triggers:
+                raise QmError("No pressure files found; is PSI enabled in the kernel?")
+            self._log_path("Watching", f"{len(triggers)} pressure triggers")
+
+            reported = 0
+            while triggers and (not count or reported < count):
+                for fd, event in poller.poll():
+                    trigger = triggers.get(fd)
+                    if trigger is None:
+                        continue
+                    if event & (select.POLLERR | select.POLLHUP | select.POLLNVAL):
+                        poller.unregister(fd)  # cgroup removed, e.g. the container stopped
+                        del triggers[fd]
+                        os.close(fd)
+                        continue
+                    if event & select.POLLPRI:
+                        self._print_pressure_event(trigger)
+                        reported += 1
+        except KeyboardInterrupt:
+            msg = "KeyboardInterrupt: Exiting pressure watch."
+            self._print_error_and_exit(QmError(msg, exit_code=0))
+        except Exception as e:
+            self._print_error_and_exit(as_qm_error(e))
+        finally:
+            for fd in triggers:
+                os.close(fd)  # Closing the file removes the kernel trigger
 
-            with open(self.config_path, "r") as file:
-                content = file.read()
+    def _print_pressure_event(self, trigger: dict) -> None:
+        """Print one threshold crossing with the current pressure averages."""
+        try:
+            pressure = read_pressure(os.path.join(trigger["path"], f"{trigger['resource']}.pressure")).get(trigger["kind"], {})
+        except OSError:
+            pressure = {}
+        event = {key: value for key, value in trigger.items() if key != "path"}
+        event.update(timestamp=round(time.time(), 3), pressure=pressure)
+        if self.output_config.output_json:
+            print(json_dumps(event), flush=True)
+            return
+        averages = " ".join(f"{key}={value}" for key, value in pressure.items() if key != "total")
+        print(
+            f"{time.strftime('%H:%M:%S', time.localtime(event['timestamp']))} {trigger['container'] or trigger['cgroup']} "
+            f"{trigger['resource']} {trigger['kind']} stall >{trigger['threshold_ms']}ms/{trigger['window_ms']}ms {averages}",
+            flush=True,
+        )
 
-            if self.output_config.output_json:
-                parsed = self.parse_to_dict(content)
-                self._print_output(
-                    {"path": self.config_path, "sections": parsed}
-                )
-            else:
-                print(content, end="")
-        except Exception as e:
-            self._print_error_and_exit(QmError(str(e)))
+    def collect_metrics(self, openmetrics: bool = True) -> str:
+        """Return the metrics of qm.service and its nested containers.
 
-    def show_unix_sockets(self, output_json: bool = False, pretty: bool = True) -> None:
-        """Show active UNIX domain sockets inside the container using 'ss'.
+        Collection is incremental: cgroup files stay open between calls,
+        nested container names are only looked up while some container ID
+        has none, and the device list comes from the cached config.
 
         Args:
-            output_json (bool): If True, format the output as JSON.
-            pretty (bool): If True and output_json is True, pretty-print
-                the JSON.
+            openmetrics (bool): Render OpenMetrics 1.0 instead of the
+                Prometheus 0.0.4 text format.
+
+        Returns:
+            str: The exposition text
         """
-        self._configure_output(output_json, pretty)
+        builder = MetricsBuilder(openmetrics)
+        if self._metrics_reader is None:
+            self._metrics_reader = CgroupFileReader()
+        root = self._qm_cgroup()
+        builder.add("up", int(os.path.isdir(root)))
+
+        cgroups = []
+        if os.path.isdir(root):
+            scopes = find_container_scopes(root)
+            unnamed = scopes.keys() - self._metrics_names.keys()
+            if unnamed:
+                with contextlib.suppress(Exception):  # e.g. podman unreachable; retried on the next scrape
+                    self._metrics_names.update(self._nested_container_ids())
+            builder.add("nested_containers", len(scopes))
+            cgroups.append((root, {"container": self.container, "cgroup": QM_CGROUP}))
+            for container_id, path in sorted(scopes.items()):
+                name = self._metrics_names.get(container_id, container_id[:12])  # Short ID until the name is known
+                cgroups.append((path, {"container": name, "cgroup": os.path.relpath(path, CGROUP_ROOT)}))
+        for path, labels in cgroups:
+            self._add_cgroup_metrics(builder, path, labels)
+        self._metrics_reader.retain([path for path, _ in cgroups])
+
+        self._add_device_metrics(builder)
+        return builder.render()
+
+    def _read_metrics_file(self, path: str, parser: Callable[[str], dict]) -> dict:
+        """Return a parsed cgroup file, or an empty dict if it is unreadable."""
+        content = self._metrics_reader.read(path) if self._metrics_reader else None
+        if not content:
+            return {}
         try:
-            result = self._run_podman_exec(
-                ["ss", "-xl"],
-                "Failed to retrieve UNIX domain sockets with 'ss -xl'"
-            )
+            return parser(content)
+        except ValueError:
+            return {}
+
+    def _add_cgroup_metrics(self, builder: MetricsBuilder, path: str, labels: dict[str, str]) -> None:
+        """Add the CPU, memory, IO and pressure samples of one cgroup."""
+        cpu = self._read_metrics_file(os.path.join(path, "cpu.stat"), parse_flat_keyed)
+        for family, key in (("cpu_usage_seconds", "usage_usec"), ("cpu_user_seconds", "user_usec"), ("cpu_system_seconds", "system_usec"), ("cpu_throttled_seconds", "throttled_usec")):
+            if key in cpu:
+                builder.add(family, cpu[key] / 10**6, **labels)
+
+        current = self._metrics_reader.read(os.path.join(path, "memory.current")) if self._metrics_reader else None
+        if current and current.strip().isdigit():
+            builder.add("memory_bytes", int(current), **labels)
+        memory = self._read_metrics_file(os.path.join(path, "memory.stat"), parse_flat_keyed)
+        events = self._read_metrics_file(os.path.join(path, "memory.events"), parse_flat_keyed)
+        io_totals = self._read_metrics_file(os.path.join(path, "io.stat"), parse_io_stat)
+        for family, values, key in (
+            ("memory_anon_bytes", memory, "anon"),
+            ("memory_file_bytes", memory, "file"),
+            ("memory_major_page_faults", memory, "pgmajfault"),
+            ("memory_oom_events", events, "oom"),
+            ("memory_oom_kills", events, "oom_kill"),
+            ("io_read_bytes", io_totals, "rbytes"),
+            ("io_write_bytes", io_totals, "wbytes"),
+            ("io_reads", io_totals, "rios"),
+            ("io_writes", io_totals, "wios"),
+        ):
+            builder.add(family, values.get(key), **labels)
 
-            self._print_output(
-                {"UNIX domain sockets": result.stdout.strip()}
-            )
+        for resource in PSI_RESOURCES:
+            pressure = self._read_metrics_file(os.path.join(path, f"{resource}.pressure"), parse_pressure)
+            for kind, values in pressure.items():
+                builder.add("pressure_stalled_seconds", values.get("total", 0) / 10**6, **labels, resource=resource, kind=kind)
+
+    def _add_device_metrics(self, builder: MetricsBuilder) -> None:
+        """Add the number of configured devices and their availability."""
+        try:
+            devices = self._extract_devices_from_config()
+        except QmError:
+            return
+        builder.add("devices_configured", len(devices))
+        if not devices:
+            return
+        try:
+            probed = self._probe_devices_on_host(devices)
+        except Exception:  # QM not running or its /proc not visible
+            return
+        for status in DEVICE_STATUSES:
+            builder.add("devices", sum(1 for info in probed.values() if info.get("status") == status), status=status)
+
+    @staticmethod
+    def _write_textfile(path: str, content: str) -> None:
+        """Atomically replace a node_exporter textfile collector file."""
+        import tempfile
 
+        # node_exporter only reads *.prom, so the partial file is never scraped
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".qmctl-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(content)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+
+    def _metrics_server(self, listen: str) -> "http.server.HTTPServer":
+        """Return an HTTP server answering GET /metrics, bound to [HOST:]PORT.
+
+        Scrapers that accept application/openmetrics-text get OpenMetrics,
+        others the Prometheus text format. Requests are served one at a
+        time, so concurrent scrapes never collect in parallel.
+
+        Raises:
+            ValidationError: If listen is not [HOST:]PORT
+        """
+        import http.server
+        import socket
+
+        host, _, port = listen.rpartition(":")
+        host = host.strip("[]") or METRICS_LISTEN.rpartition(":")[0]
+        if not port.isdigit():
+            raise ValidationError(f"Invalid listen address '{listen}', expected [HOST:]PORT")
+        controller = self
+
+        class MetricsServer(http.server.HTTPServer):
+            address_family = socket.AF_INET6 if ":" in host else socket.AF_INET
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                """Answer a scrape."""
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                try:
+                    body = controller.collect_metrics(openmetrics).encode()
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                """Log requests only in verbose mode."""
+                controller._log_path("Scrape", format % args)
+
+        return MetricsServer((host, int(port)), MetricsHandler)
+
+    def export_metrics(self, textfile: Optional[str] = None, listen: Optional[str] = None, interval: float = 0) -> None:
+        """Export OpenMetrics of qm.service and its nested containers.
+
+        Args:
+            textfile (str): Atomically write the Prometheus text format to
+                this file, for node_exporter's textfile collector, instead
+                of printing OpenMetrics to stdout.
+            listen (str): Serve GET /metrics on [HOST:]PORT until
+                interrupted.
+            interval (float): Rewrite the textfile every interval seconds
+                until interrupted; 0 writes it once.
+        """
+        try:
+            if interval < 0:
+                raise ValidationError("The interval must be non-negative.")
+            if textfile and listen:
+                raise ValidationError("--textfile and --listen cannot be combined.")
+            if interval and not textfile:
+                raise ValidationError("--interval requires --textfile.")
+            if listen:
+                server = self._metrics_server(listen)
+                host, port = server.server_address[:2]
+                print(f"[INFO] qmctl metrics listening on http://{host}:{port}/metrics", file=sys.stderr)
+                try:
+                    server.serve_forever()
+                finally:
+                    server.server_close()
+                return
+            while True:
+                if textfile:
+                    self._write_textfile(textfile, self.collect_metrics(openmetrics=False))
+                else:
+                    print(self.collect_metrics(), end="", flush=True)
+                if not interval:
+                    return
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            msg = "KeyboardInterrupt: Exiting metrics export."
+            self._print_error_and_exit(QmError(msg, exit_code=0))
         except Exception as e:
-            self._print_error_and_exit(QmError(str(e)))
+            self._print_error_and_exit(as_qm_error(e))
+
+    def _nested_container_ids(self) -> dict[str, str]:
+        """Return the names of the running nested containers by full ID."""
+        api = None
+        with contextlib.suppress(QmError, OSError, KeyError, TypeError, ValueError):
+            api = self._inner_api(f"/proc/{self._container_state(self.container)['pid']}/root")
+        if api:
+            return {entry["Id"]: entry["Names"][0] for entry in api.list_containers() if entry.get("Names")}
+        result = self.transport.exec(self.container, ["podman", "ps", "--no-trunc", "--format", "{{.ID}} {{.Names}}"])
+        if result.returncode != 0:
+            raise QmError(f"Failed to list nested containers: {result.stderr.strip()}")
+        return dict(line.split(None, 1) for line in result.stdout.splitlines() if len(line.split(None, 1)) == 2)
 
-    def show_shared_memory(self, output_json: bool = False, pretty: bool = True) -> None:
-        """Show shared memory segments in the container using 'ipcs'.
+    def _show_container_resources(self, interval: float, count: int, sort: str, top: int) -> None:
+        """Print resource samples of every nested container below qm.service.
+
+        The cgroup subtree is searched again for every sample, so containers
+        started meanwhile appear (with rates from the next sample on) and
+        stopped ones disappear.
+        """
+        root = self._qm_cgroup()
+        if not os.path.isdir(root):
+            raise QmError(f"cgroup '{root}' not found; is the service running on cgroup v2?")
+        samplers: dict[str, CgroupSampler] = {}
+        names: dict[str, str] = {}
+        printed = 0
+        while not count or printed < count:
+            scopes = find_container_scopes(root)
+            for container_id in samplers.keys() - scopes.keys():
+                del samplers[container_id]
+            for container_id, path in scopes.items():
+                if container_id not in samplers:
+                    samplers[container_id] = CgroupSampler(path)
+                    with contextlib.suppress(QmError):
+                        samplers[container_id].sample()  # Baseline
+            if scopes.keys() - names.keys():
+                with contextlib.suppress(QmError):
+                    names.update(self._nested_container_ids())
+            time.sleep(interval)
+
+            timestamp = round(time.time(), 3)
+            rows = []
+            for container_id, sampler in samplers.items():
+                try:
+                    sample = sampler.sample()
+                except QmError:
+                    continue  # Stopped while sleeping
+                rows.append({
+                    "timestamp": timestamp,
+                    "cgroup": os.path.relpath(sampler.path, CGROUP_ROOT),
+                    "container": names.get(container_id, container_id[:12]),
+                    "id": container_id,
+                    **sample,
+                })
+            rows.sort(key=RESOURCES_SORT_KEYS[sort], reverse=True)
+            if not self.output_config.output_json and printed:
+                print()
+            if not rows and not self.output_config.output_json:
+                print("No nested containers running.")
+            for index, row in enumerate(rows[:top or None]):
+                self._print_resources_sample(row, header=not index, label="container")
+            printed += 1
+
+    def _print_resources_sample(self, sample: dict, header: bool = False, label: str = "cgroup") -> None:
+        """Print one resource sample as an NDJSON line or a table row.
 
         Args:
-            output_json (bool): If True, format the output as JSON.
-            pretty (bool): If True and output_json is True, pretty-print
-                the JSON.
+            sample: Sample to print
+            header: Print the table header first
+            label: Key of the sample identifying the row in the table
         """
-        self.exec_in_container(["ipcs"], output_json=output_json,
-                               pretty=pretty)
+        if self.output_config.output_json:
+            print(json_dumps(sample), flush=True)
+            return
+        if header:
+            print(f"{'TIME':<8} {label.upper():<24} {'CPU%':>7} {'MEM':>8} {'ANON':>8} {'FILE':>8} "
+                  f"{'READ/s':>8} {'WRITE/s':>8} {'MAJFLT/s':>8}")
+        cpu = sample["cpu_percent"]
+        faults = sample["pgmajfault_per_s"]
+        print(
+            f"{time.strftime('%H:%M:%S', time.localtime(sample['timestamp'])):<8} {sample[label]:<24} "
+            f"{'-' if cpu is None else f'{cpu:.1f}':>7} {_format_bytes(sample['memory_current']):>8} "
+            f"{_format_bytes(sample['memory_anon']):>8} {_format_bytes(sample['memory_file']):>8} "
+            f"{_format_bytes(sample['io_read_bytes_per_s']):>8} {_format_bytes(sample['io_write_bytes_per_s']):>8} "
+            f"{'-' if faults is None else f'{faults:.0f}':>8}",
+            flush=True,
+        )
 
-    def show_resources(self, output_json: bool = False, pretty: bool = True) -> None:
-        """Stream live resource usage for qm.service using systemd-cgtop.
+    def _device_rules(self, state: dict) -> Optional[list[dict]]:
+        """Return the device cgroup allow-list of the QM container.
 
-        Note:
-            This method runs until interrupted with Ctrl+C. It does not
-            support JSON output directly due to its streaming nature.
+        Read from linux.resources.devices of the container's OCI runtime
+        spec, or from devices.list on cgroup v1 hosts.
 
         Args:
-            output_json (bool): This parameter is ignored.
-            pretty (bool): This parameter is ignored.
+            state: Container state from _container_state
+
+        Returns:
+            list: Device rules for device_cgroup_access, None if unknown
         """
-        self._configure_output(output_json, pretty)
+        devices_list = os.path.join(CGROUP_ROOT, "devices", QM_CGROUP, "devices.list")
+        if os.path.exists(devices_list):
+            with open(devices_list, "r") as file:
+                return parse_devices_list(file.read())
+        oci_config = state.get("oci_config")
+        if oci_config is None:  # Cached by an older qmctl
+            oci_config = self.transport.inspect(self.container).get("OCIConfigPath", "")
+        if not oci_config:
+            return None
+        self._log_path("Reading", oci_config)
         try:
-            print(
-                "[INFO] Starting systemd-cgtop stream for qm.service. "
-                "Press Ctrl+C to exit.\n"
-            )
-            pid, fd = pty.fork()
-            if pid == 0:
-                cmd_path = self.find_executable("systemd-cgtop")
-                # Safe: cmd_path is resolved with find_executable() and args are hardcoded
-                os.execvp(cmd_path, ["systemd-cgtop", "--batch", "qm.service"]
-                ) # nosec B606
+            with open(oci_config, "r") as file:
+                spec = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return spec.get("linux", {}).get("resources", {}).get("devices") or []
+
+    def _probe_devices_on_host(self, devices: list[str]) -> dict[str, dict]:
+        """Check every device from the host, without entering the container.
+
+        Paths are stat'ed below /proc/<qm-pid>/root in one pass, compared
+        with the host's node and checked against the device cgroup
+        allow-list.
+
+        Args:
+            devices: List of device paths to probe
+
+        Returns:
+            dict: Device path -> _probe_devices fields plus
+            "host_major_minor", "cgroup_access" (granted subset of "rwm",
+            None if unknown) and "status": "available", "missing",
+            "not-permitted" (declared but denied by the cgroup) or
+            "mismatch" (major:minor differs from the host's node)
+        """
+        state = self._container_state(self.container)
+        probed = ProcIntrospector(state["pid"]).devices(devices)
+        rules = self._device_rules(state)
+        for info in probed.values():
+            major_minor = info["major_minor"] or info["host_major_minor"]
+            dev_type = {"char": "c", "block": "b"}.get(info["type"] or "char")
+            access = None
+            if rules is not None and major_minor and dev_type:
+                major, minor = (int(number) for number in major_minor.split(":"))
+                access = device_cgroup_access(rules, dev_type, major, minor)
+            info["cgroup_access"] = access
+            if not info["present"]:
+                info["status"] = "missing"
+            elif access is not None and "r" not in access:
+                info["status"] = "not-permitted"
+            elif info["major_minor"] and info["host_major_minor"] and info["major_minor"] != info["host_major_minor"]:
+                info["status"] = "mismatch"
             else:
-                while True:
-                    try:
-                        output = os.read(fd, 1024).decode()
-                        print(output, end="")
-                    except OSError:
-                        break
-        except KeyboardInterrupt:
-            msg = "KeyboardInterrupt: Exiting systemd-cgtop stream."
-            self._print_error_and_exit(QmError(msg, exit_code=0))
-        except Exception as e:
-            self._print_error_and_exit(QmError(str(e)))
+                info["status"] = "available"
+        return probed
+
+    def _collect_available_devices(self, details: bool = False) -> dict:
+        """Return device availability for every AddDevice entry.
+
+        Devices are checked from the host when the QM processes are
+        visible in /proc, otherwise with one exec in the container.
+        """
+        self._validate_path_exists(self.config_path)
+        self._validate_container_exists()
+        devices = self._extract_devices_from_config()
+
+        self._validate_devices_specified(devices)
 
-    def show_available_devices(self, output_json: bool = False, pretty: bool = True) -> None:
+        try:
+            probed = self._probe_devices_on_host(devices)
+        except Exception as e:  # e.g. podman on another host, or no access to /proc
+            self._log_path("Probing in container", f"host /proc unavailable: {e}")
+            probed = self._probe_devices(devices)
+        if details:
+            return probed
+        return {device: info.get("status", "available" if info["present"] else "missing") == "available" for device, info in probed.items()}
+
+    def show_available_devices(self, output_json: bool = False, pretty: bool = True, details: bool = False) -> None:
         """Verify device existence specified in the container config.
 
         Args:
             output_json (bool): If True, format the output as JSON.
             pretty (bool): If True and output_json is True, pretty-print
                 the JSON.
+            details (bool): If True, report device type, major:minor and
+                readability instead of a present/missing flag.
         """
         self._configure_output(output_json, pretty)
 
         try:
-            self._validate_path_exists(self.config_path)
-            self._validate_container_exists()
-            self._verify_devices_existence()
+            self._print_output(self._collect_available_devices(details))
         except Exception as e:
-            self._print_error_and_exit(QmError(str(e)))
+            self._print_error_and_exit(as_qm_error(e))
+
+    def _container_processes(self) -> dict[int, str]:
+        """Return every process of the QM container with the container it runs in.
+
+        Processes in a nested container's cgroup are labelled with that
+        container's name (its short ID if podman cannot be asked), all
+        others with the QM container's name. With --cgroups=split only the
+        libpod-payload-<id> subtree holds QM; conmon and podman sit in
+        qm.service itself in the host's namespaces and are left out.
+        Without a payload cgroup, processes of qm.service itself that share
+        the host's mount namespace are left out instead.
+
+        Raises:
+            QmError: If the qm.service cgroup does not exist
+        """
+        root = self._qm_cgroup()
+        if not os.path.isdir(root):
+            raise QmError(f"cgroup '{root}' not found; is the service running on cgroup v2?")
+        with os.scandir(root) as entries:
+            payload = next((entry.path for entry in entries if entry.name.startswith(QM_PAYLOAD_PREFIX) and entry.is_dir()), None)
+        scopes = find_container_scopes(root)
+        names: dict[str, str] = {}
+        if scopes:
+            with contextlib.suppress(QmError):
+                names = self._nested_container_ids()
+        labels = {path: names.get(container_id, container_id[:12]) for container_id, path in scopes.items()}
+
+        def label(directory: str) -> str:
+            while directory not in labels and len(directory) > len(root):
+                directory = os.path.dirname(directory)  # Sub-cgroups belong to their scope
+            return labels.get(directory, self.container)
+
+        by_cgroup: dict[str, str] = {}
+        processes = {}
+        for pid, directory in cgroup_procs(payload or root).items():
+            if directory == root and shares_host_namespace(pid):
+                continue  # conmon or podman next to QM, not part of it
+            if directory not in by_cgroup:
+                by_cgroup[directory] = label(directory)
+            processes[pid] = by_cgroup[directory]
+        return processes
+
+    def _collect_namespaces(self) -> Union[dict, str]:
+        """Return the namespaces used by the processes of qm.service."""
+        namespaces = self._introspector().namespaces(self._container_processes()).records()
+        if self.output_config.output_json:
+            return {"Namespaces": namespaces}
+        for entry in namespaces:
+            entry["containers"] = ",".join(entry["containers"])
+        return self._format_table(namespaces, ["inode", "type", "nprocs", "pid", "command", "containers"])
 
     def show_namespaces(self, output_json: bool = False, pretty: bool = True) -> None:
-        """Show namespace information inside the container using 'lsns'.
+        """Show the namespaces used inside the container, like lsns.
+
+        Built in one pass over /proc/<pid>/ns of every process in the
+        qm.service cgroup; each namespace is reported with its process
+        count, lowest PID and the containers whose processes use it.
 
         Args:
             output_json (bool): If True, format the output as JSON.
@@ -734,19 +4136,60 @@ class QmController:
         """
         self._configure_output(output_json, pretty)
         try:
-            result = self._run_podman_exec(
-                ["lsns"],
-                "Failed to retrieve namespace info using 'lsns'"
-            )
+            self._emit_topic(self._collect_namespaces())
+        except Exception as e:
+            self._print_error_and_exit(as_qm_error(e))
 
-            self._print_output(
-                {"Namespaces": result.stdout.strip()}
-            )
+    def _stream_exec(self, command: list[str], on_host: bool = False) -> int:
+        """Run a command in the container and forward its output live.
 
-        except Exception as e:
-            self._print_error_and_exit(QmError(str(e)))
+        Text mode copies raw stdout/stderr bytes to the matching stream.
+        JSON mode prints one compact JSON frame per chunk, e.g.
+        {"stream": "stdout", "data": "..."}, followed by
+        {"exit_code": N, "latency_ms": T}.
+        Memory use is bounded by the chunk size, not the output size.
+
+        Args:
+            command: Command to run with the selected transport
+            on_host: Run command as given on the host (it enters the
+                container itself) instead of through the transport
+
+        Returns:
+            int: Exit code of the command
+        """
+        decoders = {
+            name: codecs.getincrementaldecoder("utf-8")(errors="replace")
+            for name in ("stdout", "stderr")
+        }
+
+        def emit_frame(stream_name: str, text: str) -> None:
+            if text:
+                print(json_dumps({"stream": stream_name, "data": text}), flush=True)
+
+        def on_chunk(stream_name: str, data: bytes) -> None:
+            if self.output_config.output_json:
+                emit_frame(stream_name, decoders[stream_name].decode(data))
+            else:
+                target = sys.stderr if stream_name == "stderr" else sys.stdout
+                target.buffer.write(data)
+                target.buffer.flush()
+
+        start = time.monotonic()
+        try:
+            if on_host:
+                exit_code = stream_process(command, on_chunk, self.timeout)
+            else:
+                exit_code = self.transport.stream_exec(self.container, command, on_chunk)
+        finally:
+            latency = time.monotonic() - start
+            self._record_latency(command, latency)
+        if self.output_config.output_json:
+            for stream_name, decoder in decoders.items():
+                emit_frame(stream_name, decoder.decode(b"", final=True))
+            print(json_dumps({"exit_code": exit_code, "latency_ms": round(latency * 1000, 3)}), flush=True)
+        return exit_code
 
-    def exec_in_container(self, command: list[str], output_json: bool = False, pretty: bool = True) -> None:
+    def exec_in_container(self, command: list[str], output_json: bool = False, pretty: bool = True, stream: bool = False) -> None:
         """Execute a command inside the primary 'qm' container.
 
         Args:
@@ -754,6 +4197,9 @@ class QmController:
             output_json (bool): If True, format the output as JSON.
             pretty (bool): If True and output_json is True, pretty-print
                 the JSON.
+            stream (bool): If True, forward output while the command runs
+                (newline-delimited JSON frames with output_json) and exit
+                with the command's exit code.
         """
         self._configure_output(output_json, pretty)
 
@@ -763,13 +4209,19 @@ class QmController:
                 command,
                 "No command provided to execute in the container."
             )
+            if stream:
+                exit_code = self._stream_exec(command)
+                if exit_code != 0:
+                    exit(exit_code)
+                return
+            start = time.monotonic()
             result = self._run_podman_exec(
                 command,
                 f"Failed to execute command in container '{self.container}'"
             )
 
             self._print_output(
-                {"output": result.stdout.strip()}
+                self._with_latency({"output": result.stdout.strip()}, start)
             )
 
         except QmError as e:
@@ -779,31 +4231,431 @@ class QmController:
             else:
                 self._print_error_and_exit(e)
         except Exception as e:
-            self._print_error_and_exit(QmError(str(e)))
+            self._print_error_and_exit(as_qm_error(e))
 
-    def copy_in_container(self, paths: list[str], output_json: bool = False, pretty: bool = True) -> None:
+    def copy_in_container(self, paths: list[str], output_json: bool = False, pretty: bool = True, stream: bool = False, compress: str = "none") -> None:
         """Copy files or directories between the host and the container.
 
+        With more than one source, all of them travel in one streamed tar
+        archive through a single exec, and a result is reported per source.
+
         Args:
-            paths (list): A list with the source and destination paths.
+            paths (list): Source paths followed by the destination path.
             output_json (bool): If True, format the output as JSON.
             pretty (bool): If True and output_json is True, pretty-print
                 the JSON.
+            stream (bool): If True, stream a tar archive through a single
+                exec pipe and report progress and throughput.
+            compress (str): Compression for streamed copies, one of
+                COPY_COMPRESSION; implies stream unless "none".
         """
         self._configure_output(output_json, pretty)
 
         try:
             self._validate_container_exists()
+            if paths and len(paths) > 2:
+                summary = self._stream_copy_many(*self._validate_paths_for_batch_cp(paths), compress)
+                self._print_batch_copy_summary(summary)
+                if any("error" in result for result in summary["sources"].values()):
+                    exit(1)
+                return
             src, dst = self._validate_paths_for_cp(paths)
-            full_command = PODMAN_CP + [src, dst]
-            result = self._run_subprocess(full_command)
+            if stream or compress != "none":
+                self._print_copy_summary(self._stream_copy(src, dst, compress))
+                return
+            result = self.transport.copy(src, dst)
             if result.returncode != 0:
                 raise RuntimeError(result.stderr or "Copy operation failed")
 
         except Exception as e:
-            self._print_error_and_exit(QmError(str(e)))
+            self._print_error_and_exit(as_qm_error(e))
+
+    def _print_copy_summary(self, summary: dict) -> None:
+        """Print the result of a streamed copy."""
+        if self.output_config.output_json:
+            print(json_dumps(summary), flush=True)  # One line, like the progress records before it
+            return
+        if sys.stderr.isatty():
+            print(file=sys.stderr)  # End the progress line
+        print(
+            f"Copied {summary['files']} entries, {summary['bytes'] / 2**20:.1f} MiB in "
+            f"{summary['seconds']:.2f}s ({summary['throughput_bytes_per_s'] / 2**20:.1f} MiB/s, "
+            f"compression: {summary['compression']})"
+        )
+
+    def _report_progress(self, snapshot: dict) -> None:
+        """Print a progress report: NDJSON with --json, a status line on a terminal."""
+        if self.output_config.output_json:
+            print(json_dumps({"progress": snapshot}), flush=True)
+        elif sys.stderr.isatty():
+            total = f" of {snapshot['total_bytes'] / 2**20:.1f}" if "total_bytes" in snapshot else ""
+            print(
+                f"\r{snapshot['bytes'] / 2**20:.1f}{total} MiB, {snapshot['files']} entries, "
+                f"{snapshot['throughput_bytes_per_s'] / 2**20:.1f} MiB/s",
+                end="", file=sys.stderr, flush=True,
+            )
+
+    @staticmethod
+    def _tree_size(paths: list[str]) -> int:
+        """Return the total size of the regular files below the given paths."""
+        total = 0
+        for path in paths:
+            if not os.path.isdir(path):
+                total += os.path.getsize(path)
+                continue
+            for root, _, files in os.walk(path):
+                for name in files:
+                    with contextlib.suppress(OSError):
+                        total += os.lstat(os.path.join(root, name)).st_size
+        return total
+
+    def _stream_copy(self, src: str, dst: str, compress: str = "none") -> dict:
+        """Copy one path by streaming a tar archive through a single exec.
+
+        The archive is produced and consumed incrementally on both ends, so
+        memory use does not depend on the size of the tree. Compression
+        runs as a separate process on each end of the pipe.
+
+        Args:
+            src: Source path, optionally prefixed with `<container>:`
+            dst: Destination path, optionally prefixed with `<container>:`
+            compress: One of COPY_COMPRESSION
+
+        Returns:
+            dict: Summary with source, destination, compression, bytes,
+            files, seconds and throughput
+
+        Raises:
+            ValidationError: If the compression is unknown
+            QmError: If the transfer fails
+        """
+        if compress not in COPY_COMPRESSION:
+            raise ValidationError(f"Unknown compression '{compress}', expected one of: {', '.join(COPY_COMPRESSION)}")
+        src_container, src_path = split_container_path(src)
+        _, dst_path = split_container_path(dst)
+        if src_container:
+            progress = TransferProgress(self._report_progress)
+            self._stream_download([src_path], dst_path, compress, progress)
+            if not progress.files:
+                raise QmError(f"Streaming copy from '{self.container}' failed: '{src_path}' does not exist")
+        else:
+            progress = TransferProgress(self._report_progress, self._tree_size([src_path]))
+            self._stream_upload([src_path], dst_path, compress, progress)
+        return {"source": src, "destination": dst, "compression": compress, **progress.snapshot()}
+
+    def _stream_copy_many(self, sources: list[str], dst: str, compress: str = "none") -> dict:
+        """Copy several paths into one destination directory in one stream.
+
+        The destination directory is created if missing. Sources that do
+        not exist are reported individually and do not stop the others.
+
+        Args:
+            sources: Source paths, all prefixed with `<container>:` or none
+            dst: Destination directory, prefixed with `<container>:` if the
+                sources are not
+            compress: One of COPY_COMPRESSION
+
+        Returns:
+            dict: Summary with destination, compression, aggregate counters
+            and "sources", mapping each source to its files and bytes or
+            to an error
+
+        Raises:
+            ValidationError: If the compression is unknown
+            QmError: If the transfer fails
+        """
+        if compress not in COPY_COMPRESSION:
+            raise ValidationError(f"Unknown compression '{compress}', expected one of: {', '.join(COPY_COMPRESSION)}")
+        paths = {src: split_container_path(src)[1] for src in sources}
+        _, dst_path = split_container_path(dst)
+        if dst.startswith(f"{self.container}:"):
+            found = [src for src, path in paths.items() if os.path.lexists(path)]
+            progress = TransferProgress(self._report_progress, self._tree_size([paths[src] for src in found]))
+            if found:
+                self._stream_upload([paths[src] for src in found], dst_path, compress, progress,
+                                    arcnames=[os.path.basename(os.path.normpath(paths[src])) for src in found])
+        else:
+            progress = TransferProgress(self._report_progress)
+            os.makedirs(dst_path, exist_ok=True)
+            self._stream_download(list(paths.values()), dst_path, compress, progress)
+
+        results = {
+            src: progress.sources[path] if path in progress.sources else {"error": f"'{path}' does not exist"}
+            for src, path in paths.items()
+        }
+        return {"destination": dst, "compression": compress, **progress.snapshot(), "sources": results}
+
+    def _print_batch_copy_summary(self, summary: dict) -> None:
+        """Print the per-source results and totals of a multi-source copy."""
+        if self.output_config.output_json:
+            self._print_copy_summary(summary)
+            return
+        if sys.stderr.isatty():
+            print(file=sys.stderr)  # End the progress line
+        for src, result in summary["sources"].items():
+            if "error" in result:
+                print(f"{src}: {result['error']}", file=sys.stderr)
+            else:
+                print(f"{src}: {result['files']} entries, {result['bytes']} bytes")
+        print(
+            f"Copied {summary['files']} entries to {summary['destination']}, {summary['bytes'] / 2**20:.1f} MiB in "
+            f"{summary['seconds']:.2f}s ({summary['throughput_bytes_per_s'] / 2**20:.1f} MiB/s, "
+            f"compression: {summary['compression']})"
+        )
+
+    def _pipeline(self, commands: list[list[str]], stdin: Any = None, stdout: Any = None, stderr: Any = None) -> list[subprocess.Popen]:
+        """Start commands connected stdout-to-stdin, returning the processes.
+
+        stdin/stdout apply to the first and last command; with a deadline
+        each process gets its own process group so it can be killed whole.
+        """
+        procs: list[subprocess.Popen] = []
+        try:
+            for index, command in enumerate(commands):
+                last = index == len(commands) - 1
+                # Safe: argument lists built from constants and validated paths, no shell on the host
+                procs.append(subprocess.Popen(  # nosec B603
+                    command,
+                    stdin=procs[-1].stdout if procs else stdin,
+                    stdout=stdout if last else subprocess.PIPE,
+                    stderr=stderr,
+                    start_new_session=self.timeout is not None,
+                ))
+                if index:
+                    procs[-2].stdout.close()  # Only the next process reads it now
+        except OSError:
+            for proc in procs:
+                proc.kill()
+            raise
+        return procs
+
+    def _finish_pipeline(self, procs: list[subprocess.Popen], errors: IO[bytes], context: str) -> None:
+        """Wait for a copy pipeline and raise if any stage failed."""
+        for proc in procs:
+            proc.wait()
+        if any(proc.returncode for proc in procs):
+            errors.seek(0)
+            message = errors.read().decode(errors="replace").strip()
+            raise QmError(f"{context}: {message or 'exit status ' + str([proc.returncode for proc in procs])}")
+
+    @contextlib.contextmanager
+    def _pipeline_deadline(self, procs: list[subprocess.Popen]) -> Generator[None, None, None]:
+        """Kill a pipeline's process groups if it outlives the controller deadline.
+
+        Raises:
+            CommandTimeoutError: If the deadline expired; failures caused
+                by the kill are reported as the timeout
+        """
+        if self.timeout is None:
+            yield
+            return
+        expired = threading.Event()
+
+        def expire() -> None:
+            expired.set()
+            for proc in procs:
+                kill_process_group(proc)
+
+        timer = threading.Timer(self.timeout, expire)
+        timer.start()
+        try:
+            yield
+        except Exception:
+            if expired.is_set():
+                raise CommandTimeoutError(procs[-1].args, self.timeout) from None
+            raise
+        finally:
+            timer.cancel()
+        if expired.is_set():
+            raise CommandTimeoutError(procs[-1].args, self.timeout)
+
+    def _stream_upload(self, sources: list[str], dst: str, compress: str, progress: TransferProgress, arcnames: Optional[list[str]] = None) -> None:
+        """Stream host paths into the container as one tar archive.
+
+        Args:
+            sources: Host paths to archive
+            dst: Container destination; a single source is renamed to it
+                unless it is an existing directory
+            compress: One of COPY_COMPRESSION
+            progress: Counters to update
+            arcnames: Archive names for sources, relative to dst; defaults
+                to their base names. When given, dst is always a directory.
+        """
+        import tarfile
+        import tempfile
+
+        compress_argv, decompress_argv = COPY_COMPRESSION[compress]
+        name = os.path.basename(os.path.normpath(sources[0])) if len(sources) == 1 and arcnames is None else ""
+        arcnames = arcnames or [os.path.basename(os.path.normpath(source)) for source in sources]
+        unpack = [*PODMAN_EXEC, "-i", self.container, "sh", "-c", STREAM_UNPACK_SCRIPT, "sh", dst, name, *decompress_argv]
+        commands = [unpack] if compress == "none" else [[self.find_executable(compress_argv[0]), *compress_argv[1:]], unpack]
+        self._log_path("Streaming", f"{len(sources)} path(s) -> {self.container}:{dst} ({compress})")
+        with tempfile.TemporaryFile() as errors:
+            procs = self._pipeline(commands, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=errors)
+            with self._pipeline_deadline(procs):
+                try:
+                    with tarfile.open(fileobj=CountingStream(procs[0].stdin, progress), mode="w|") as archive:
+                        for source, arcname in zip(sources, arcnames):
+                            archive.add(source, arcname=arcname, filter=lambda info, source=source: progress.add_member(source, info) or info)
+                except BrokenPipeError:
+                    pass  # The far end failed; its exit status and stderr say why
+                finally:
+                    with contextlib.suppress(BrokenPipeError):
+                        procs[0].stdin.close()
+                self._finish_pipeline(procs, errors, f"Streaming copy into '{self.container}' failed")
+
+    def _stream_download(self, sources: list[str], dst: str, compress: str, progress: TransferProgress) -> None:
+        """Stream container paths onto the host as one tar archive.
+
+        Args:
+            sources: Container paths to archive; missing ones are skipped
+                and end up without an entry in progress.sources
+            dst: Host destination; a single source is renamed to it unless
+                it is an existing directory
+            compress: One of COPY_COMPRESSION
+            progress: Counters to update
+        """
+        import tarfile
+        import tempfile
+
+        compress_argv, decompress_argv = COPY_COMPRESSION[compress]
+        pack = [*PODMAN_EXEC, self.container, "sh", "-c", STREAM_PACK_SCRIPT, "sh", " ".join(compress_argv), *sources]
+        commands = [pack] if compress == "none" else [pack, [self.find_executable(decompress_argv[0]), *decompress_argv[1:]]]
+        context = f"Streaming copy from '{self.container}' failed"
+        owners = {os.path.basename(os.path.normpath(source)): source for source in sources}
+        src = sources[0]
+
+        def on_member(member: tarfile.TarInfo) -> None:
+            progress.add_member(owners.get(member.name.partition("/")[0], src) if len(sources) > 1 else src, member)
+
+        self._log_path("Streaming", f"{len(sources)} path(s) from {self.container} -> {dst} ({compress})")
+        with tempfile.TemporaryFile() as errors:
+            procs = self._pipeline(commands, stdout=subprocess.PIPE, stderr=errors)
+            with self._pipeline_deadline(procs):
+                source = procs[-1].stdout
+                try:
+                    with tarfile.open(fileobj=CountingStream(source, progress), mode="r|") as archive:
+                        extract_archive(archive, dst, os.path.basename(os.path.normpath(src)), on_member)
+                    while source.read(COPY_CHUNK_SIZE):
+                        pass  # Drain end-of-archive padding so the producer can exit
+                except tarfile.TarError as e:
+                    source.close()  # Stops the producer if it is still writing
+                    self._finish_pipeline(procs, errors, context)  # Prefer the remote error
+                    raise QmError(f"{context}: {e}") from e
+                finally:
+                    source.close()
+                self._finish_pipeline(procs, errors, context)
+
+    def _container_manifest(self, dst: str) -> dict[str, str]:
+        """Hash the regular files below a container directory.
+
+        Returns:
+            dict: Relative path -> sha256 hex digest; empty if dst is missing
+        """
+        result = self._run_podman_exec(["sh", "-c", SYNC_MANIFEST_SCRIPT, "sh", dst], f"Failed to hash files below '{dst}'", allow_empty=True)
+        manifest = {}
+        for line in result.stdout.splitlines():
+            digest, _, path = line.partition("  ")
+            if path.startswith("./"):
+                manifest[path[2:]] = digest
+        return manifest
+
+    def sync_to_container(self, src: str, dst: str, output_json: bool = False, pretty: bool = True, delete: bool = False, dry_run: bool = False, rescan: bool = False, compress: str = "none") -> None:
+        """Make a container directory match a host directory, moving only changes.
+
+        Both sides are described by content-hash manifests. Host hashes are
+        reused while a file's size, mtime and inode are unchanged, and the
+        destination manifest from the previous sync is reused while the
+        container ID is the same, so an unchanged tree costs no exec at
+        all. Added and changed files travel in one streamed tar archive.
+
+        Args:
+            src (str): Host directory whose contents are synced.
+            dst (str): Destination as `<container>:/path`.
+            output_json (bool): If True, format the output as JSON.
+            pretty (bool): If True and output_json is True, pretty-print
+                the JSON.
+            delete (bool): Remove destination files missing from src.
+            dry_run (bool): Report what would change without changing it.
+            rescan (bool): Hash the destination again instead of trusting
+                the cached manifest (e.g. after changes made inside QM).
+            compress (str): Compression for the transfer, one of
+                COPY_COMPRESSION.
+        """
+        self._configure_output(output_json, pretty)
+
+        try:
+            self._validate_container_exists()
+            container, dst_path = split_container_path(dst)
+            if container != self.container or not dst_path:
+                raise ValidationError(f"Destination must be `{self.container}:/path`.")
+            if not os.path.isdir(src):
+                raise ValidationError(f"Source '{src}' is not a directory.")
+            if compress not in COPY_COMPRESSION:
+                raise ValidationError(f"Unknown compression '{compress}', expected one of: {', '.join(COPY_COMPRESSION)}")
+            start = time.monotonic()
+            src = os.path.abspath(src)
+
+            cache = self.state_cache
+            src_cache = cache.manifest_path("src", src) if cache else None
+            dst_cache = cache.manifest_path("dst", self._container_state(self.container)["id"], dst_path) if cache else None
+            local = build_manifest(src, cache.read_json(src_cache) if cache else None)
+            remote = None if rescan or not cache else cache.read_json(dst_cache)
+            manifest_source = "cached" if remote is not None else "scanned"
+            if remote is None:
+                remote = self._container_manifest(dst_path)
+            self._log_path("Manifest", f"{len(local)} local, {len(remote)} remote ({manifest_source})")
+
+            added = [path for path in local if path not in remote]
+            changed = [path for path in local if path in remote and remote[path] != local[path][3]]
+            deleted = sorted(path for path in remote if path not in local) if delete else []
+            progress = TransferProgress(self._report_progress, sum(local[path][0] for path in added + changed))
+
+            if not dry_run:
+                if added or changed:
+                    transfer = added + changed
+                    self._stream_upload([os.path.join(src, path) for path in transfer], dst_path, compress, progress, arcnames=transfer)
+                for index in range(0, len(deleted), SYNC_DELETE_BATCH):
+                    self._run_podman_exec(
+                        ["sh", "-c", SYNC_DELETE_SCRIPT, "sh", dst_path, *deleted[index:index + SYNC_DELETE_BATCH]],
+                        f"Failed to delete files below '{dst_path}'", allow_empty=True,
+                    )
+                if cache:
+                    cache.write_json(src_cache, local)
+                    kept = {path: digest for path, digest in remote.items() if path not in deleted}
+                    cache.write_json(dst_cache, {**kept, **{path: entry[3] for path, entry in local.items()}})
+        except Exception as e:
+            self._print_error_and_exit(as_qm_error(e))
+            return
+
+        summary = {
+            "source": src,
+            "destination": dst,
+            "manifest": manifest_source,
+            "dry_run": dry_run,
+            "added": added,
+            "changed": changed,
+            "deleted": deleted,
+            "unchanged": len(local) - len(added) - len(changed),
+            "bytes": progress.bytes,
+            "seconds": round(time.monotonic() - start, 3),
+        }
+        if self.output_config.output_json:
+            print(json_dumps(summary), flush=True)  # One line, like the progress records before it
+            return
+        if progress.bytes and sys.stderr.isatty():
+            print(file=sys.stderr)  # End the progress line
+        for marker, paths in (("+", added), ("~", changed), ("-", deleted)):
+            for path in paths:
+                print(f"{marker} {path}")
+        print(
+            f"{'Would sync' if dry_run else 'Synced'} {len(added)} added, {len(changed)} changed, "
+            f"{len(deleted)} deleted, {summary['unchanged']} unchanged in {summary['seconds']:.2f}s"
+        )
 
-    def execin_in_container(self, command: list[str], output_json: bool = False, pretty: bool = True) -> None:
+    def execin_in_container(
+        self, command: list[str], output_json: bool = False, pretty: bool = True, stream: bool = False, single_hop: bool = False
+    ) -> None:
         """Execute a command in a nested container inside the 'qm' container.
 
         Args:
@@ -812,6 +4664,12 @@ class QmController:
             output_json (bool): If True, format the output as JSON.
             pretty (bool): If True and output_json is True, pretty-print
                 the JSON.
+            stream (bool): If True, forward output while the command runs
+                (newline-delimited JSON frames with output_json) and exit
+                with the command's exit code.
+            single_hop (bool): If True and possible, enter the nested
+                container with nsenter from the host instead of a nested
+                podman exec (see _single_hop_command).
         """
         self._configure_output(output_json, pretty)
 
@@ -820,12 +4678,21 @@ class QmController:
             container_name, command_args = (
                 self._validate_exec_command(command)
             )
-            cmd_list = [
-                *PODMAN_EXEC, self.container,
-                *PODMAN_EXEC, container_name,
-                *command_args
-            ]
-            result = self._run_subprocess(cmd_list)
+            hop = self._single_hop_command(container_name, command_args) if single_hop else None
+            if hop:
+                self._log_path("Single hop", " ".join(hop))
+            if stream:
+                if hop:
+                    exit_code = self._stream_exec(hop, on_host=True)
+                else:
+                    exit_code = self._stream_exec(
+                        [*PODMAN_EXEC, container_name, *command_args]
+                    )
+                if exit_code != 0:
+                    exit(exit_code)
+                return
+            start = time.monotonic()
+            result = self._run_nested(container_name, command_args, hop)
 
             if result.returncode != 0:
                 cmd_str = " ".join(command)
@@ -836,52 +4703,187 @@ class QmController:
                 raise RuntimeError(err_msg)
 
             self._print_output(
-                {"output": result.stdout.strip()}
+                self._with_latency({"output": result.stdout.strip()}, start)
             )
 
         except Exception as e:
-            self._print_error_and_exit(QmError(str(e)))
+            self._print_error_and_exit(as_qm_error(e))
+
+    def _with_latency(self, data: dict, start: float) -> dict:
+        """Add the spawn-to-exit latency since start to JSON output."""
+        if self.output_config.output_json:
+            data["latency_ms"] = round((time.monotonic() - start) * 1000, 3)
+        return data
+
+    def _run_nested(self, name: str, command: list[str], single_hop: Optional[list[str]] = None) -> subprocess.CompletedProcess:
+        """Run a command in a nested container and capture its output.
+
+        Args:
+            name: Nested container name
+            command: Command and arguments to run
+            single_hop: nsenter command line from _single_hop_command, if any.
+                Its result is final: the command may have run before a
+                failure, and _nested_state already revalidated the cached
+                PID, so there is no retry through podman.
+
+        Returns:
+            subprocess.CompletedProcess: Result of the command
+        """
+        if single_hop:
+            return self._run_subprocess(single_hop)
+        return self.transport.exec(self.container, [*PODMAN_EXEC, name, *command])
+
+    def execin_many(
+        self, command: list[str], pattern: str = "*", output_json: bool = False, pretty: bool = True,
+        workers: int = EXECIN_FANOUT_WORKERS, single_hop: bool = False
+    ) -> None:
+        """Execute a command in every running nested container matching a glob.
+
+        Containers are processed concurrently on a bounded worker pool. The
+        per-container exit code, duration in seconds, output and error
+        output are printed in name order, as one JSON document keyed by
+        container name with output_json. qmctl exits with the exit code of
+        the first container that failed.
+
+        Args:
+            command (list): The command and its arguments to execute.
+            pattern (str): fnmatch-style glob for nested container names.
+            output_json (bool): If True, format the output as JSON.
+            pretty (bool): If True and output_json is True, pretty-print
+                the JSON.
+            workers (int): Maximum number of containers running the
+                command at once.
+            single_hop (bool): If True, enter each container with nsenter
+                from the host where possible.
+        """
+        self._configure_output(output_json, pretty)
+
+        try:
+            self._validate_container_exists()
+            self._validate_command_provided(command, "to execute in containers")
+            import fnmatch
+
+            names = [name for name in self._list_nested() if fnmatch.fnmatchcase(name, pattern)]
+            if not names:
+                raise ValidationError(f"No running nested container matches '{pattern}'.")
+
+            def collector(name: str) -> Callable[[], dict]:
+                def run() -> dict:
+                    start = time.monotonic()
+                    result = self._run_nested(name, command, self._single_hop_command(name, command) if single_hop else None)
+                    return {
+                        "exit_code": result.returncode,
+                        "duration": round(time.monotonic() - start, 3),
+                        "output": result.stdout.strip(),
+                        "error": result.stderr.strip(),
+                    }
+                return run
+
+            results = self._gather({name: collector(name) for name in names}, workers, action="Running in", label="containers")
+        except Exception as e:
+            self._print_error_and_exit(as_qm_error(e))
+            return
+
+        summary = {
+            name: {"exit_code": data.exit_code, "duration": None, "output": "", "error": str(data)}
+            if isinstance(data, QmError) else data
+            for name, data in results
+        }
+        if self.output_config.output_json:
+            self._print_output({"command": command, "containers": summary})
+        else:
+            for name, data in summary.items():
+                print(f"==> {name} (exit {data['exit_code']}, {data['duration']}s) <==")
+                if data["output"]:
+                    print(data["output"])
+                if data["error"]:
+                    print(data["error"], file=sys.stderr)
+
+        failed = [data["exit_code"] for data in summary.values() if data["exit_code"]]
+        if failed:
+            exit(failed[0])
 
     def _configure_output(self, output_json: bool = False, pretty: bool = True) -> None:
-        """Configure output settings for this operation."""
-        self.output_config = OutputConfig(output_json, pretty)
+        """Configure output settings for this operation; --output overrides them."""
+        if self.output_format:
+            output_json, pretty = True, self.output_format == "json"
+        self.output_config = OutputConfig(output_json, pretty, ndjson=self.output_format == "ndjson")
 
-    def _run_podman_exec(self, command: list[str], context: str = "Execute command") -> subprocess.CompletedProcess:
+    def _run_podman_exec(self, command: list[str], context: str = "Execute command", allow_empty: bool = False) -> subprocess.CompletedProcess:
         """Run podman exec with standard error handling.
 
         Args:
             command (list): Command to execute in container
             context (str): Context description for error messages
+            allow_empty (bool): Accept a successful command without output
 
         Returns:
             subprocess.CompletedProcess: The result of the subprocess run
         """
-        full_command = PODMAN_EXEC + [self.container] + command
-        result = self._run_subprocess(full_command)
+        result = self.transport.exec(self.container, command)
 
-        self._check_subprocess_result(result, context, command)
+        self._check_subprocess_result(result, context, command, allow_empty)
         return result
 
-    def _read_config_lines(self, filter_prefix: Optional[str] = None) -> Generator[str, None, None]:
-        """Read and filter config file lines.
+    def _read_config_lines(self, filter_prefix: Optional[str] = None) -> Generator[str, None, None]:
+        """Read and filter the lines of the merged config.
+
+        Args:
+            filter_prefix (str, optional): Only yield lines starting with
+                this prefix
+
+        Yields:
+            str: "Key=Value" lines of the config file and its drop-ins,
+                in the order quadlet applies them
+        """
+        yield from self._load_config().lines(filter_prefix)
+
+    def warm(self) -> None:
+        """Select the podman transport and load the configuration ahead of use.
+
+        The resident server calls this before forking the child answering
+        a request, so every child inherits the result. An API connection
+        opened meanwhile is closed again, as concurrent children sharing it
+        would interleave their requests. Errors are left for the request
+        to report.
+        """
+        with contextlib.suppress(QmError, OSError, ValueError):
+            self.transport
+            self._load_config()
+        if isinstance(self._transport, PodmanApiTransport):
+            self._transport.close()
+
+    def _load_config(self) -> QuadletConfig:
+        """Return the config file merged with its drop-ins.
 
-        Args:
-            filter_prefix (str, optional): Only yield lines starting with
-                this prefix
+        The merged result is kept in memory and in the state cache, keyed
+        by the inode, mtime and size of every contributing file, so it is
+        only read again after one of them changes. Every show topic shares
+        it, including those gathered concurrently by `show all`.
 
-        Yields:
-            str: Stripped lines from the config file
+        Raises:
+            ConfigNotFoundError: If the config file does not exist
         """
         self._validate_path_exists(self.config_path)
-        self._log_path("Reading", self.config_path)
-
-        with open(self.config_path, "r") as file:
-            for line in file:
-                stripped = line.strip()
-                if not stripped or stripped.startswith(COMMENT_PREFIX):
-                    continue
-                if not filter_prefix or stripped.startswith(filter_prefix):
-                    yield stripped
+        with self._config_lock:
+            files = QuadletConfig.find_files(self.config_path, quadlet_unit_dirs())
+            signature = QuadletConfig.file_signature(files)
+            if self._config is not None and self._config.signature == signature:
+                return self._config
+
+            cache_path = self.state_cache.keyed_path("config", self.config_path) if self.state_cache else None
+            cached = self.state_cache.read_json(cache_path) if self.state_cache and cache_path else None
+            if isinstance(cached, dict) and cached.get("signature") == signature:
+                self._log_path("Reading cached", self.config_path)
+                self._config = QuadletConfig.from_dict(cached)
+                return self._config
+
+            for path in files:
+                self._log_path("Reading", path)
+            self._config = QuadletConfig.parse(files, signature)
+            if self.state_cache and cache_path:
+                self.state_cache.write_json(cache_path, self._config.to_dict())
+            return self._config
 
 
 class ArgumentParserWithDefaults(argparse.ArgumentParser):
@@ -940,6 +4942,9 @@ def create_subcommand(
         argparse.ArgumentParser: The created subparser.
     """
     args_config = args_config or []
+    selected = getattr(subparsers, "qmctl_selected", None)
+    if selected is not None and selected != name:
+        args_config, epilog = [], None  # Not invoked; skip building its arguments
     parser = subparsers.add_parser(name, help=help_text, epilog=epilog, formatter_class=argparse.RawTextHelpFormatter)
 
     for arg_cfg in args_config:
@@ -997,6 +5002,393 @@ def run_command_with_error_handling(args: argparse.Namespace, controller: QmCont
         handle_error(e, errno.EIO)
 
 
+def default_server_socket() -> str:
+    """Return the unix socket path of the resident qmctl server."""
+    return os.environ.get(SERVER_SOCKET_ENV) or os.path.join(
+        ContainerStateCache.default_cache_dir(), SERVER_SOCKET_NAME
+    )
+
+
+def peer_allowed(sock: socket.socket) -> bool:
+    """Return True if the other end of a unix socket runs as root or as the current user.
+
+    The server checks its clients this way, and clients check the server
+    before trusting its output: a non-root socket path is predictable.
+    """
+    import socket
+
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid in (0, os.geteuid())
+
+
+def write_frame(sock: socket.socket, frame_type: int, payload: bytes) -> None:
+    """Send one length-prefixed frame using the exec stream header layout."""
+    sock.sendall(struct.pack(">BxxxL", frame_type, len(payload)) + payload)
+
+
+class FrameWriter(io.RawIOBase):
+    """Writable raw stream that sends everything written as frames."""
+
+    def __init__(self, sock: socket.socket, frame_type: int) -> None:
+        """Initialize the writer for a connected socket and frame type."""
+        super().__init__()
+        self.sock = sock
+        self.frame_type = frame_type
+
+    def writable(self) -> bool:
+        """Return True; the stream only supports writing."""
+        return True
+
+    def write(self, data: Any) -> int:
+        """Send data as a single frame and return the number of bytes."""
+        payload = bytes(data)
+        if payload:
+            write_frame(self.sock, self.frame_type, payload)
+        return len(payload)
+
+
+class QmctlServer:
+    """Resident qmctl process answering forwarded invocations.
+
+    The server keeps the argument parser and QmController instances warm
+    across calls, so a forwarded invocation costs one unix socket round
+    trip and a fork instead of interpreter startup, parser construction and
+    podman transport setup. The request is read and its controller warmed
+    in the server process; the answer comes from a forked child in its own
+    process group: the controller writes to the process-wide stdout and
+    stderr, and a child whose client hangs up can be killed with
+    everything it started.
+
+    Protocol: the client sends one JSON line {"argv": [...], "cwd": "..."};
+    the server answers with FRAME_STDOUT / FRAME_STDERR frames and a final
+    FRAME_EXIT frame carrying the decimal exit code.
+    """
+
+    def __init__(self, socket_path: str, parser: argparse.ArgumentParser) -> None:
+        """Initialize the server.
+
+        Args:
+            socket_path: Filesystem path to listen on
+            parser: Fully configured qmctl argument parser
+        """
+        self.socket_path = socket_path
+        self.parser = parser
+        self.controllers: dict[tuple, QmController] = {}  # Warm controllers by options
+        self.listener: Optional[socket.socket] = None
+        self.children: dict[int, tuple[int, socket.socket]] = {}  # pidfd -> (pid, connection)
+
+    def controller_for(self, args: argparse.Namespace) -> QmController:
+        """Return a warm controller matching the request's global options."""
+        key = (args.transport, args.no_cache, args.timeout)
+        if key not in self.controllers:
+            self.controllers[key] = QmController(transport=args.transport, use_cache=not args.no_cache, timeout=args.timeout)
+        controller = self.controllers[key]
+        controller.verbose = args.verbose
+        controller.output_format = getattr(args, "output", None)
+        controller.latencies.clear()  # Per request, so a long-running server does not accumulate them
+        return controller
+
+    def bind(self) -> None:
+        """Create the listening socket, readable only by the server's user."""
+        import socket
+
+        socket_dir = os.path.dirname(os.path.abspath(self.socket_path))
+        if not private_directory(socket_dir):
+            raise QmError(f"Refusing to serve from {socket_dir}: it must be a directory owned by the current user with mode 0700")
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)  # Stale socket from a previous server
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        listener.listen(16)
+        self.listener = listener
+
+    def serve_forever(self) -> None:
+        """Accept requests and answer each one in a child until interrupted.
+
+        The loop polls the listener, every client connection for a hangup
+        and every child's pidfd for its exit. A client that goes away
+        before its answer is complete gets its child's process group killed.
+        """
+        import select
+
+        if self.listener is None:
+            self.bind()
+        listener = self.listener
+        if listener is None:
+            return  # shutdown() ran before the loop started
+        poller = select.poll()
+        poller.register(listener, select.POLLIN)
+        hangups: dict[int, int] = {}  # connection fd -> pidfd
+        try:
+            while self.listener is not None:
+                for fd, events in poller.poll():
+                    if fd == listener.fileno():
+                        if events & (select.POLLHUP | select.POLLERR | select.POLLNVAL):
+                            return  # Listener shut down
+                        try:
+                            conn, _ = listener.accept()
+                        except OSError:
+                            return  # Listener closed by shutdown()
+                        request = self.receive(conn)
+                        if request is None:
+                            conn.close()
+                            continue
+                        args = self.warm(request)
+                        pidfd = self._fork_child(conn, request, args)
+                        hangups[conn.fileno()] = pidfd
+                        poller.register(pidfd, select.POLLIN)
+                        poller.register(conn, select.POLLRDHUP)
+                    elif fd in self.children:
+                        self._reap_child(fd, poller, hangups)
+                    elif fd in hangups:
+                        self._reap_child(hangups[fd], poller, hangups, kill=True)
+        finally:
+            for pidfd in list(self.children):
+                self._reap_child(pidfd, poller, hangups, kill=True)
+            self.shutdown()
+
+    def receive(self, conn: socket.socket) -> Optional[dict]:
+        """Read a client's request, or refuse the client.
+
+        Returns:
+            The decoded request, or None if the client is not allowed, too
+            slow or sent garbage
+        """
+        try:
+            if not peer_allowed(conn):
+                write_frame(conn, FRAME_STDERR, b"Error: permission denied\n")
+                write_frame(conn, FRAME_EXIT, str(errno.EPERM).encode())
+                return None
+            conn.settimeout(SERVER_REQUEST_TIMEOUT)  # The loop waits for it
+            request = json.loads(conn.makefile("rb").readline(SERVER_MAX_REQUEST))
+            conn.settimeout(None)
+        except (OSError, ValueError):
+            return None
+        return request if isinstance(request, dict) else None
+
+    def warm(self, request: dict) -> Optional[argparse.Namespace]:
+        """Parse a request and warm its controller in the server process.
+
+        Children cannot hand anything back, so the controller is created
+        and warmed here for the child and every later request to inherit.
+
+        Returns:
+            The parsed arguments, or None if parsing failed; the child then
+            parses again to report the error to its client
+        """
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                args = self.parser.parse_args([str(arg) for arg in request["argv"]])
+        except (SystemExit, KeyError, TypeError):
+            return None
+        if args.subcommand != "serve":
+            self.controller_for(args).warm()
+        return args
+
+    def _fork_child(self, conn: socket.socket, request: dict, args: Optional[argparse.Namespace]) -> int:
+        """Answer a request in a forked child and return the child's pidfd."""
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                os.setpgid(0, 0)
+                if self.listener is not None:
+                    self.listener.close()  # Not shutdown(): the socket file belongs to the parent
+                for other_pidfd, (_, other) in self.children.items():
+                    os.close(other_pidfd)
+                    other.close()
+                self.handle(conn, request, args)
+                status = 0
+            finally:
+                os._exit(status)
+        with contextlib.suppress(OSError):
+            os.setpgid(pid, pid)  # Also from the parent, so a kill cannot race the child's own call
+        pidfd = os.pidfd_open(pid)
+        self.children[pidfd] = (pid, conn)
+        return pidfd
+
+    def _reap_child(self, pidfd: int, poller: Any, hangups: dict[int, int], kill: bool = False) -> None:
+        """Wait for a child and close its connection.
+
+        Args:
+            pidfd: pidfd of the child
+            poller: select.poll object watching the child and connection
+            hangups: Connection fd to pidfd map, updated in place
+            kill: Kill the child's process group first if it is still running
+        """
+        pid, conn = self.children.pop(pidfd)
+        if kill and os.waitpid(pid, os.WNOHANG) == (0, 0):
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(pid, signal.SIGKILL)  # Still running: stop the child and what it started
+        with contextlib.suppress(ChildProcessError):
+            os.waitpid(pid, 0)
+        hangups.pop(conn.fileno(), None)
+        for fd in (pidfd, conn.fileno()):
+            with contextlib.suppress(KeyError):
+                poller.unregister(fd)
+        os.close(pidfd)
+        conn.close()
+
+    def shutdown(self) -> None:
+        """Close the listener and remove the socket file."""
+        listener, self.listener = self.listener, None
+        if listener is None:
+            return
+        import socket
+
+        with contextlib.suppress(OSError):
+            listener.shutdown(socket.SHUT_RDWR)  # Wakes a blocked accept()
+        listener.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+
+    def handle(self, conn: socket.socket, request: dict, args: Optional[argparse.Namespace] = None) -> None:
+        """Serve a single forwarded invocation."""
+        try:
+            exit_code = self.run(request, conn, args)
+            write_frame(conn, FRAME_EXIT, str(exit_code).encode())
+        except OSError:
+            pass  # Client went away
+
+    def run(self, request: dict, conn: socket.socket, args: Optional[argparse.Namespace] = None) -> int:
+        """Run a forwarded argv with output redirected to the client.
+
+        Args:
+            request: Decoded request with "argv" and "cwd"
+            conn: Client connection receiving output frames
+            args: request["argv"] already parsed by warm(), if it parsed
+
+        Returns:
+            int: Exit code of the invocation
+        """
+        stdout = io.TextIOWrapper(io.BufferedWriter(FrameWriter(conn, FRAME_STDOUT)), line_buffering=True)
+        stderr = io.TextIOWrapper(io.BufferedWriter(FrameWriter(conn, FRAME_STDERR)), line_buffering=True)
+        previous_cwd = os.getcwd()
+        try:
+            os.chdir(request.get("cwd") or "/")
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    if args is None:
+                        args = self.parser.parse_args([str(arg) for arg in request["argv"]])
+                    if args.subcommand == "serve":
+                        raise ValidationError("qmctl serve is already running")
+                    run_command_with_error_handling(args, self.controller_for(args), self.parser)
+                    return 0
+                except SystemExit as e:
+                    if e.code is None or isinstance(e.code, int):
+                        return e.code or 0
+                    print(e.code, file=sys.stderr)
+                    return 1
+                except QmError as e:
+                    perror(f"Error: {e}")
+                    return e.exit_code
+                finally:
+                    stdout.flush()
+                    stderr.flush()
+        finally:
+            os.chdir(previous_cwd)
+
+
+def _abbreviates(token: str, options: Iterable[str]) -> bool:
+    """Return True if token names one of the long options, abbreviated or not like argparse allows."""
+    name = token.split("=", 1)[0]
+    return len(name) > 2 and name.startswith("--") and any(option.startswith(name) for option in options)
+
+
+def _subcommand_of(argv: list[str]) -> Optional[str]:
+    """Return the subcommand named in argv, skipping global options and their values."""
+    tokens = iter(argv)
+    for token in tokens:
+        if "=" not in token and _abbreviates(token, ("--transport", "--timeout", "--output")):
+            next(tokens, None)
+        elif not token.startswith("-"):
+            return token
+    return None
+
+
+def _has_option(argv: list[str], options: Iterable[str]) -> bool:
+    """Return True if argv names one of the long options before any `--`."""
+    for token in argv:
+        if token == "--":
+            break
+        if _abbreviates(token, options):
+            return True
+    return False
+
+
+def _runs_locally(argv: list[str]) -> bool:
+    """Return True if an invocation runs until interrupted and so is never forwarded.
+
+    Forwarded, such a call would occupy a server child for its whole run
+    and lose the local terminal; `serve` itself always runs locally.
+    """
+    subcommand = _subcommand_of(argv)
+    if subcommand == "serve" or (subcommand == "show" and "resources" in argv):
+        return True  # `show resources` samples until interrupted by default
+    return _has_option(argv, LOCAL_OPTIONS.get(subcommand or "", ()))
+
+
+def forward_to_server(argv: list[str], socket_path: Optional[str] = None) -> Optional[int]:
+    """Forward an invocation to a running `qmctl serve` process.
+
+    Args:
+        argv: Command line arguments without the program name
+        socket_path: Override for the server socket path
+
+    Returns:
+        The exit code of the forwarded invocation, or None if it must run
+        locally (no server, forwarding disabled, completion, a server not
+        run by root or the current user, or see _runs_locally())
+    """
+    argv = list(argv)
+    if os.environ.get(NO_SERVER_ENV) or "_ARGCOMPLETE" in os.environ:
+        return None
+    if _runs_locally(argv):
+        return None
+    socket_path = socket_path or default_server_socket()
+    if not os.path.exists(socket_path):
+        return None  # Common case: no server, so don't pay for importing socket
+
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        if not peer_allowed(sock):
+            perror(f"Warning: ignoring {socket_path}, its server runs as another user")
+            sock.close()
+            return None
+    except OSError:
+        sock.close()
+        return None
+
+    targets = {FRAME_STDOUT: sys.stdout, FRAME_STDERR: sys.stderr}  # Before an in-process server can redirect them
+    with sock:
+        sock.sendall(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode() + b"\n")
+        exit_payload = b""
+        for frame_type, chunk in PodmanApiTransport.iter_frames(sock.makefile("rb")):
+            if frame_type == FRAME_EXIT:
+                exit_payload += chunk
+            elif frame_type in targets:
+                target = targets[frame_type]
+                if hasattr(target, "buffer"):
+                    target.buffer.write(chunk)
+                else:
+                    target.write(chunk.decode(errors="replace"))
+                target.flush()
+    if not exit_payload:
+        perror("Error: qmctl server closed the connection")
+        return 1
+    return int(exit_payload)
+
+
 def create_argument_parser(description: str) -> argparse.ArgumentParser:
     """Create and configure the argument parser for the CLI.
 
@@ -1025,6 +5417,30 @@ def configure_arguments(parser: argparse.ArgumentParser) -> None:
     verbosity_group.add_argument(
         "-v", "--verbose", action="store_true", help="Enable verbose output."
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not use the container state cached by earlier invocations",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        metavar="SECONDS",
+        help=("Deadline for each podman or host command; on expiry its "
+              f"process group is killed and qmctl exits with {QmError.EXIT_CODE_TIMEOUT}"),
+    )
+    parser.add_argument(
+        "--output",
+        choices=OUTPUT_FORMATS,
+        help=("Print JSON from any command: indented, compact on one line, "
+              "or as newline-delimited records (implies --json)"),
+    )
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORT_MODES,
+        help=("How to reach podman: the REST API socket, the podman CLI, "
+              f"or auto-detect (env: {TRANSPORT_ENV})"),
+    )
 
 
 def parse_arguments(parser: argparse.ArgumentParser) -> argparse.Namespace:
@@ -1056,12 +5472,36 @@ def init_cli() -> tuple[argparse.ArgumentParser, argparse.Namespace]:
     """
     description = get_description()
     parser = create_argument_parser(description)
-    configure_subcommands(parser)
+    # Completion reads the command line from the environment, so it needs every subcommand built
+    selected = None if "_ARGCOMPLETE" in os.environ else _subcommand_of(sys.argv[1:]) or ""
+    configure_subcommands(parser, selected=selected)
+    enable_completion(parser)
     args = parse_arguments(parser)
     post_parse_setup(args)
     return parser, args
 
 
+def enable_completion(parser: argparse.ArgumentParser) -> None:
+    """Hand over to argcomplete when the shell is requesting completions.
+
+    argcomplete is only imported when its environment variable is set, so
+    regular invocations never pay for probing it.
+
+    Args:
+        parser (argparse.ArgumentParser): The fully configured parser.
+    """
+    if "_ARGCOMPLETE" not in os.environ:
+        return
+    try:
+        import argcomplete
+    except ImportError:
+        return
+    try:
+        argcomplete.autocomplete(parser)
+    except Exception as e:
+        print(f"[WARNING] argcomplete failed: {e}", file=sys.stderr)
+
+
 def get_description() -> str:
     """Return the description of the QmController tool.
 
@@ -1096,24 +5536,35 @@ Examples:
   qmctl cp /host/file.txt qm:/tmp/file.txt
   qmctl cp qm:/tmp/data.log /host/backup/data.log
 
+  # Keep a warm resident server; later calls are forwarded to it
+  qmctl serve &
+
   # Output as JSON
   qmctl show --json
   qmctl exec --json hostname
   qmctl cp --json /host/file.txt qm:/tmp/file.txt"""
 
 
-def configure_subcommands(parser: argparse.ArgumentParser) -> None:
+def configure_subcommands(parser: argparse.ArgumentParser, selected: Optional[str] = None) -> None:
     """Add subcommand parsers to the main argument parser.
 
     Args:
         parser (argparse.ArgumentParser): The main argument parser.
+        selected (str, optional): When given, only this subcommand gets its
+            arguments and epilog; the others are registered by name so
+            they still show up in help and dispatch. None builds all.
     """
     subparsers = parser.add_subparsers(dest="subcommand", required=True)
     subparsers.required = False
+    subparsers.qmctl_selected = selected  # type: ignore
     init_show_subcommand(subparsers)
     init_exec_subcommand(subparsers)
     init_execin_subcommand(subparsers)
     init_cp_subcommand(subparsers)
+    init_sync_subcommand(subparsers)
+    init_pressure_subcommand(subparsers)
+    init_metrics_subcommand(subparsers)
+    init_serve_subcommand(subparsers)
 
 
 def init_show_subcommand(subparsers: argparse._SubParsersAction) -> None    :
@@ -1132,6 +5583,7 @@ def init_show_subcommand(subparsers: argparse._SubParsersAction) -> None    :
 
   # Show available devices
   qmctl show available-devices
+  qmctl show available-devices --details
 
   # Show Unix domain sockets
   qmctl show unix-domain-sockets
@@ -1139,15 +5591,27 @@ def init_show_subcommand(subparsers: argparse._SubParsersAction) -> None    :
   # Show shared memory segments
   qmctl show shared-memory
 
-  # Show resource usage (interactive)
+  # Show resource usage of qm.service every second until Ctrl+C
   qmctl show resources
 
+  # One sample over 5 seconds as JSON, for scripts
+  qmctl show resources --interval 5 --count 1 --json
+
+  # The five nested containers using the most memory
+  qmctl show resources --per-container --sort memory --top 5
+
   # Show namespaces
   qmctl show namespaces
 
   # Show all information
   qmctl show all
 
+  # Print the config again whenever qm.container or a drop-in changes
+  qmctl show container --watch
+
+  # Stream namespace changes as NDJSON patches
+  qmctl show namespaces --watch --json
+
   # Output as JSON
   qmctl show --json
   qmctl show available-devices --json"""
@@ -1171,6 +5635,47 @@ def init_show_subcommand(subparsers: argparse._SubParsersAction) -> None    :
             'name': ['--json'],
             'action': 'store_true',
             'help': "Output as JSON"
+        },
+        {
+            'name': ['--details'],
+            'action': 'store_true',
+            'help': ("Report device type, major:minor and readability "
+                     "(available-devices)")
+        },
+        {
+            'name': ['--watch'],
+            'action': 'store_true',
+            'help': "Print the topic again whenever it changes (all topics but resources)"
+        },
+        {
+            'name': ['--interval'],
+            'type': float,
+            'default': None,
+            'help': (f"Seconds between samples (resources, default {RESOURCES_INTERVAL:g}) or between "
+                     f"re-checks of /proc topics (--watch, default {WATCH_INTERVAL:g}, 0 for inotify only)")
+        },
+        {
+            'name': ['--count'],
+            'type': int,
+            'default': None,
+            'help': "Number of samples or --watch updates, 0 until interrupted (default 0)"
+        },
+        {
+            'name': ['--per-container'],
+            'action': 'store_true',
+            'help': "Break resources down by nested container (resources)"
+        },
+        {
+            'name': ['--sort'],
+            'choices': list(RESOURCES_SORT_KEYS),
+            'default': None,
+            'help': "Rank nested containers by this usage (resources, default cpu)"
+        },
+        {
+            'name': ['--top'],
+            'type': int,
+            'default': None,
+            'help': "Show at most N nested containers per sample (resources)"
         }
     ]
     create_subcommand(
@@ -1203,6 +5708,10 @@ def init_exec_subcommand(subparsers: argparse._SubParsersAction) -> None:
   # Read file contents
   qmctl exec cat /etc/os-release
 
+  # Follow output while the command runs
+  qmctl exec --stream journalctl -f
+  qmctl exec --stream --json find / -name '*.conf'
+
   # Output as JSON
   qmctl exec --json hostname"""
     args_config = [
@@ -1215,6 +5724,11 @@ def init_exec_subcommand(subparsers: argparse._SubParsersAction) -> None:
             'name': ['--json'],
             'action': 'store_true',
             'help': "Output as JSON"
+        },
+        {
+            'name': ['--stream'],
+            'action': 'store_true',
+            'help': "Forward output as it is produced (NDJSON frames with --json)"
         }
     ]
     create_subcommand(
@@ -1244,8 +5758,20 @@ def init_execin_subcommand(subparsers: argparse._SubParsersAction) -> None:
   # Check hostname in nested container
   qmctl execin rear_camera hostname
 
+  # Follow output while the command runs
+  qmctl execin --stream radio journalctl -f
+
   # Output as JSON
-  qmctl execin --json radio hostname"""
+  qmctl execin --json radio hostname
+
+  # Run in every running nested container, 8 at a time
+  qmctl execin --all --jobs 8 df -h
+
+  # Run in nested containers whose name matches a glob
+  qmctl execin --match 'camera_*' --json uptime
+
+  # Skip the nested podman exec for a trusted diagnostic command
+  qmctl execin --single-hop radio cat /proc/loadavg"""
     args_config = [
         {
             'name': ['cmd'],
@@ -1256,6 +5782,33 @@ def init_execin_subcommand(subparsers: argparse._SubParsersAction) -> None:
             'name': ['--json'],
             'action': 'store_true',
             'help': "Output as JSON"
+        },
+        {
+            'name': ['--stream'],
+            'action': 'store_true',
+            'help': "Forward output as it is produced (NDJSON frames with --json); not with --all/--match"
+        },
+        {
+            'name': ['--all'],
+            'action': 'store_true',
+            'help': "Run the command in every running nested container"
+        },
+        {
+            'name': ['--single-hop'],
+            'action': 'store_true',
+            'help': ("As root, enter the nested container's namespaces with nsenter instead of a nested "
+                     "podman exec; the command keeps the host's SELinux label, capabilities and cgroup")
+        },
+        {
+            'name': ['--match'],
+            'metavar': 'GLOB',
+            'help': "Run the command in running nested containers matching GLOB"
+        },
+        {
+            'name': ['--jobs', '-j'],
+            'type': int,
+            'default': EXECIN_FANOUT_WORKERS,
+            'help': f"Containers to run at once with --all/--match (default: {EXECIN_FANOUT_WORKERS})"
         }
     ]
     create_subcommand(
@@ -1286,18 +5839,224 @@ def init_cp_subcommand(subparsers: argparse._SubParsersAction) -> None:
   qmctl cp /host/source.conf qm:/etc/target.conf
 
   # Output as JSON
-  qmctl cp --json /host/file.txt qm:/tmp/file.txt"""
+  qmctl cp --json /host/file.txt qm:/tmp/file.txt
+
+  # Stream a large tree through one exec pipe, zstd-compressed,
+  # with progress and throughput as newline-delimited JSON
+  qmctl cp --compress zstd --json /var/lib/maps qm:/var/lib/
+
+  # Copy many sources into one directory in a single transfer,
+  # with a result per source
+  qmctl cp --json /etc/app/*.conf qm:/etc/app/"""
     args_config = [
         {
             'name': ['paths'],
-            'nargs': 2,
-            'help': ("Source and destination paths (e.g., "
+            'nargs': '+',
+            'help': ("Source paths followed by the destination (e.g., "
                      "/path/to/file /path/in/container)")
         },
         {
             'name': ['--json'],
             'action': 'store_true',
             'help': "Output as JSON"
+        },
+        {
+            'name': ['--stream'],
+            'action': 'store_true',
+            'help': "Stream a tar archive through one exec pipe and report throughput"
+        },
+        {
+            'name': ['--compress'],
+            'choices': list(COPY_COMPRESSION),
+            'help': "Compress the streamed archive (implies --stream; needs the tool on both ends)"
+        }
+    ]
+    create_subcommand(
+        subparsers, name, help_text, default_func, args_config, epilog
+    )
+
+
+def init_sync_subcommand(subparsers: argparse._SubParsersAction) -> None:
+    """Initialize the 'sync' subcommand for incremental copies.
+
+    Args:
+        subparsers: The subparser object from the main parser.
+    """
+    name = "sync"
+    help_text = "Copy only added or changed files from a host directory into QM"
+    default_func = handle_sync_command
+    epilog = """Examples:
+  # Make qm:/etc/myapp match /srv/myapp/config (contents, not the directory)
+  qmctl sync /srv/myapp/config qm:/etc/myapp
+
+  # Also remove files that no longer exist on the host
+  qmctl sync --delete /srv/models qm:/var/lib/models
+
+  # Show what would change
+  qmctl sync --dry-run --json /srv/models qm:/var/lib/models
+
+  # Hash the destination again after it was modified inside QM
+  qmctl sync --rescan /srv/models qm:/var/lib/models"""
+    args_config = [
+        {
+            'name': ['src'],
+            'help': "Host directory whose contents are synced"
+        },
+        {
+            'name': ['dst'],
+            'help': "Destination directory, e.g. qm:/etc/myapp"
+        },
+        {
+            'name': ['--delete'],
+            'action': 'store_true',
+            'help': "Remove destination files that do not exist in the source"
+        },
+        {
+            'name': ['--dry-run'],
+            'action': 'store_true',
+            'help': "Report changes without transferring or deleting anything"
+        },
+        {
+            'name': ['--rescan'],
+            'action': 'store_true',
+            'help': "Ignore the cached destination manifest and hash it again"
+        },
+        {
+            'name': ['--compress'],
+            'choices': list(COPY_COMPRESSION),
+            'default': "none",
+            'help': "Compress the transfer (needs the tool on both ends)"
+        },
+        {
+            'name': ['--json'],
+            'action': 'store_true',
+            'help': "Output as JSON"
+        }
+    ]
+    create_subcommand(
+        subparsers, name, help_text, default_func, args_config, epilog
+    )
+
+
+def init_pressure_subcommand(subparsers: argparse._SubParsersAction) -> None:
+    """Initialize the 'pressure' subcommand for PSI monitoring.
+
+    Args:
+        subparsers: The subparser object from the main parser.
+    """
+    name = "pressure"
+    help_text = "Show or watch CPU, memory and IO pressure of QM"
+    default_func = handle_pressure_command
+    epilog = f"""Examples:
+  # Stall averages of qm.service and every nested container
+  qmctl pressure
+
+  # Report whenever any resource crosses the default thresholds
+  # ({', '.join(PSI_DEFAULT_THRESHOLDS)})
+  qmctl pressure --watch
+
+  # Alert when tasks are fully stalled on memory for 100ms within 1s
+  qmctl pressure --watch --threshold memory:full=100/1000 --json"""
+    args_config = [
+        {
+            'name': ['--watch'],
+            'action': 'store_true',
+            'help': "Wait for threshold crossings using kernel PSI triggers"
+        },
+        {
+            'name': ['--threshold'],
+            'action': 'append',
+            'default': None,
+            'metavar': 'RESOURCE[:some|full]=STALL_MS/WINDOW_MS',
+            'help': "Trigger for --watch; may be repeated"
+        },
+        {
+            'name': ['--count'],
+            'type': int,
+            'default': None,
+            'help': "Exit after N events with --watch (default: run until interrupted)"
+        },
+        {
+            'name': ['--json'],
+            'action': 'store_true',
+            'help': "Output as JSON (one object per event with --watch)"
+        }
+    ]
+    create_subcommand(
+        subparsers, name, help_text, default_func, args_config, epilog
+    )
+
+
+def init_metrics_subcommand(subparsers: argparse._SubParsersAction) -> None:
+    """Initialize the 'metrics' subcommand for the OpenMetrics exporter.
+
+    Args:
+        subparsers: The subparser object from the main parser.
+    """
+    name = "metrics"
+    help_text = "Export OpenMetrics for qm.service and nested containers"
+    default_func = handle_metrics_command
+    epilog = f"""Examples:
+  # Print one scrape in OpenMetrics format
+  qmctl metrics
+
+  # Feed node_exporter's textfile collector every 15 seconds
+  qmctl metrics --textfile /var/lib/node_exporter/textfile/qm.prom --interval 15
+
+  # Serve http://{METRICS_LISTEN}/metrics until interrupted
+  qmctl metrics --listen"""
+    args_config = [
+        {
+            'name': ['--textfile'],
+            'default': None,
+            'metavar': 'PATH',
+            'help': "Atomically write Prometheus text to PATH instead of printing OpenMetrics"
+        },
+        {
+            'name': ['--listen'],
+            'nargs': '?',
+            'const': METRICS_LISTEN,
+            'default': None,
+            'metavar': '[HOST:]PORT',
+            'help': f"Serve GET /metrics over HTTP (default address {METRICS_LISTEN})"
+        },
+        {
+            'name': ['--interval'],
+            'type': float,
+            'default': None,
+            'metavar': 'SECONDS',
+            'help': "Rewrite the --textfile every SECONDS until interrupted"
+        }
+    ]
+    create_subcommand(
+        subparsers, name, help_text, default_func, args_config, epilog
+    )
+
+
+def init_serve_subcommand(subparsers: argparse._SubParsersAction) -> None:
+    """Initialize the 'serve' subcommand for the resident server.
+
+    Args:
+        subparsers: The subparser object from the main parser.
+    """
+    name = "serve"
+    help_text = "Run a resident qmctl server that other invocations forward to"
+    default_func = handle_serve_command
+    epilog = f"""Examples:
+  # Start the server; later qmctl calls are forwarded to it automatically
+  qmctl serve
+
+  # Listen on a custom socket
+  qmctl serve --socket /run/qmctl/custom.sock
+  {SERVER_SOCKET_ENV}=/run/qmctl/custom.sock qmctl show
+
+  # Bypass a running server for one call
+  {NO_SERVER_ENV}=1 qmctl show"""
+    args_config = [
+        {
+            'name': ['--socket'],
+            'default': None,
+            'help': f"Unix socket to listen on (env: {SERVER_SOCKET_ENV})"
         }
     ]
     create_subcommand(
@@ -1326,8 +6085,23 @@ def handle_show_command(args: argparse.Namespace, controller: QmController) -> N
         args.show_command_topic,
         controller.show_container if args.show_command_topic is None else None)
 
-    if command_to_execute:
-        command_to_execute(output_json=args.json, pretty=True)
+    options = {}
+    if args.show_command_topic == "available-devices" and getattr(args, "details", False):
+        options["details"] = True
+    if args.show_command_topic == "resources":
+        for option in ("interval", "count", "sort", "top"):
+            if getattr(args, option, None) is not None:
+                options[option] = getattr(args, option)
+        if getattr(args, "per_container", False):
+            options["per_container"] = True
+
+    if command_to_execute and getattr(args, "watch", False):
+        watch_options = {option: getattr(args, option) for option in ("interval", "count") if getattr(args, option, None) is not None}
+        if options.get("details"):
+            watch_options["details"] = True
+        controller.watch_topic(args.show_command_topic or "container", output_json=args.json, pretty=True, **watch_options)
+    elif command_to_execute:
+        command_to_execute(output_json=args.json, pretty=True, **options)
     else:
         print(f"Error: Unknown show command '{args.show_command_topic}'.")
 
@@ -1339,8 +6113,9 @@ def handle_exec_command(args: argparse.Namespace, controller: QmController) -> N
         args: The parsed command-line arguments.
         controller: An instance of the QmController class.
     """
+    options = {"stream": True} if getattr(args, "stream", False) else {}
     controller.exec_in_container(
-        command=args.cmd, output_json=args.json, pretty=True
+        command=args.cmd, output_json=args.json, pretty=True, **options
     )
 
 
@@ -1351,8 +6126,19 @@ def handle_execin_command(args: argparse.Namespace, controller: QmController) ->
         args: The parsed command-line arguments.
         controller: An instance of the QmController class.
     """
+    options = {"single_hop": True} if getattr(args, "single_hop", False) else {}
+    if getattr(args, "all", False) or getattr(args, "match", None):
+        if getattr(args, "stream", False):
+            raise ValidationError("--stream cannot be combined with --all or --match.")
+        controller.execin_many(
+            command=args.cmd, pattern=args.match or "*", output_json=args.json,
+            pretty=True, workers=args.jobs, **options
+        )
+        return
+    if getattr(args, "stream", False):
+        options["stream"] = True
     controller.execin_in_container(
-        command=args.cmd, output_json=args.json, pretty=True
+        command=args.cmd, output_json=args.json, pretty=True, **options
     )
 
 
@@ -1363,22 +6149,90 @@ def handle_cp_command(args: argparse.Namespace, controller: QmController) -> Non
         args: The parsed command-line arguments.
         controller: An instance of the QmController class.
     """
+    options = {}
+    if getattr(args, "stream", False):
+        options["stream"] = True
+    if getattr(args, "compress", None):
+        options["compress"] = args.compress
     controller.copy_in_container(
-        paths=args.paths, output_json=args.json, pretty=True
+        paths=args.paths, output_json=args.json, pretty=True, **options
+    )
+
+
+def handle_sync_command(args: argparse.Namespace, controller: QmController) -> None:
+    """Handle the logic for the 'sync' subcommand.
+
+    Args:
+        args: The parsed command-line arguments.
+        controller: An instance of the QmController class.
+    """
+    controller.sync_to_container(
+        src=args.src, dst=args.dst, output_json=args.json, pretty=True,
+        delete=args.delete, dry_run=args.dry_run, rescan=args.rescan,
+        compress=args.compress,
     )
 
 
+def handle_pressure_command(args: argparse.Namespace, controller: QmController) -> None:
+    """Handle the logic for the 'pressure' subcommand.
+
+    Args:
+        args: The parsed command-line arguments.
+        controller: An instance of the QmController class.
+    """
+    if args.watch:
+        controller.watch_pressure(
+            thresholds=args.threshold, output_json=args.json,
+            count=args.count or 0,
+        )
+    elif args.threshold or args.count is not None:
+        raise ValidationError("--threshold and --count require --watch.")
+    else:
+        controller.show_pressure(output_json=args.json, pretty=True)
+
+
+def handle_metrics_command(args: argparse.Namespace, controller: QmController) -> None:
+    """Handle the logic for the 'metrics' subcommand.
+
+    Args:
+        args: The parsed command-line arguments.
+        controller: An instance of the QmController class.
+    """
+    options = {option: getattr(args, option) for option in ("textfile", "listen", "interval") if getattr(args, option, None) is not None}
+    controller.export_metrics(**options)
+
+
+def handle_serve_command(args: argparse.Namespace, controller: QmController) -> None:
+    """Handle the logic for the 'serve' subcommand.
+
+    Args:
+        args: The parsed command-line arguments.
+        controller: An instance of the QmController class.
+    """
+    parser = create_argument_parser(get_description())
+    configure_subcommands(parser)
+    server = QmctlServer(args.socket or default_server_socket(), parser)
+    controller.warm()
+    server.controllers[(args.transport, args.no_cache, args.timeout)] = controller
+    server.bind()
+    print(f"[INFO] qmctl server listening on {server.socket_path}", file=sys.stderr)
+    server.serve_forever()
+
+
 def main() -> None:
     """Run the main qmctl command-line interface."""
-    parser, args = init_cli()
-    controller = QmController(verbose=args.verbose)
+    exit_code = forward_to_server(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
 
-    if importlib.util.find_spec("argcomplete") is not None:
-        import argcomplete
-        try:
-            argcomplete.autocomplete(parser)
-        except Exception as e:
-            print(f"[WARNING] argcomplete failed: {e}", file=sys.stderr)
+    parser, args = init_cli()
+    controller = QmController(
+        verbose=args.verbose,
+        transport=args.transport,
+        use_cache=not args.no_cache,
+        timeout=args.timeout,
+        output_format=args.output,
+    )
 
     run_command_with_error_handling(args, controller, parser)
 
@@ -3,8 +3,22 @@
 
 import json
 import errno
+import http.server
+import io
 import os
+import select
+import shutil
+import socket
+import socketserver
+import statistics
+import struct
+import subprocess
+import sys
+import tarfile
 import tempfile
+import threading
+import time
+import urllib.parse
 from unittest.mock import Mock, patch
 
 import pytest
@@ -19,7 +33,17 @@ ConfigNotFoundError = qmctl.ConfigNotFoundError
 ContainerNotFoundError = qmctl.ContainerNotFoundError
 CommandNotFoundError = qmctl.CommandNotFoundError
 ValidationError = qmctl.ValidationError
+PodmanApiError = qmctl.PodmanApiError
+CommandTimeoutError = qmctl.CommandTimeoutError
 OutputConfig = qmctl.OutputConfig
+CliTransport = qmctl.CliTransport
+PodmanApiTransport = qmctl.PodmanApiTransport
+select_transport = qmctl.select_transport
+ContainerStateCache = qmctl.ContainerStateCache
+read_process_start_time = qmctl.read_process_start_time
+private_directory = qmctl.private_directory
+QmctlServer = qmctl.QmctlServer
+forward_to_server = qmctl.forward_to_server
 create_argument_parser = qmctl.create_argument_parser
 main = qmctl.main
 handle_show_command = qmctl.handle_show_command
@@ -30,6 +54,16 @@ DEFAULT_CONFIG_PATH = qmctl.DEFAULT_CONFIG_PATH
 DEFAULT_CONTAINER_NAME = qmctl.DEFAULT_CONTAINER_NAME
 
 
+@pytest.fixture(autouse=True)
+def isolated_state_cache(tmp_path, monkeypatch):
+    """Keep the state cache and quadlet search path off the real system."""
+    cache_dir = tmp_path / "qmctl-cache"
+    monkeypatch.setenv(qmctl.CACHE_DIR_ENV, str(cache_dir))
+    monkeypatch.setenv(qmctl.QUADLET_UNIT_DIRS_ENV,
+                       str(tmp_path / "no-quadlet-dirs"))
+    return cache_dir
+
+
 @pytest.fixture
 def mock_config_content():
     """Sample container configuration content for testing."""
@@ -63,7 +97,8 @@ def qm_controller(temp_config_file):
     return QmController(
         config_path=temp_config_file,
         verbose=False,
-        container_name="test-qm"
+        container_name="test-qm",
+        transport="cli"
     )
 
 
@@ -73,7 +108,8 @@ def qm_controller_verbose(temp_config_file):
     return QmController(
         config_path=temp_config_file,
         verbose=True,
-        container_name="test-qm"
+        container_name="test-qm",
+        transport="cli"
     )
 
 
@@ -100,6 +136,187 @@ def mock_path_exists():
         yield mock
 
 
+class FakePodmanHandler(http.server.BaseHTTPRequestHandler):
+    """Minimal libpod API stand-in served over a unix socket."""
+
+    protocol_version = "HTTP/1.1"
+    prefix = "/" + qmctl.PODMAN_API_VERSION + "/libpod"
+
+    def setup(self):
+        """Count accepted connections."""
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        """Silence request logging."""
+
+    def _reply(self, status, body=b"", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _route(self):
+        path, _, query = self.path.partition("?")
+        assert path.startswith(self.prefix)
+        params = dict(urllib.parse.parse_qsl(query))
+        return path[len(self.prefix):].strip("/").split("/"), params
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        """Serve ping, exists, inspect, exec status and archives."""
+        parts, params = self._route()
+        containers = self.server.containers
+        if parts == ["_ping"]:
+            self._reply(200, b"OK")
+        elif parts[0] == "containers" and parts[2] == "exists":
+            self._reply(204 if parts[1] in containers else 404)
+        elif parts[0] == "containers" and parts[2] == "json":
+            if parts[1] in containers:
+                self._reply(200, containers[parts[1]])
+            else:
+                self._reply(404, {"message": "no such container"})
+        elif parts[0] == "exec" and parts[2] == "json":
+            self._reply(200, {"ExitCode": self.server.exit_code})
+        elif parts[0] == "containers" and parts[2] == "archive":
+            buf = io.BytesIO()
+            with tarfile.open(fileobj=buf, mode="w") as archive:
+                data = self.server.files[params["path"]]
+                info = tarfile.TarInfo(os.path.basename(params["path"]))
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+            self._reply(200, buf.getvalue())
+        else:
+            self._reply(404, {"message": "not found"})
+
+    def do_HEAD(self):
+        """Report that archive targets are missing so files are renamed."""
+        self._reply(404)
+
+    def do_POST(self):
+        """Serve exec create and exec start."""
+        parts, _ = self._route()
+        body = json.loads(self._body() or b"{}")
+        if parts[0] == "containers" and parts[2] == "exec":
+            self.server.commands.append(body["Cmd"])
+            self._reply(201, {"Id": "exec0"})
+        elif parts[0] == "exec" and parts[2] == "start":
+            out = " ".join(self.server.commands[-1]).encode() + b"\n"
+            err = b"warning\n"
+            frames = (struct.pack(">BxxxL", 1, len(out)) + out
+                      + struct.pack(">BxxxL", 2, len(err)) + err)
+            self._reply(200, frames)
+        else:
+            self._reply(404, {"message": "not found"})
+
+    def do_PUT(self):
+        """Accept archive uploads."""
+        _, params = self._route()
+        data = self._body()
+        with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+            for member in archive.getmembers():
+                target = params["path"]
+                self.server.files[os.path.join(target, member.name)] = (
+                    archive.extractfile(member).read()
+                )
+        self._reply(200)
+
+
+@pytest.fixture
+def fake_podman_api():
+    """Run a fake podman API server on a temporary unix socket."""
+    socket_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(socket_dir, "podman.sock")
+    server = socketserver.ThreadingUnixStreamServer(
+        socket_path, FakePodmanHandler
+    )
+    server.daemon_threads = True
+    server.connections = 0
+    server.exit_code = 0
+    server.commands = []
+    server.files = {}
+    server.containers = {"test-qm": {"Id": "abc", "State": {"Pid": 42}}}
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05},
+        daemon=True
+    )
+    thread.start()
+    yield server, socket_path
+    server.shutdown()
+    server.server_close()
+    os.unlink(socket_path)
+    os.rmdir(socket_dir)
+
+
+@pytest.fixture
+def fake_podman_cli(tmp_path, monkeypatch):
+    """Put a `podman` on PATH whose exec runs the command on the host."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    podman = bin_dir / "podman"
+    podman.write_text(
+        "#!/bin/sh\n"
+        "[ \"$1\" = exec ] || exit 125\n"
+        "shift\n"
+        "[ \"$1\" = -i ] && shift\n"
+        "shift\n"
+        "exec \"$@\"\n"
+    )
+    podman.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return podman
+
+
+@pytest.fixture
+def fake_cgroup(tmp_path, monkeypatch):
+    """Point CGROUP_ROOT at a directory tree shaped like cgroup v2."""
+    root = tmp_path / "cgroup"
+    monkeypatch.setattr(qmctl, "CGROUP_ROOT", str(root))
+
+    def write(relpath, usage_usec=0, memory=0, rbytes=0, wbytes=0):
+        path = root / relpath
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "cpu.stat").write_text(
+            f"usage_usec {usage_usec}\nuser_usec 0\nsystem_usec 0\n")
+        (path / "memory.current").write_text(f"{memory}\n")
+        (path / "memory.stat").write_text(
+            f"anon {memory // 2}\nfile {memory // 4}\npgmajfault 0\n")
+        (path / "io.stat").write_text(
+            f"8:0 rbytes={rbytes} wbytes={wbytes} rios=1 wios=1\n"
+            "259:0 rbytes=0 wbytes=0 rios=0 wios=0\n")
+        return path
+    write.root = root
+    return write
+
+
+@pytest.fixture
+def qmctl_server(temp_config_file):
+    """Run a resident qmctl server on a temporary socket."""
+    socket_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(socket_dir, "qmctl.sock")
+    parser = create_argument_parser(qmctl.get_description())
+    qmctl.configure_subcommands(parser)
+    server = QmctlServer(socket_path, parser)
+    server.controllers[(None, False, None)] = QmController(
+        config_path=temp_config_file, container_name="test-qm",
+        transport="cli"
+    )
+    server.bind()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join(timeout=5)
+    os.rmdir(socket_dir)
+
+
 @pytest.fixture
 def sample_cli_args():
     """Sample command line arguments for testing."""
@@ -320,11 +537,16 @@ class TestQmController:
     def test_container_exists_true(self, qm_controller, mock_subprocess_run):
         """Test container existence check returning True."""
         mock_subprocess_run.return_value.returncode = 0
+        mock_subprocess_run.return_value.stdout = json.dumps(
+            [{"Id": "abc", "State": {"Pid": 0}}])
         assert qm_controller._container_exists("existing-container") is True
 
     def test_container_exists_false(self, qm_controller, mock_subprocess_run):
         """Test container existence check returning False."""
-        mock_subprocess_run.return_value.returncode = 1
+        mock_subprocess_run.return_value.returncode = 125
+        mock_subprocess_run.return_value.stdout = "[]\n"
+        mock_subprocess_run.return_value.stderr = (
+            "Error: no such container non-existing-container\n")
         assert (
             qm_controller._container_exists("non-existing-container") is False
         )
@@ -343,25 +565,55 @@ class TestQmController:
         expected_devices = []
         assert devices == expected_devices
 
-    def test_run_command_for_each_device(
-        self, qm_controller, mock_subprocess_run
-    ):
-        """Test running commands for each device."""
-        devices = ["/dev/device1", "/dev/device2"]
-        base_command = ["test", "-e"]
-
-        # Mock successful run for first device, failure for second
-        mock_subprocess_run.side_effect = [
-            Mock(returncode=0),
-            Mock(returncode=1)
-        ]
-
-        results = qm_controller._run_command_for_each_device(
-            devices, base_command
+    def test_probe_devices_single_exec(self, qm_controller):
+        """Test that all devices are probed in one container exec."""
+        transport = Mock()
+        transport.exec.return_value = Mock(
+            returncode=0,
+            stdout="/dev/kvm\t1\tchar\t1\ta:e8\n/dev/fuse\t0\t\t0\t\n",
+            stderr=""
         )
+        qm_controller._transport = transport
+
+        results = qm_controller._probe_devices(["/dev/kvm", "/dev/fuse"])
+
+        assert transport.exec.call_count == 1
+        assert results["/dev/kvm"] == {
+            "present": True, "type": "char",
+            "major_minor": "10:232", "readable": True
+        }
+        assert results["/dev/fuse"]["present"] is False
+
+    def test_probe_devices_script(self, qm_controller):
+        """Test the probe script against real host paths."""
+        transport = Mock()
+        transport.exec.side_effect = lambda container, cmd: (
+            qmctl.subprocess.run(cmd, capture_output=True, text=True)
+        )
+        qm_controller._transport = transport
+
+        results = qm_controller._probe_devices(["/dev/null", "/nonexistent"])
+
+        assert results["/dev/null"]["present"] is True
+        assert results["/dev/null"]["type"] == "char"
+        assert results["/dev/null"]["major_minor"] == "1:3"
+        assert results["/nonexistent"]["present"] is False
+
+    def test_collect_available_devices_boolean_map(
+        self, qm_controller, mock_container_exists
+    ):
+        """Test the default output keeps the present/missing map."""
+        devices = {
+            "/dev/kvm": {"present": True},
+            "/dev/fuse": {"present": False},
+        }
+        with patch.object(
+            qm_controller, '_extract_devices_from_config',
+            return_value=list(devices)
+        ), patch.object(qm_controller, '_probe_devices', return_value=devices):
+            output = qm_controller._collect_available_devices()
 
-        assert results == {"/dev/device1": True, "/dev/device2": False}
-        assert mock_subprocess_run.call_count == 2
+        assert output == {"/dev/kvm": True, "/dev/fuse": False}
 
     def test_print_output_text_mode(self, qm_controller, capsys):
         """Test text output printing."""
@@ -429,6 +681,2510 @@ class TestQmController:
             assert exc_info.value.code == 1
 
 
+class TestJsonOutput:
+    """Test --output formats and the JSON encoder."""
+
+    DOCUMENT = {
+        "containers": {"qm": {"shm_bytes": 4096}, "radio": {"shm_bytes": 0}},
+        "shm": [{"key": 1, "bytes": 4096}, {"key": 2, "bytes": 0}],
+        "msg": [],
+        "total": 4096,
+    }
+
+    # Rows in the synthetic per-process table of the benchmark
+    BENCHMARK_ROWS = 50000
+
+    def test_json_dumps_matches_stdlib(self, monkeypatch):
+        """Test orjson and the json fallback encode the same document."""
+        document = {**self.DOCUMENT, 7: "int key", "big": 2 ** 70}
+        expected = json.loads(json.dumps(document))
+
+        assert json.loads(qmctl.json_dumps(document)) == expected
+        monkeypatch.setitem(qmctl._optional_modules, "orjson", None)
+        fallback = qmctl.json_dumps(document)
+        assert json.loads(fallback) == expected
+        assert "\n" not in fallback and ", " not in fallback
+        assert qmctl.json_dumps(document, indent=4) == \
+            json.dumps(document, indent=4)
+
+    def test_ndjson_records_split_tables(self):
+        """Test tables become tagged records and scalars stay together."""
+        assert list(qmctl.ndjson_records(self.DOCUMENT)) == [
+            {"msg": [], "total": 4096},
+            {"record": "containers/qm", "shm_bytes": 4096},
+            {"record": "containers/radio", "shm_bytes": 0},
+            {"record": "shm", "key": 1, "bytes": 4096},
+            {"record": "shm", "key": 2, "bytes": 0},
+        ]
+        assert list(qmctl.ndjson_records({})) == [{}]
+        assert list(qmctl.ndjson_records([1, 2])) == [{"value": [1, 2]}]
+
+    def test_output_ndjson_overrides_text(self, qm_controller, capsys):
+        """Test --output ndjson prints JSON records without --json."""
+        qm_controller.output_format = "ndjson"
+        qm_controller.show_container(output_json=False)
+
+        records = [json.loads(line)
+                   for line in capsys.readouterr().out.splitlines()]
+        assert records[0]["path"] == qm_controller.config_path
+        container = [r for r in records
+                     if r.get("record") == "sections/Container"]
+        assert container[0]["Image"] == "localhost/qm:latest"
+
+    def test_output_compact_is_one_line(self, qm_controller, capsys):
+        """Test --output compact prints the document on one line."""
+        qm_controller.output_format = "compact"
+        qm_controller.show_container(output_json=True)
+
+        out = capsys.readouterr().out
+        assert out.count("\n") == 1
+        assert "sections" in json.loads(out)
+
+    def test_output_option(self):
+        """Test --output is a global option skipped by forwarding."""
+        parser = create_argument_parser("Test")
+        qmctl.configure_subcommands(parser)
+
+        args = parser.parse_args(["--output", "ndjson", "show"])
+        assert args.output == "ndjson"
+        assert qmctl._subcommand_of(["--output", "compact", "show"]) == \
+            "show"
+
+    @pytest.mark.performance
+    def test_serialisation_cost_of_large_tables(self, monkeypatch):
+        """Measure encoding a large per-process table in each format."""
+        document = {"Namespaces": [
+            {"type": "net", "inode": 4026531840 + row, "pid": row,
+             "nprocs": row % 7, "containers": ["qm", f"nested-{row % 50}"],
+             "command": f"/usr/bin/worker --id {row}"}
+            for row in range(self.BENCHMARK_ROWS)
+        ]}
+
+        def median_ms(encode):
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                encode()
+                timings.append(time.perf_counter() - start)
+            return statistics.median(timings) * 1000
+
+        pretty = median_ms(lambda: json.dumps(document, indent=4))
+        fast = median_ms(lambda: qmctl.json_dumps(document))
+        ndjson = median_ms(lambda: "".join(
+            f"{qmctl.json_dumps(record)}\n"
+            for record in qmctl.ndjson_records(document)))
+        monkeypatch.setitem(qmctl._optional_modules, "orjson", None)
+        stdlib = median_ms(lambda: qmctl.json_dumps(document))
+
+        print(f"{self.BENCHMARK_ROWS} rows: indented {pretty:.1f} ms, "
+              f"compact json {stdlib:.1f} ms, compact fast path "
+              f"{fast:.1f} ms, ndjson {ndjson:.1f} ms")
+        assert fast <= pretty
+
+    def test_copy_summary_compact_with_output_json(self, qm_controller,
+                                                   capsys):
+        """Test --output json keeps the copy summary on one line."""
+        qm_controller.output_format = "json"
+        qm_controller._configure_output(output_json=False)
+        qm_controller._print_copy_summary({"files": 1, "bytes": 4})
+
+        out = capsys.readouterr().out
+        assert out.count("\n") == 1
+        assert json.loads(out) == {"files": 1, "bytes": 4}
+
+
+class TestStreamingExec:
+    """Test streaming output for exec and execin."""
+
+    def test_cli_stream_exec_forwards_chunks(self):
+        """Test the CLI transport forwards both streams and the exit code."""
+        chunks = []
+        script = ["sh", "-c", "printf out; printf err >&2; exit 3", "sh"]
+        with patch('qmctl.qmctl.PODMAN_EXEC', script):
+            code = CliTransport(Mock()).stream_exec(
+                "qm", ["ignored"], lambda name, data: chunks.append(
+                    (name, data)
+                )
+            )
+
+        assert code == 3
+        assert ("stdout", b"out") in chunks
+        assert ("stderr", b"err") in chunks
+
+    def test_api_stream_exec_forwards_chunks(self, fake_podman_api):
+        """Test the API transport forwards demultiplexed chunks in order."""
+        _, socket_path = fake_podman_api
+        chunks = []
+        code = PodmanApiTransport(socket_path).stream_exec(
+            "test-qm", ["echo", "hi"],
+            lambda name, data: chunks.append((name, data))
+        )
+
+        assert code == 0
+        assert chunks == [("stdout", b"echo hi\n"), ("stderr", b"warning\n")]
+
+    def test_iter_frames_bounds_chunk_size(self):
+        """Test large frames are split so memory use stays bounded."""
+        payload = b"x" * (qmctl.COPY_CHUNK_SIZE * 2 + 5)
+        stream = io.BytesIO(
+            struct.pack(">BxxxL", 1, len(payload)) + payload
+        )
+
+        chunks = list(PodmanApiTransport.iter_frames(stream))
+
+        assert len(chunks) == 3
+        assert max(len(c) for _, c in chunks) == qmctl.COPY_CHUNK_SIZE
+        assert b"".join(c for _, c in chunks) == payload
+
+    def test_exec_stream_ndjson(self, qm_controller, capsys):
+        """Test --stream --json prints one JSON frame per chunk."""
+        def stream_exec(container, command, on_chunk):
+            on_chunk("stdout", b"line1\n")
+            on_chunk("stdout", b"\xc3")  # Split multibyte character
+            on_chunk("stdout", b"\xa9\n")
+            return 0
+
+        qm_controller._transport = Mock()
+        qm_controller._transport.stream_exec.side_effect = stream_exec
+        with patch.object(
+            qm_controller, '_container_exists', return_value=True
+        ):
+            qm_controller.exec_in_container(
+                ["journalctl", "-f"], output_json=True, stream=True
+            )
+
+        frames = [
+            json.loads(line)
+            for line in capsys.readouterr().out.splitlines()
+        ]
+        assert frames[0] == {"stream": "stdout", "data": "line1\n"}
+        assert frames[1] == {"stream": "stdout", "data": "\u00e9\n"}
+        assert frames[-1]["exit_code"] == 0
+        assert frames[-1]["latency_ms"] >= 0
+
+    def test_execin_stream_exit_code(self, qm_controller):
+        """Test streaming execin exits with the nested command's code."""
+        qm_controller._transport = Mock()
+        qm_controller._transport.stream_exec.return_value = 5
+        with patch.object(
+            qm_controller, '_container_exists', return_value=True
+        ):
+            with pytest.raises(SystemExit) as exc_info:
+                qm_controller.execin_in_container(
+                    ["radio", "false"], stream=True
+                )
+
+        assert exc_info.value.code == 5
+        args = qm_controller._transport.stream_exec.call_args[0]
+        assert args[:2] == ("test-qm", ["podman", "exec", "radio", "false"])
+
+
+class TestResidentServer:
+    """Test `qmctl serve` and transparent forwarding."""
+
+    def test_forward_without_server(self):
+        """Test invocations run locally when no server is listening."""
+        assert forward_to_server(
+            ["show"], socket_path="/nonexistent/qmctl.sock"
+        ) is None
+
+    def test_forward_disabled(self, qmctl_server, monkeypatch):
+        """Test forwarding can be disabled from the environment."""
+        monkeypatch.setenv(qmctl.NO_SERVER_ENV, "1")
+        assert forward_to_server(
+            ["show"], socket_path=qmctl_server.socket_path
+        ) is None
+
+    def test_serve_is_never_forwarded(self, qmctl_server):
+        """Test `qmctl serve` always starts a local server."""
+        assert forward_to_server(
+            ["--transport", "cli", "serve"],
+            socket_path=qmctl_server.socket_path
+        ) is None
+
+    def test_forward_show_container(self, qmctl_server, capsys):
+        """Test output and exit code come back from the server."""
+        code = forward_to_server(
+            ["show", "container", "--json"],
+            socket_path=qmctl_server.socket_path
+        )
+
+        assert code == 0
+        output = json.loads(capsys.readouterr().out)
+        assert "Container" in output["sections"]
+
+    def test_forward_reports_errors(self, qmctl_server, capsys):
+        """Test errors are relayed on stderr with their exit code."""
+        controller = qmctl_server.controllers[(None, False, None)]
+        controller.config_path = "/nonexistent"
+        code = forward_to_server(
+            ["show", "container"], socket_path=qmctl_server.socket_path
+        )
+
+        assert code == QmError.EXIT_CODE_GENERAL_ERROR
+        assert "/nonexistent not found" in capsys.readouterr().err
+
+    def test_forward_reuses_warm_controller(self, qmctl_server, tmp_path):
+        """Test forwarded calls inherit the transport the server selected."""
+        selections = tmp_path / "selections"
+
+        def select(runner, mode="auto", socket_path=None, timeout=None):
+            with open(selections, "a") as f:
+                f.write(f"{os.getpid()}\n")
+            return qmctl.CliTransport(runner, timeout=timeout)
+
+        with patch('qmctl.qmctl.select_transport', side_effect=select), \
+                patch('qmctl.qmctl.sys.stdout', new=io.StringIO()):
+            for _ in range(3):
+                forward_to_server(
+                    ["show", "container"],
+                    socket_path=qmctl_server.socket_path
+                )
+
+        assert selections.read_text().splitlines() == [str(os.getpid())]
+        assert len(qmctl_server.controllers) == 1
+
+    @staticmethod
+    def _wait_for(condition, timeout=5):
+        """Poll until condition() is true or the timeout expires."""
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_slow_request_does_not_block_others(self, qmctl_server, capsys):
+        """Test each connection is answered by its own child."""
+        controller = qmctl_server.controllers[(None, False, None)]
+        controller.show_namespaces = lambda *args, **kwargs: time.sleep(30)
+        slow = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        slow.connect(qmctl_server.socket_path)
+        slow.sendall(b'{"argv": ["show", "namespaces"]}\n')
+        assert self._wait_for(lambda: len(qmctl_server.children) == 1)
+
+        code = forward_to_server(
+            ["show", "container", "--json"],
+            socket_path=qmctl_server.socket_path
+        )
+
+        assert code == 0
+        assert "Container" in json.loads(capsys.readouterr().out)["sections"]
+        slow.close()
+
+    def test_client_hangup_kills_request(self, qmctl_server):
+        """Test a request stops when its client disconnects."""
+        controller = qmctl_server.controllers[(None, False, None)]
+        controller.show_namespaces = lambda *args, **kwargs: time.sleep(30)
+        # A separate process, as forked children would inherit a local socket
+        client = subprocess.Popen([sys.executable, "-c", (
+            "import socket, sys, time\n"
+            "sock = socket.socket(socket.AF_UNIX)\n"
+            "sock.connect(sys.argv[1])\n"
+            "sock.sendall(b'{\"argv\": [\"show\", \"namespaces\"]}\\n')\n"
+            "time.sleep(30)\n"
+        ), qmctl_server.socket_path])
+        assert self._wait_for(lambda: len(qmctl_server.children) == 1)
+        (pid, _), = qmctl_server.children.values()
+
+        client.kill()
+        client.wait()
+
+        assert self._wait_for(
+            lambda: not os.path.exists(f"/proc/{pid}")
+        )
+        assert self._wait_for(lambda: not qmctl_server.children)
+
+    def test_foreign_server_is_ignored(self, qmctl_server, capsys):
+        """Test output is not trusted from a server run by another user."""
+        with patch('qmctl.qmctl.peer_allowed', return_value=False):
+            code = forward_to_server(
+                ["show"], socket_path=qmctl_server.socket_path
+            )
+
+        assert code is None
+        assert "runs as another user" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("argv, local", [
+        (["show", "resources", "--count", "1"], True),
+        (["--timeout", "5", "pressure", "--wat"], True),
+        (["show", "namespaces", "--watch", "--json"], True),
+        (["show", "--wa"], True),
+        (["exec", "--stream", "journalctl", "-f"], True),
+        (["execin", "--stream", "radio", "ls"], True),
+        (["metrics", "--list=:9100"], True),
+        (["show", "container"], False),
+        (["cp", "--stream", "a", "qm:/b"], False),
+        (["exec", "--", "cat", "--stream"], False),
+    ])
+    def test_long_running_calls_stay_local(self, argv, local):
+        """Test calls that run until interrupted are never forwarded."""
+        assert qmctl._runs_locally(argv) is local
+
+    @pytest.mark.performance
+    def test_forwarded_call_faster_than_cold_start(self, qmctl_server):
+        """Measure warm forwarded calls against cold interpreter starts."""
+        argv = ["show", "container", "--json"]
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(
+            os.path.dirname(os.path.abspath(qmctl.__file__))
+        ), **{qmctl.NO_SERVER_ENV: "1"})
+
+        cold = []
+        for _ in range(3):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-c", "from qmctl import main; main()",
+                 *argv],
+                env=env, capture_output=True, check=False
+            )
+            cold.append(time.perf_counter() - start)
+
+        warm = []
+        with patch('qmctl.qmctl.sys.stdout', new=io.StringIO()):
+            for _ in range(10):
+                start = time.perf_counter()
+                forward_to_server(
+                    argv, socket_path=qmctl_server.socket_path
+                )
+                warm.append(time.perf_counter() - start)
+
+        print(
+            f"cold median {statistics.median(cold) * 1000:.1f} ms, "
+            f"warm median {statistics.median(warm) * 1000:.2f} ms"
+        )
+        assert statistics.median(warm) < statistics.median(cold)
+
+
+class TestSingleHopExecin:
+    """Test execin entering nested containers directly from the host."""
+
+    @staticmethod
+    def _fake_proc(tmp_path, pid=7):
+        """Lay out <proc>/<pid>/{ns,root} like QM's procfs seen from host."""
+        target = tmp_path / "proc" / str(pid)
+        (target / "ns").mkdir(parents=True)
+        for ns in qmctl.NSENTER_NAMESPACES:
+            (target / "ns" / ns).touch()
+        os.unlink(target / "ns" / "uts")
+        os.symlink("/proc/self/ns/uts", target / "ns" / "uts")
+        (target / "root" / "usr" / "bin").mkdir(parents=True)
+        (target / "root" / "usr" / "bin" / "env").touch()
+        return str(tmp_path / "proc"), str(target)
+
+    def test_command_enters_nested_namespaces(self, qm_controller, tmp_path):
+        """Test nsenter joins every namespace that differs from the host."""
+        proc_root, target = self._fake_proc(tmp_path)
+        (tmp_path / "proc" / "7" / "root" / "srv").mkdir()
+        state = {"pid": 7, "proc_root": proc_root, "user": "",
+                 "env": ["PATH=/bin", "-u", "TERM=xterm"],
+                 "workdir": "/srv"}
+        with patch.object(qm_controller, '_nested_state',
+                          return_value=state), \
+                patch.object(qm_controller, 'find_executable',
+                             return_value="/usr/bin/nsenter"), \
+                patch('qmctl.qmctl.os.geteuid', return_value=0):
+            command = qm_controller._single_hop_command(
+                "radio", ["hostname"]
+            )
+
+        assert command[0] == "/usr/bin/nsenter"
+        assert f"--mount={target}/ns/mnt" in command
+        assert f"--pid={target}/ns/pid" in command
+        assert not [arg for arg in command if arg.startswith("--uts")]
+        assert f"--wd={target}/root/srv" in command
+        assert command[command.index("--"):] == [
+            "--", "/usr/bin/env", "-i", "PATH=/bin", "TERM=xterm",
+            "hostname"
+        ]
+
+    @pytest.mark.parametrize("euid,user", [(1000, ""), (0, "radio")])
+    def test_command_unavailable(self, qm_controller, tmp_path, euid,
+                                 user):
+        """Test non-root callers and container users keep the double exec."""
+        proc_root, _ = self._fake_proc(tmp_path)
+        state = {"pid": 7, "proc_root": proc_root, "user": user, "env": []}
+        with patch.object(qm_controller, '_nested_state',
+                          return_value=state), \
+                patch.object(qm_controller, 'find_executable',
+                             return_value="/usr/bin/nsenter"), \
+                patch('qmctl.qmctl.os.geteuid', return_value=euid):
+            assert qm_controller._single_hop_command(
+                "radio", ["hostname"]
+            ) is None
+
+    def test_nested_state_resolved_once(self, qm_controller):
+        """Test the nested PID is inspected once and then cached."""
+        pid = os.getpid()
+        inspect = [{"Id": "n1", "State": {"Pid": pid},
+                    "Config": {"Env": ["PATH=/bin"], "User": ""}}]
+        qm_controller._transport = Mock()
+        qm_controller._transport.exec.return_value = Mock(
+            returncode=0, stdout=json.dumps(inspect), stderr=""
+        )
+        with patch.object(qm_controller, '_container_state',
+                          return_value={"pid": pid}):
+            first = qm_controller._nested_state("radio")
+            second = qm_controller._nested_state("radio")
+
+        assert qm_controller._transport.exec.call_count == 1
+        assert first["proc_root"] == f"/proc/{pid}/root/proc"
+        assert second["env"] == ["PATH=/bin"]
+
+    def test_nested_state_uses_inner_api(self, qm_controller,
+                                         fake_podman_api):
+        """Test the inner podman socket is reached through QM's root."""
+        server, socket_path = fake_podman_api
+        server.containers["radio"] = {
+            "Id": "n1", "State": {"Pid": os.getpid()}, "Config": {}
+        }
+        qm_controller._transport = Mock()
+        with patch('qmctl.qmctl.PODMAN_SOCKET_PATH', socket_path), \
+                patch.object(qm_controller, '_container_state',
+                             return_value={"pid": os.getpid()}):
+            state = qm_controller._nested_state("radio")
+
+        assert state["id"] == "n1"
+        qm_controller._transport.exec.assert_not_called()
+
+    @patch('qmctl.qmctl.subprocess.run')
+    def test_execin_runs_single_hop(self, mock_run, qm_controller, capsys):
+        """Test execin starts only nsenter when the single hop is usable."""
+        hop = ["/usr/bin/nsenter", "--", "/usr/bin/env", "-i", "hostname"]
+        mock_run.return_value = Mock(returncode=0, stdout="radio\n",
+                                     stderr="")
+        with patch.object(qm_controller, '_container_exists',
+                          return_value=True), \
+                patch.object(qm_controller, '_single_hop_command',
+                             return_value=hop):
+            qm_controller.execin_in_container(
+                ["radio", "hostname"], single_hop=True
+            )
+
+        mock_run.assert_called_once_with(
+            hop, capture_output=True, text=True, check=False
+        )
+        assert "radio" in capsys.readouterr().out
+
+    @patch('qmctl.qmctl.subprocess.run')
+    def test_execin_double_exec_by_default(self, mock_run, qm_controller):
+        """Test the single hop is only used when asked for."""
+        mock_run.return_value = Mock(returncode=0, stdout="radio\n",
+                                     stderr="")
+        with patch.object(qm_controller, '_container_exists',
+                          return_value=True), \
+                patch.object(qm_controller,
+                             '_single_hop_command') as single_hop:
+            qm_controller.execin_in_container(["radio", "hostname"])
+
+        single_hop.assert_not_called()
+        assert mock_run.call_args[0][0] == [
+            "podman", "exec", "test-qm", "podman", "exec", "radio",
+            "hostname"
+        ]
+
+    @patch('qmctl.qmctl.subprocess.run')
+    def test_failed_single_hop_is_not_retried(self, mock_run,
+                                              qm_controller, capsys):
+        """Test a failing command is reported, not run again via podman."""
+        hop = ["/usr/bin/nsenter", "--", "/usr/bin/env", "-i", "false"]
+        mock_run.return_value = Mock(returncode=1, stdout="",
+                                     stderr="nsenter: cannot open")
+        with patch.object(qm_controller, '_container_exists',
+                          return_value=True), \
+                patch.object(qm_controller, '_single_hop_command',
+                             return_value=hop), \
+                pytest.raises(SystemExit):
+            qm_controller.execin_in_container(
+                ["radio", "false"], single_hop=True
+            )
+
+        mock_run.assert_called_once()
+        assert "nsenter: cannot open" in capsys.readouterr().err
+
+
+class TestExecinFanout:
+    """Test execin --all/--match across nested containers."""
+
+    NAMES = ["camera_front", "camera_rear", "radio"]
+
+    @staticmethod
+    def _controller(qm_controller, exec_func):
+        qm_controller._transport = Mock()
+        qm_controller._transport.exec.side_effect = exec_func
+        return qm_controller
+
+    def test_match_aggregates_per_container(self, qm_controller, capsys):
+        """Test only matching containers run, keyed by name in JSON."""
+        def exec_func(container, command):
+            nested = command[2]
+            return Mock(returncode=0, stdout=f"up on {nested}\n", stderr="")
+
+        controller = self._controller(qm_controller, exec_func)
+        controller.verbose = True
+        with patch.object(controller, '_container_exists',
+                          return_value=True), \
+                patch.object(controller, '_list_nested',
+                             return_value=self.NAMES), \
+                patch.object(controller, '_single_hop_command',
+                             return_value=None):
+            controller.execin_many(["uptime"], pattern="camera_*",
+                                   output_json=True)
+
+        captured = capsys.readouterr()
+        assert "[verbose] Running in: 2 containers via" in captured.err
+        output = json.loads(captured.out)
+        assert output["command"] == ["uptime"]
+        assert list(output["containers"]) == ["camera_front", "camera_rear"]
+        front = output["containers"]["camera_front"]
+        assert front["exit_code"] == 0
+        assert front["output"] == "up on camera_front"
+        assert front["duration"] >= 0
+
+    def test_concurrency_limit(self, qm_controller, capsys):
+        """Test no more than `workers` containers run at once."""
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def exec_func(container, command):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return Mock(returncode=0, stdout="", stderr="")
+
+        controller = self._controller(qm_controller, exec_func)
+        names = [f"app{i}" for i in range(6)]
+        with patch.object(controller, '_container_exists',
+                          return_value=True), \
+                patch.object(controller, '_list_nested',
+                             return_value=names), \
+                patch.object(controller, '_single_hop_command',
+                             return_value=None):
+            controller.execin_many(["true"], output_json=True, workers=2)
+
+        assert peak[0] == 2
+        assert len(json.loads(capsys.readouterr().out)["containers"]) == 6
+
+    def test_exits_with_first_failure(self, qm_controller, capsys):
+        """Test qmctl exits with the first failing container's code."""
+        codes = {"camera_front": 0, "camera_rear": 3, "radio": 4}
+
+        def exec_func(container, command):
+            return Mock(returncode=codes[command[2]], stdout="",
+                        stderr="boom" if codes[command[2]] else "")
+
+        controller = self._controller(qm_controller, exec_func)
+        with patch.object(controller, '_container_exists',
+                          return_value=True), \
+                patch.object(controller, '_list_nested',
+                             return_value=self.NAMES), \
+                patch.object(controller, '_single_hop_command',
+                             return_value=None):
+            with pytest.raises(SystemExit) as exc_info:
+                controller.execin_many(["df", "-h"])
+
+        assert exc_info.value.code == 3
+        captured = capsys.readouterr()
+        assert "==> camera_rear (exit 3," in captured.out
+        assert "boom" in captured.err
+
+    def test_no_match_is_an_error(self, qm_controller):
+        """Test an unmatched glob fails instead of silently doing nothing."""
+        with patch.object(qm_controller, '_container_exists',
+                          return_value=True), \
+                patch.object(qm_controller, '_list_nested',
+                             return_value=self.NAMES), \
+                pytest.raises(SystemExit) as exc_info:
+            qm_controller.execin_many(["true"], pattern="nav*")
+
+        assert exc_info.value.code == 1
+
+    def test_list_nested_falls_back_to_podman_ps(self, qm_controller):
+        """Test nested containers are listed with podman ps inside QM."""
+        qm_controller._transport = Mock()
+        qm_controller._transport.exec.return_value = Mock(
+            returncode=0, stdout="radio\ncamera_rear\n", stderr=""
+        )
+        with patch.object(qm_controller, '_container_state',
+                          side_effect=QmError("not running")):
+            assert qm_controller._list_nested() == ["camera_rear", "radio"]
+
+        qm_controller._transport.exec.assert_called_once_with(
+            "test-qm", ["podman", "ps", "--format", "{{.Names}}"]
+        )
+
+    def test_handle_execin_all(self, qm_controller):
+        """Test --all dispatches to the fan-out with the job limit."""
+        parser = create_argument_parser("Test")
+        qmctl.configure_subcommands(parser)
+        args = parser.parse_args(["execin", "--all", "-j", "8", "df", "-h"])
+
+        with patch.object(qm_controller, 'execin_many') as mock_many:
+            handle_execin_command(args, qm_controller)
+
+        mock_many.assert_called_once_with(
+            command=["df", "-h"], pattern="*", output_json=False,
+            pretty=True, workers=8
+        )
+
+    @pytest.mark.parametrize("selection", [["--all"], ["--match", "cam*"]])
+    def test_handle_execin_rejects_stream_fanout(self, qm_controller,
+                                                 selection):
+        """Test --stream is refused instead of ignored with a fan-out."""
+        parser = create_argument_parser("Test")
+        qmctl.configure_subcommands(parser)
+        args = parser.parse_args(["execin", "--stream", *selection, "ls"])
+
+        with patch.object(qm_controller, 'execin_many') as mock_many, \
+                pytest.raises(ValidationError, match="--stream"):
+            handle_execin_command(args, qm_controller)
+        mock_many.assert_not_called()
+
+
+class TestDeadlines:
+    """Test --timeout deadlines and latency reporting."""
+
+    @staticmethod
+    def _alive(pid, grace=2.0):
+        """Return True if pid is still running after the grace period."""
+        deadline = time.monotonic() + grace
+        while time.monotonic() < deadline:
+            try:
+                with open(f"/proc/{pid}/stat") as file:
+                    state = file.read().rpartition(")")[2].split()[0]
+            except OSError:
+                return False
+            if state == "Z":
+                return False
+            time.sleep(0.01)  # SIGKILL is delivered asynchronously
+        return True
+
+    def test_deadline_kills_process_group(self, qm_controller, tmp_path):
+        """Test children of the timed-out command are killed too."""
+        pid_file = tmp_path / "child.pid"
+        qm_controller.timeout = 0.3
+        start = time.monotonic()
+        with pytest.raises(CommandTimeoutError) as exc_info:
+            qm_controller._run_subprocess(
+                ["sh", "-c", f"sleep 30 & echo $! > {pid_file}; wait"]
+            )
+
+        assert time.monotonic() - start < 5
+        assert exc_info.value.exit_code == QmError.EXIT_CODE_TIMEOUT
+        assert not self._alive(int(pid_file.read_text()))
+        assert qm_controller.latencies[-1]["latency_ms"] >= 300
+
+    def test_latency_recorded_per_call(self, qm_controller):
+        """Test each subprocess records its spawn-to-exit latency."""
+        qm_controller.timeout = 5
+        result = qm_controller._run_subprocess(["echo", "hi"])
+
+        assert result.stdout == "hi\n"
+        assert list(qm_controller.latencies) == [
+            {"command": ["echo", "hi"],
+             "latency_ms": qm_controller.latencies[0]["latency_ms"]}
+        ]
+
+    def test_latency_history_bounded(self, qm_controller):
+        """Test long-running modes keep only the latest latencies."""
+        for index in range(qmctl.LATENCY_HISTORY + 10):
+            qm_controller._record_latency(["true", str(index)], 0.001)
+
+        assert len(qm_controller.latencies) == qmctl.LATENCY_HISTORY
+        assert qm_controller.latencies[-1]["command"][1] == str(
+            qmctl.LATENCY_HISTORY + 9
+        )
+
+    def test_stream_process_deadline(self):
+        """Test streamed commands are bounded by the deadline."""
+        chunks = []
+        with pytest.raises(CommandTimeoutError):
+            qmctl.stream_process(
+                ["sh", "-c", "echo started; sleep 30"],
+                lambda name, data: chunks.append(data), timeout=0.3
+            )
+
+        assert chunks == [b"started\n"]
+
+    def test_exec_timeout_exit_code(self, qm_controller):
+        """Test a timed-out exec exits with the timeout code."""
+        qm_controller._transport = Mock()
+        qm_controller._transport.exec.side_effect = CommandTimeoutError(
+            ["podman", "exec"], 1
+        )
+        with patch.object(qm_controller, '_container_exists',
+                          return_value=True), \
+                pytest.raises(SystemExit) as exc_info:
+            qm_controller.exec_in_container(["uptime"])
+
+        assert exc_info.value.code == 124
+
+    def test_exec_json_reports_latency(self, qm_controller, capsys):
+        """Test --json output carries the exec latency."""
+        qm_controller._transport = Mock()
+        qm_controller._transport.exec.return_value = Mock(
+            returncode=0, stdout="up 1 day\n", stderr=""
+        )
+        with patch.object(qm_controller, '_container_exists',
+                          return_value=True):
+            qm_controller.exec_in_container(["uptime"], output_json=True)
+
+        output = json.loads(capsys.readouterr().out)
+        assert output["output"] == "up 1 day"
+        assert output["latency_ms"] >= 0
+
+    def test_timeout_option(self):
+        """Test --timeout is a global option skipped by forwarding."""
+        parser = create_argument_parser("Test")
+        qmctl.configure_subcommands(parser)
+
+        args = parser.parse_args(["--timeout", "2.5", "exec", "uptime"])
+        assert args.timeout == 2.5
+        assert qmctl._subcommand_of(["--timeout", "2.5", "exec"]) == "exec"
+
+    @pytest.mark.parametrize("argv, option, value", [
+        (["--trans", "cli", "show", "--json"], "transport", "cli"),
+        (["--tim", "5", "show", "container", "--json"], "timeout", 5.0),
+        (["--out=ndjson", "show"], "output", "ndjson"),
+    ])
+    def test_abbreviated_global_options(self, argv, option, value):
+        """Test the lazily built parser accepts argparse abbreviations."""
+        with patch.object(sys, "argv", ["qmctl", *argv]):
+            _, args = qmctl.init_cli()
+
+        assert args.subcommand == "show"
+        assert getattr(args, option) == value
+
+
+class TestStreamedCopy:
+    """Test cp --stream through a single exec pipe."""
+
+    @staticmethod
+    def _tree(root):
+        (root / "maps" / "tiles").mkdir(parents=True)
+        (root / "maps" / "index.json").write_text('{"v": 1}')
+        (root / "maps" / "tiles" / "0.bin").write_bytes(os.urandom(200000))
+        return root / "maps"
+
+    @pytest.mark.parametrize("compress", ["none", "zstd", "lz4"])
+    def test_upload_into_directory(self, qm_controller, fake_podman_cli,
+                                   tmp_path, compress, capsys):
+        """Test a tree is unpacked inside an existing destination dir."""
+        if compress != "none" and not shutil.which(compress):
+            pytest.skip(f"{compress} not installed")
+        src = self._tree(tmp_path / "host")
+        (tmp_path / "qm").mkdir()
+        with patch.object(qm_controller, '_container_exists',
+                          return_value=True):
+            qm_controller.copy_in_container(
+                [str(src), f"test-qm:{tmp_path / 'qm'}"],
+                output_json=True, stream=True, compress=compress
+            )
+
+        copied = tmp_path / "qm" / "maps" / "tiles" / "0.bin"
+        assert copied.read_bytes() == (src / "tiles" / "0.bin").read_bytes()
+        summary = json.loads(capsys.readouterr().out)
+        assert summary["compression"] == compress
+        assert summary["files"] == 4
+        assert summary["total_bytes"] == 200008
+        assert summary["bytes"] >= summary["total_bytes"]
+        assert summary["throughput_bytes_per_s"] > 0
+
+    def test_json_summary_follows_progress_lines(self, qm_controller,
+                                                 capsys):
+        """Test progress records and the summary form a parseable stream."""
+        qm_controller._configure_output(output_json=True, pretty=True)
+        snapshot = {"files": 1, "bytes": 4, "seconds": 0.5,
+                    "throughput_bytes_per_s": 8}
+        qm_controller._report_progress(snapshot)
+        qm_controller._print_copy_summary({**snapshot, "compression": "none"})
+        qm_controller._print_batch_copy_summary(
+            {**snapshot, "sources": {"a": {"files": 1, "bytes": 4}}}
+        )
+
+        records = [json.loads(line)
+                   for line in capsys.readouterr().out.splitlines()]
+        assert records[0] == {"progress": snapshot}
+        assert records[1]["compression"] == "none"
+        assert records[2]["sources"]["a"]["files"] == 1
+
+    def test_upload_renames_single_source(self, qm_controller,
+                                          fake_podman_cli, tmp_path):
+        """Test a missing destination becomes the copied entry, like cp."""
+        src = self._tree(tmp_path / "host")
+        dst = tmp_path / "qm" / "renamed"
+        qm_controller._stream_copy(str(src), f"test-qm:{dst}")
+
+        assert (dst / "index.json").read_text() == '{"v": 1}'
+
+    def test_download(self, qm_controller, fake_podman_cli, tmp_path):
+        """Test a container path is streamed back to the host."""
+        src = self._tree(tmp_path / "qm")
+        (tmp_path / "host").mkdir()
+        summary = qm_controller._stream_copy(
+            f"test-qm:{src}", str(tmp_path / "host"), compress="none"
+        )
+
+        assert (tmp_path / "host" / "maps" / "index.json").exists()
+        assert summary["files"] == 4
+
+    def test_remote_failure_reported(self, qm_controller, fake_podman_cli,
+                                     tmp_path):
+        """Test the container side's error output surfaces as QmError."""
+        with pytest.raises(QmError) as exc_info:
+            qm_controller._stream_copy(
+                f"test-qm:{tmp_path / 'missing'}", str(tmp_path)
+            )
+
+        assert "missing" in str(exc_info.value)
+
+    def test_batch_upload_reports_each_source(self, qm_controller,
+                                              fake_podman_cli, tmp_path,
+                                              capsys):
+        """Test many sources share one stream and get a result each."""
+        src = self._tree(tmp_path / "host")
+        (tmp_path / "host" / "a.conf").write_text("a")
+        paths = [str(src), str(tmp_path / "host" / "a.conf"),
+                 str(tmp_path / "host" / "gone"), f"test-qm:{tmp_path / 'qm'}"]
+        with patch.object(qm_controller, '_container_exists',
+                          return_value=True), \
+                patch.object(qm_controller, '_pipeline',
+                             wraps=qm_controller._pipeline) as pipeline, \
+                pytest.raises(SystemExit) as exc_info:
+            qm_controller.copy_in_container(paths, output_json=True)
+
+        assert exc_info.value.code == 1
+        assert pipeline.call_count == 1
+        assert (tmp_path / "qm" / "a.conf").read_text() == "a"
+        assert (tmp_path / "qm" / "maps" / "tiles" / "0.bin").exists()
+        summary = json.loads(capsys.readouterr().out)
+        assert summary["files"] == 5
+        assert summary["seconds"] >= 0
+        assert summary["sources"][str(src)] == {"files": 4, "bytes": 200008}
+        assert summary["sources"][paths[1]] == {"files": 1, "bytes": 1}
+        assert "does not exist" in summary["sources"][paths[2]]["error"]
+
+    def test_batch_download(self, qm_controller, fake_podman_cli, tmp_path):
+        """Test container sources are packed by one exec and attributed."""
+        src = self._tree(tmp_path / "qm")
+        (tmp_path / "qm" / "b.conf").write_text("bb")
+        summary = qm_controller._stream_copy_many(
+            [f"test-qm:{src}", f"test-qm:{tmp_path / 'qm' / 'b.conf'}",
+             f"test-qm:{tmp_path / 'qm' / 'gone'}"],
+            str(tmp_path / "host")
+        )
+
+        assert (tmp_path / "host" / "b.conf").read_text() == "bb"
+        assert (tmp_path / "host" / "maps" / "index.json").exists()
+        results = list(summary["sources"].values())
+        assert results[0]["files"] == 4
+        assert results[1] == {"files": 1, "bytes": 2}
+        assert "error" in results[2]
+
+    def test_batch_rejects_mixed_directions(self, qm_controller):
+        """Test sources must all be on the same side of the copy."""
+        with pytest.raises(ValidationError):
+            qm_controller._validate_paths_for_batch_cp(
+                ["/a", "test-qm:/b", "/c"]
+            )
+        with pytest.raises(ValidationError, match="overwrite"):
+            qm_controller._validate_paths_for_batch_cp(
+                ["/x/a", "/y/a", "test-qm:/c"]
+            )
+
+    def test_pipeline_deadline(self, qm_controller):
+        """Test a stalled transfer is killed at the controller deadline."""
+        qm_controller.timeout = 0.2
+        procs = qm_controller._pipeline(
+            [["sleep", "30"]], stdout=subprocess.DEVNULL
+        )
+        start = time.monotonic()
+        with pytest.raises(CommandTimeoutError):
+            with qm_controller._pipeline_deadline(procs):
+                procs[0].wait()
+
+        assert time.monotonic() - start < 5
+
+    def test_handle_cp_compress(self, qm_controller):
+        """Test --compress is passed to the copy only when given."""
+        parser = create_argument_parser("Test")
+        qmctl.configure_subcommands(parser)
+        args = parser.parse_args(["cp", "--compress", "lz4", "a", "qm:/b"])
+
+        with patch.object(qm_controller, 'copy_in_container') as mock_cp:
+            handle_cp_command(args, qm_controller)
+
+        mock_cp.assert_called_once_with(
+            paths=["a", "qm:/b"], output_json=False, pretty=True,
+            compress="lz4"
+        )
+
+    def test_progress_reports(self):
+        """Test progress is reported at the configured interval."""
+        reports = []
+        progress = qmctl.TransferProgress(reports.append, total_bytes=10,
+                                          interval=0)
+        progress.add_file()
+        progress.add_bytes(4)
+
+        assert reports[0]["bytes"] == 4
+        assert reports[0]["files"] == 1
+        assert reports[0]["total_bytes"] == 10
+
+
+class TestSync:
+    """Test incremental sync driven by content-hash manifests."""
+
+    @pytest.fixture
+    def sync(self, qm_controller, fake_podman_cli, tmp_path, capsys):
+        """Return a function running one sync and its JSON summary."""
+        def run(**kwargs):
+            with patch.object(qm_controller, '_container_exists',
+                              return_value=True), \
+                    patch.object(qm_controller, '_container_state',
+                                 return_value={"id": "abc", "pid": 1}):
+                qm_controller.sync_to_container(
+                    str(tmp_path / "host"), f"test-qm:{tmp_path / 'qm'}",
+                    output_json=True, **kwargs
+                )
+            output = capsys.readouterr().out
+            assert output.count("\n") == 1  # Compact after progress lines
+            return json.loads(output)
+        (tmp_path / "host" / "conf.d").mkdir(parents=True)
+        (tmp_path / "host" / "app.conf").write_text("a=1\n")
+        (tmp_path / "host" / "conf.d" / "extra.conf").write_text("b=2\n")
+        return run
+
+    def test_first_sync_copies_tree(self, sync, tmp_path):
+        """Test a missing destination is scanned and filled."""
+        summary = sync()
+
+        assert summary["manifest"] == "scanned"
+        assert sorted(summary["added"]) == ["app.conf", "conf.d/extra.conf"]
+        assert (tmp_path / "qm" / "conf.d" / "extra.conf").read_text() == \
+            "b=2\n"
+
+    def test_unchanged_tree_transfers_nothing(self, sync):
+        """Test a second sync uses the cached manifest and ships nothing."""
+        sync()
+        summary = sync()
+
+        assert summary["manifest"] == "cached"
+        assert summary["added"] == summary["changed"] == []
+        assert summary["unchanged"] == 2
+        assert summary["bytes"] == 0
+
+    def test_only_changed_file_transferred(self, sync, tmp_path):
+        """Test a modified file is the only one sent."""
+        sync()
+        (tmp_path / "host" / "app.conf").write_text("a=2\n")
+        summary = sync()
+
+        assert summary["changed"] == ["app.conf"]
+        assert summary["unchanged"] == 1
+        assert (tmp_path / "qm" / "app.conf").read_text() == "a=2\n"
+
+    def test_delete_and_dry_run(self, sync, tmp_path):
+        """Test --delete removes extraneous files unless it is a dry run."""
+        (tmp_path / "qm").mkdir()
+        (tmp_path / "qm" / "stale.conf").write_text("old")
+
+        assert sync(delete=True, dry_run=True)["deleted"] == ["stale.conf"]
+        assert (tmp_path / "qm" / "stale.conf").exists()
+        assert not (tmp_path / "qm" / "app.conf").exists()
+
+        sync(delete=True)
+        assert not (tmp_path / "qm" / "stale.conf").exists()
+
+    def test_rescan_sees_container_side_changes(self, sync, tmp_path):
+        """Test --rescan hashes the destination instead of the cache."""
+        sync()
+        (tmp_path / "qm" / "app.conf").write_text("edited in qm")
+
+        assert sync()["changed"] == []
+        summary = sync(rescan=True)
+        assert summary["manifest"] == "scanned"
+        assert summary["changed"] == ["app.conf"]
+        assert (tmp_path / "qm" / "app.conf").read_text() == "a=1\n"
+
+    def test_build_manifest_reuses_hashes(self, tmp_path):
+        """Test unchanged files keep their previous hash without reading."""
+        (tmp_path / "f").write_text("data")
+        first = qmctl.build_manifest(str(tmp_path))
+        first["f"][3] = "stale"
+
+        assert qmctl.build_manifest(str(tmp_path), first)["f"][3] == "stale"
+
+
+class TestResources:
+    """Test the native cgroup v2 resource sampler."""
+
+    def test_sampler_rates_from_deltas(self, fake_cgroup):
+        """Test rates are the counter differences over elapsed time."""
+        path = fake_cgroup("qm.service", usage_usec=1000000, memory=4096)
+        sampler = qmctl.CgroupSampler(str(path))
+        first = sampler.sample()
+        assert first["cpu_percent"] is None
+        assert first["memory_current"] == 4096
+
+        fake_cgroup("qm.service", usage_usec=2000000, memory=8192,
+                    rbytes=4000, wbytes=2000)
+        sampler.previous["time"] -= 2
+        second = sampler.sample()
+
+        assert 49 < second["cpu_percent"] <= 50
+        assert second["memory_anon"] == 4096
+        assert 1990 < second["io_read_bytes_per_s"] <= 2000
+        assert 990 < second["io_write_bytes_per_s"] <= 1000
+
+    def test_missing_controller_files_report_none(self, fake_cgroup):
+        """Test a cgroup without the io controller still samples."""
+        path = fake_cgroup("qm.service")
+        (path / "io.stat").unlink()
+        sampler = qmctl.CgroupSampler(str(path))
+        sampler.sample()
+
+        assert sampler.sample()["io_read_bytes_per_s"] is None
+
+    def test_show_resources_ndjson(self, qm_controller, fake_cgroup,
+                                   capsys):
+        """Test --count samples are printed as one JSON object per line."""
+        fake_cgroup("qm.service", memory=1024)
+        qm_controller.show_resources(output_json=True, interval=0.01,
+                                     count=2)
+
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 2
+        sample = json.loads(lines[0])
+        assert sample["cgroup"] == "qm.service"
+        assert sample["memory_current"] == 1024
+        assert sample["cpu_percent"] == 0
+
+    def test_show_resources_table(self, qm_controller, fake_cgroup, capsys):
+        """Test the table has one header and a row per sample."""
+        fake_cgroup("qm.service", memory=3 * 2**20)
+        qm_controller.show_resources(interval=0.01, count=1)
+
+        header, row = capsys.readouterr().out.splitlines()
+        assert header.split()[:3] == ["TIME", "CGROUP", "CPU%"]
+        assert "3.0M" in row.split()
+
+    @staticmethod
+    def _nested(fake_cgroup):
+        """Create two nested container scopes, conmon and QM's own cgroup."""
+        ids = {"a" * 64: "radio", "b" * 64: "camera"}
+        slice_dir = f"qm.service/libpod-payload-{'f' * 64}/machine.slice"
+        fake_cgroup("qm.service")
+        fake_cgroup(f"{slice_dir}/libpod-conmon-{'a' * 64}.scope")
+        fake_cgroup(f"{slice_dir}/libpod-{'a' * 64}.scope", memory=1024)
+        fake_cgroup(f"{slice_dir}/libpod-{'b' * 64}.scope/container",
+                    memory=4096)
+        fake_cgroup(f"{slice_dir}/libpod-{'b' * 64}.scope", memory=4096)
+        return ids
+
+    def test_find_container_scopes(self, fake_cgroup):
+        """Test only nested container scopes are found, not their children."""
+        ids = self._nested(fake_cgroup)
+        scopes = qmctl.find_container_scopes(
+            str(fake_cgroup.root / "qm.service"))
+
+        assert set(scopes) == set(ids)
+        assert scopes["b" * 64].endswith(f"libpod-{'b' * 64}.scope")
+
+    def test_per_container_sorted_and_limited(self, qm_controller,
+                                              fake_cgroup, capsys):
+        """Test rows carry container names, ranked by the sort key."""
+        ids = self._nested(fake_cgroup)
+        with patch.object(qm_controller, '_nested_container_ids',
+                          return_value=ids):
+            qm_controller.show_resources(
+                output_json=True, interval=0.01, count=1,
+                per_container=True, sort="memory", top=1
+            )
+
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 1
+        row = json.loads(lines[0])
+        assert row["container"] == "camera"
+        assert row["memory_current"] == 4096
+        assert row["cpu_percent"] == 0
+
+    def test_per_container_table(self, qm_controller, fake_cgroup, capsys):
+        """Test unknown IDs fall back to their short form in the table."""
+        self._nested(fake_cgroup)
+        with patch.object(qm_controller, '_nested_container_ids',
+                          return_value={"a" * 64: "radio"}):
+            qm_controller.show_resources(interval=0.01, count=1,
+                                         per_container=True, sort="memory")
+
+        header, first, second = capsys.readouterr().out.splitlines()
+        assert header.split()[1] == "CONTAINER"
+        assert first.split()[1] == "b" * 12
+        assert second.split()[1] == "radio"
+
+    def test_missing_cgroup(self, qm_controller, fake_cgroup, capsys):
+        """Test a missing qm.service cgroup is reported as an error."""
+        with pytest.raises(SystemExit):
+            qm_controller.show_resources(interval=0.01, count=1)
+
+        assert "not found" in capsys.readouterr().err
+
+
+class TestPressure:
+    """Test PSI reporting and threshold triggers."""
+
+    PSI = ("some avg10=1.50 avg60=0.50 avg300=0.10 total=12000\n"
+           "full avg10=0.00 avg60=0.00 avg300=0.00 total=0\n")
+
+    def test_parse_threshold(self):
+        """Test thresholds convert to kernel trigger units."""
+        assert qmctl.parse_pressure_threshold("memory:full=100/2000") == (
+            "memory", "full", 100000, 2000000)
+        assert qmctl.parse_pressure_threshold("io=150/1000")[1] == "some"
+        for spec in ("disk=1/1000", "cpu:half=1/1000", "cpu=1",
+                     "cpu=2000/1000", "cpu=1/100"):
+            with pytest.raises(ValidationError):
+                qmctl.parse_pressure_threshold(spec)
+
+    def test_show_pressure_json(self, qm_controller, fake_cgroup, capsys):
+        """Test qm.service and nested containers are reported by name."""
+        qm = fake_cgroup("qm.service")
+        scope = fake_cgroup(f"qm.service/libpod-{'a' * 64}.scope")
+        for path in (qm, scope):
+            (path / "memory.pressure").write_text(self.PSI)
+        with patch.object(qm_controller, '_nested_container_ids',
+                          return_value={"a" * 64: "radio"}):
+            qm_controller.show_pressure(output_json=True)
+
+        entries = json.loads(capsys.readouterr().out)["pressure"]
+        assert [entry["container"] for entry in entries] == [None, "radio"]
+        assert entries[1]["memory"]["some"] == {
+            "avg10": 1.5, "avg60": 0.5, "avg300": 0.1, "total": 12000}
+        assert "cpu" not in entries[0]
+
+    @pytest.mark.skipif(not os.path.exists("/proc/pressure/memory"),
+                        reason="kernel without PSI")
+    def test_watch_registers_trigger_and_reports(self, qm_controller,
+                                                 fake_cgroup, capsys):
+        """Test a trigger is armed on the pressure file and events print."""
+        qm = fake_cgroup("qm.service")
+        (qm / "memory.pressure").symlink_to("/proc/pressure/memory")
+        poller = Mock()
+        poller.poll.side_effect = lambda: [
+            (fd, select.POLLPRI)
+            for (fd, _), _ in poller.register.call_args_list]
+        with patch("select.poll", return_value=poller):
+            qm_controller.watch_pressure(["memory=200/2000"],
+                                         output_json=True, count=1)
+
+        event = json.loads(capsys.readouterr().out)
+        assert event["cgroup"] == "qm.service"
+        assert (event["resource"], event["kind"]) == ("memory", "some")
+        assert (event["threshold_ms"], event["window_ms"]) == (200, 2000)
+        assert "avg10" in event["pressure"]
+
+    def test_watch_without_pressure_files(self, qm_controller, fake_cgroup,
+                                          capsys):
+        """Test watching fails clearly when PSI files are missing."""
+        fake_cgroup("qm.service")
+        with pytest.raises(SystemExit):
+            qm_controller.watch_pressure(count=1)
+
+        assert "No pressure files" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("options", [
+        ["--count", "3"], ["--threshold", "cpu=100/1000"],
+    ])
+    def test_watch_options_require_watch(self, qm_controller, options):
+        """Test watch-only options are rejected before reading PSI."""
+        parser = create_argument_parser("Test")
+        qmctl.configure_subcommands(parser)
+        args = parser.parse_args(["pressure", *options])
+
+        with patch.object(qm_controller, 'show_pressure') as show, \
+                pytest.raises(ValidationError, match="require --watch"):
+            qmctl.handle_pressure_command(args, qm_controller)
+        show.assert_not_called()
+
+
+class TestProcIntrospection:
+    """Test show topics answered from the host's /proc without exec."""
+
+    @staticmethod
+    def _fake_proc(tmp_path, pid=42):
+        """Create a procfs stand-in sharing the caller's IPC namespace."""
+        proc = tmp_path / "proc"
+        for entry in (f"{pid}/net", f"{pid}/ns", "self/ns", "sysvipc"):
+            (proc / entry).mkdir(parents=True)
+        (proc / str(pid) / "ns" / "ipc").symlink_to("ipc:[4026531839]")
+        (proc / "self" / "ns" / "ipc").symlink_to("ipc:[4026531839]")
+        (proc / str(pid) / "net" / "unix").write_text(
+            "Num       RefCount Protocol Flags    Type St Inode Path\n"
+            "0000000000000000: 00000002 00000000 00010000 0001 01 1001 "
+            "/run/app.sock\n"
+            "0000000000000000: 00000002 00000000 00010000 0005 01 1002 "
+            "@abstract\n"
+            "0000000000000000: 00000003 00000000 00000000 0001 03 1003\n"
+        )
+        (proc / "sysvipc" / "shm").write_text(
+            "       key      shmid perms       size  cpid  lpid nattch   uid\n"
+            "         0          7   600    1048576   100   101      2     0\n"
+        )
+        (proc / "sysvipc" / "msg").write_text(
+            "       key      msqid perms      cbytes       qnum\n")
+        (proc / "sysvipc" / "sem").write_text(
+            "       key      semid perms      nsems\n")
+        return qmctl.ProcIntrospector(pid, proc_root=str(proc))
+
+    def test_unix_sockets(self, tmp_path):
+        """Test listening sockets are parsed into records."""
+        sockets = self._fake_proc(tmp_path).unix_sockets()
+
+        assert sockets == [
+            {"type": "stream", "state": "listening", "inode": 1001,
+             "path": "/run/app.sock"},
+            {"type": "seqpacket", "state": "listening", "inode": 1002,
+             "path": "@abstract"},
+        ]
+        everything = self._fake_proc(tmp_path / "all").unix_sockets(False)
+        assert everything[2]["state"] == "connected"
+        assert everything[2]["path"] == ""
+
+    def test_sysvipc_same_namespace(self, tmp_path):
+        """Test /proc/sysvipc is read directly when the namespace matches."""
+        objects = self._fake_proc(tmp_path).sysvipc()
+
+        assert objects["shm"] == [{
+            "key": 0, "shmid": 7, "perms": "600", "size": 1048576,
+            "cpid": 100, "lpid": 101, "nattch": 2, "uid": 0}]
+        assert objects["msg"] == objects["sem"] == []
+
+    @pytest.mark.skipif(os.geteuid() != 0 or not shutil.which("unshare")
+                        or not shutil.which("ipcmk"),
+                        reason="needs root, unshare and ipcmk")
+    def test_sysvipc_other_namespace(self):
+        """Test segments of another IPC namespace are read via setns."""
+        proc = subprocess.Popen(
+            ["unshare", "-i", "sh", "-c",
+             "ipcmk -M 12288 >/dev/null && echo ready && exec sleep 30"],
+            stdout=subprocess.PIPE, text=True)
+        try:
+            assert proc.stdout.readline() == "ready\n"
+            shm = qmctl.ProcIntrospector(proc.pid).sysvipc()["shm"]
+        finally:
+            proc.kill()
+            proc.wait()
+
+        assert [segment["size"] for segment in shm] == [12288]
+
+    def test_namespaces_grouped_by_inode(self):
+        """Test processes sharing namespaces are counted, lowest PID owns."""
+        child = subprocess.Popen(["sleep", "30"])
+        try:
+            inventory = qmctl.ProcIntrospector(os.getpid()).namespaces(
+                {child.pid: "radio", os.getpid(): "qm"})
+        finally:
+            child.kill()
+            child.wait()
+
+        net = [entry for entry in inventory.records()
+               if entry["type"] == "net"]
+        assert len(net) == 1
+        assert net[0]["nprocs"] == 2
+        assert net[0]["pid"] == min(child.pid, os.getpid())
+        assert net[0]["containers"] == ["qm", "radio"]
+        assert net[0]["inode"] == int(
+            os.readlink("/proc/self/ns/net").split("[")[1][:-1])
+        assert inventory.by_inode[net[0]["inode"]]["type"] == "net"
+
+    def test_namespace_inventory_scales(self, tmp_path):
+        """Test thousands of processes are indexed in a single pass."""
+        proc = tmp_path / "proc"
+        processes = {}
+        for pid in range(1, 2001):
+            ns_dir = proc / str(pid) / "ns"
+            ns_dir.mkdir(parents=True)
+            container = f"app{pid % 4}"
+            for offset, ns_type in enumerate(("mnt", "net", "pid")):
+                # One mnt namespace per container, net shared, pid per 100
+                inode = {"mnt": 1000 + pid % 4, "net": 2000,
+                         "pid": 3000 + pid // 100}[ns_type]
+                (ns_dir / ns_type).symlink_to(f"{ns_type}:[{inode}]")
+            (proc / str(pid) / "comm").write_text(f"cmd{pid}\n")
+            processes[pid] = container
+        introspector = qmctl.ProcIntrospector(1, proc_root=str(proc))
+
+        with patch('qmctl.qmctl.os.readlink',
+                   wraps=os.readlink) as readlink:
+            inventory = introspector.namespaces(processes)
+
+        # One readlink per process and namespace type, no second pass
+        assert readlink.call_count == \
+            len(processes) * len(qmctl.NAMESPACE_TYPES)
+        assert inventory.by_inode[2000]["nprocs"] == 2000
+        assert inventory.by_inode[2000]["containers"] == {
+            "app0", "app1", "app2", "app3"}
+        assert inventory.by_inode[1003] == {
+            "type": "mnt", "inode": 1003, "pid": 3, "nprocs": 500,
+            "containers": {"app3"}, "command": "cmd3"}
+        assert len(inventory.records()) == 4 + 1 + 21
+
+    def test_processes_attributed_to_nested_containers(self, qm_controller,
+                                                       fake_cgroup):
+        """Test sub-cgroups of a scope belong to its nested container."""
+        scope = fake_cgroup(f"qm.service/libpod-{'a' * 64}.scope/container")
+        (scope / "cgroup.procs").write_text("20\n21\n")
+        (fake_cgroup("qm.service/init.scope") / "cgroup.procs").write_text(
+            "10\n")
+        unnamed = fake_cgroup(f"qm.service/libpod-{'b' * 64}")
+        (unnamed / "cgroup.procs").write_text("30\n")
+        with patch.object(qm_controller, '_nested_container_ids',
+                          return_value={"a" * 64: "radio"}):
+            processes = qm_controller._container_processes()
+
+        assert processes == {10: "test-qm", 20: "radio", 21: "radio",
+                             30: "b" * 12}
+
+    def test_conmon_in_host_namespaces_left_out(self, qm_controller,
+                                                fake_cgroup):
+        """Test conmon next to the payload cgroup is not reported as QM."""
+        (fake_cgroup("qm.service") / "cgroup.procs").write_text("5\n6\n")
+        payload = fake_cgroup(f"qm.service/libpod-payload-{'f' * 64}")
+        (payload / "cgroup.procs").write_text("10\n")
+        scope = fake_cgroup(f"qm.service/libpod-payload-{'f' * 64}"
+                            f"/machine.slice/libpod-{'a' * 64}.scope")
+        (scope / "cgroup.procs").write_text("20\n")
+        with patch.object(qm_controller, '_nested_container_ids',
+                          return_value={"a" * 64: "radio"}):
+            processes = qm_controller._container_processes()
+
+        assert processes == {10: "test-qm", 20: "radio"}
+
+    def test_host_namespace_processes_left_out_without_payload(
+        self, qm_controller, fake_cgroup
+    ):
+        """Test conmon is recognised by its namespaces without a split."""
+        (fake_cgroup("qm.service") / "cgroup.procs").write_text("5\n10\n")
+        with patch('qmctl.qmctl.shares_host_namespace',
+                   side_effect=lambda pid: pid == 5):
+            processes = qm_controller._container_processes()
+
+        assert processes == {10: "test-qm"}
+
+    def test_shares_host_namespace(self, tmp_path):
+        """Test namespace links are compared with PID 1's."""
+        for pid, inode in ((1, 1), (5, 1), (10, 2)):
+            (tmp_path / str(pid) / "ns").mkdir(parents=True)
+            (tmp_path / str(pid) / "ns" / "mnt").symlink_to(f"mnt:[{inode}]")
+
+        assert qmctl.shares_host_namespace(5, proc_root=str(tmp_path))
+        assert not qmctl.shares_host_namespace(10, proc_root=str(tmp_path))
+        assert not qmctl.shares_host_namespace(99, proc_root=str(tmp_path))
+
+    def test_show_namespaces_without_exec(self, qm_controller, fake_cgroup,
+                                          capsys):
+        """Test the topic uses the qm.service cgroup and no subprocess."""
+        fake_cgroup("qm.service")
+        scope = fake_cgroup(f"qm.service/libpod-payload-{'f' * 64}")
+        (scope / "cgroup.procs").write_text(f"{os.getpid()}\n")
+        with patch.object(qm_controller, '_container_state',
+                          return_value={"pid": os.getpid()}), \
+                patch('qmctl.qmctl.subprocess.run') as mock_run:
+            qm_controller.show_namespaces(output_json=True)
+
+        mock_run.assert_not_called()
+        namespaces = json.loads(capsys.readouterr().out)["Namespaces"]
+        assert {entry["type"] for entry in namespaces} >= {"mnt", "net"}
+        assert all(entry["pid"] == os.getpid() for entry in namespaces)
+        assert all(entry["containers"] == ["test-qm"] for entry in namespaces)
+
+    def test_shared_memory_memfd(self):
+        """Test a mapped memfd is sized and attributed to its container."""
+        child = subprocess.Popen([sys.executable, "-c", (
+            "import mmap, os, sys\n"
+            "fd = os.memfd_create('qmctl-test')\n"
+            "os.ftruncate(fd, 3 * 4096)\n"
+            "m = mmap.mmap(fd, 3 * 4096)\n"
+            "print('ready', flush=True)\n"
+            "sys.stdin.read()\n")],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        try:
+            assert child.stdout.readline() == "ready\n"
+            report = qmctl.ProcIntrospector(child.pid).shared_memory(
+                {child.pid: "radio"})
+        finally:
+            child.kill()
+            child.wait()
+
+        memfd, = [entry for entry in report["memfd"]
+                  if entry["name"] == "qmctl-test"]
+        assert memfd["size"] == 3 * 4096
+        assert (memfd["nprocs"], memfd["containers"]) == (1, ["radio"])
+        assert report["containers"]["radio"]["memfd_bytes"] >= 3 * 4096
+
+    @pytest.mark.skipif(os.geteuid() != 0 or not shutil.which("unshare")
+                        or not shutil.which("ipcmk"),
+                        reason="needs root, unshare and ipcmk")
+    def test_shared_memory_orphaned_sysv_segment(self):
+        """Test segments of a nested IPC namespace count for its container."""
+        proc = subprocess.Popen(
+            ["unshare", "-i", "sh", "-c",
+             "ipcmk -M 12288 >/dev/null && echo ready && exec sleep 30"],
+            stdout=subprocess.PIPE, text=True)
+        try:
+            assert proc.stdout.readline() == "ready\n"
+            report = qmctl.ProcIntrospector(proc.pid).shared_memory(
+                {proc.pid: "camera"})
+        finally:
+            proc.kill()
+            proc.wait()
+
+        segment, = report["shm"]
+        assert segment["container"] == "camera"
+        assert segment["size"] == 12288
+        assert segment["orphaned"] is True
+        assert report["containers"]["camera"]["shm_segments"] == 1
+        assert report["containers"]["camera"]["total_bytes"] >= 12288
+
+    def test_shared_memory_posix_per_mount_namespace(self, tmp_path):
+        """Test /dev/shm is read once per mount namespace, by its owner."""
+        proc = tmp_path / "proc"
+        for pid, inode in ((10, 1), (11, 1), (20, 2)):
+            (proc / str(pid) / "ns").mkdir(parents=True)
+            (proc / str(pid) / "ns" / "mnt").symlink_to(f"mnt:[{inode}]")
+            (proc / str(pid) / "maps").write_text("")
+        for pid, name, size in ((10, "qm-cache", 100), (20, "frames", 4096)):
+            shm = proc / str(pid) / "root" / "dev" / "shm"
+            shm.mkdir(parents=True)
+            (shm / name).write_bytes(b"x" * size)
+        introspector = qmctl.ProcIntrospector(10, proc_root=str(proc))
+
+        report = introspector.shared_memory(
+            {10: "qm", 11: "qm", 20: "camera"})
+
+        assert [(entry["container"], entry["path"], entry["size"])
+                for entry in report["posix"]] == [
+            ("qm", "/dev/shm/qm-cache", 100),
+            ("camera", "/dev/shm/frames", 4096)]
+        assert report["containers"]["camera"]["posix_bytes"] == 4096
+        assert report["containers"]["qm"]["posix_files"] == 1
+
+    def test_shared_memory_skips_host_namespaces(self, qm_controller,
+                                                 fake_cgroup, tmp_path):
+        """Test conmon's host IPC and mount namespaces are not QM's."""
+        proc = tmp_path / "proc"
+        for pid, inode, name in ((5, 1, "host-file"), (10, 2, "qm-cache")):
+            (proc / str(pid) / "ns").mkdir(parents=True)
+            for offset, ns_type in enumerate(("ipc", "mnt")):
+                (proc / str(pid) / "ns" / ns_type).symlink_to(
+                    f"{ns_type}:[{inode + 100 * offset}]")
+            (proc / str(pid) / "maps").write_text("")
+            shm = proc / str(pid) / "root" / "dev" / "shm"
+            shm.mkdir(parents=True)
+            (shm / name).write_bytes(b"x" * 64)
+        (fake_cgroup("qm.service") / "cgroup.procs").write_text("5\n")
+        payload = fake_cgroup(f"qm.service/libpod-payload-{'f' * 64}")
+        (payload / "cgroup.procs").write_text("10\n")
+
+        def sysvipc(self, pid=None):
+            segment = {"key": pid, "size": 4096, "nattch": 1}
+            return {"shm": [segment], "msg": [], "sem": []}
+
+        with patch.object(qm_controller, '_introspector',
+                          return_value=qmctl.ProcIntrospector(
+                              10, proc_root=str(proc))), \
+                patch.object(qmctl.ProcIntrospector, 'sysvipc', sysvipc):
+            qm_controller._configure_output(output_json=True)
+            report = qm_controller._collect_shared_memory()["Shared memory"]
+
+        assert [segment["key"] for segment in report["shm"]] == [10]
+        assert [entry["path"] for entry in report["posix"]] == [
+            "/dev/shm/qm-cache"]
+        assert list(report["containers"]) == ["test-qm"]
+
+    def test_show_unix_sockets_table(self, qm_controller, tmp_path, capsys):
+        """Test the text output is a table of the parsed records."""
+        introspector = self._fake_proc(tmp_path)
+        with patch.object(qm_controller, '_introspector',
+                          return_value=introspector):
+            qm_controller.show_unix_sockets()
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].split() == ["TYPE", "STATE", "INODE", "PATH"]
+        assert lines[1].split() == ["stream", "listening", "1001",
+                                    "/run/app.sock"]
+
+
+class TestHostDeviceCheck:
+    """Test device availability computed from the host side."""
+
+    RULES = [
+        {"allow": False, "access": "rwm"},
+        {"allow": True, "type": "c", "major": 1, "minor": 3,
+         "access": "rwm"},
+        {"allow": True, "type": "c", "major": 1, "minor": -1,
+         "access": "w"},
+        {"allow": False, "type": "c", "major": 1, "minor": 7,
+         "access": "w"},
+    ]
+
+    def test_resolve_in_root_keeps_symlinks_inside(self, tmp_path):
+        """Test absolute and relative links resolve against the root."""
+        (tmp_path / "dev" / "dri" / "by-path").mkdir(parents=True)
+        (tmp_path / "dev" / "dri" / "card0").write_text("")
+        (tmp_path / "dev" / "dri" / "by-path" / "pci").symlink_to(
+            "../card0")
+        (tmp_path / "dev" / "gpu").symlink_to("/dev/dri/by-path/pci")
+        (tmp_path / "dev" / "loop").symlink_to("loop")
+        root = str(tmp_path)
+
+        assert qmctl.resolve_in_root(root, "/dev/gpu") == \
+            f"{root}/dev/dri/card0"
+        assert qmctl.resolve_in_root(root, "/dev/dri/../dri/./card0") == \
+            f"{root}/dev/dri/card0"
+        with pytest.raises(OSError):
+            qmctl.resolve_in_root(root, "/dev/loop")
+        with pytest.raises(FileNotFoundError):
+            qmctl.resolve_in_root(root, "/dev/kvm")
+
+    def test_device_cgroup_access_last_match_wins(self):
+        """Test OCI device rules are applied in order per access type."""
+        access = qmctl.device_cgroup_access
+        assert access(self.RULES, "c", 1, 3) == "rwm"
+        assert access(self.RULES, "c", 1, 5) == "w"
+        assert access(self.RULES, "c", 1, 7) == ""
+        assert access(self.RULES, "b", 1, 3) == ""
+        assert access([], "c", 10, 232) == ""
+
+    def test_parse_devices_list(self):
+        """Test cgroup v1 devices.list entries become allow rules."""
+        rules = qmctl.parse_devices_list("c 10:232 rwm\nb *:* r\n")
+
+        assert qmctl.device_cgroup_access(rules, "c", 10, 232) == "rwm"
+        assert qmctl.device_cgroup_access(rules, "b", 8, 0) == "r"
+        assert qmctl.device_cgroup_access(rules, "c", 10, 200) == ""
+
+    def test_probe_devices_on_host(self, qm_controller, tmp_path):
+        """Test presence, host cross-check and cgroup status in one pass."""
+        oci_config = tmp_path / "config.json"
+        oci_config.write_text(json.dumps(
+            {"linux": {"resources": {"devices": self.RULES}}}))
+        state = {"pid": os.getpid(), "oci_config": str(oci_config)}
+        with patch.object(qm_controller, '_container_state',
+                          return_value=state), \
+                patch('qmctl.qmctl.subprocess.run') as mock_run:
+            probed = qm_controller._probe_devices_on_host(
+                ["/dev/null", "/dev/zero", "/nonexistent"])
+
+        mock_run.assert_not_called()
+        assert probed["/dev/null"] == {
+            "present": True, "type": "char", "major_minor": "1:3",
+            "readable": True, "host_major_minor": "1:3",
+            "cgroup_access": "rwm", "status": "available"}
+        assert probed["/dev/zero"]["cgroup_access"] == "w"
+        assert probed["/dev/zero"]["status"] == "not-permitted"
+        assert probed["/nonexistent"]["status"] == "missing"
+
+    def test_unreadable_root_is_not_missing(self, tmp_path):
+        """Test EACCES on the container root is raised, not "missing"."""
+        os.makedirs(tmp_path / "42")
+        introspector = qmctl.ProcIntrospector(42, proc_root=str(tmp_path))
+        denied = PermissionError(errno.EACCES, "Permission denied")
+        with patch('qmctl.qmctl.resolve_in_root', side_effect=denied):
+            with pytest.raises(PermissionError):
+                introspector.devices(["/dev/null"])
+
+        with patch('qmctl.qmctl.resolve_in_root',
+                   side_effect=FileNotFoundError(errno.ENOENT, "missing")):
+            devices = introspector.devices(["/dev/null"])
+        assert devices["/dev/null"]["present"] is False
+
+    def test_mismatch_and_unknown_allow_list(self, qm_controller):
+        """Test a node differing from the host's is flagged."""
+        devices = {"/dev/video0": {
+            "present": True, "type": "char", "major_minor": "81:1",
+            "readable": True, "host_major_minor": "81:0"}}
+        with patch.object(qm_controller, '_container_state',
+                          return_value={"pid": 1, "oci_config": ""}), \
+                patch.object(qmctl.ProcIntrospector, 'devices',
+                             return_value=devices):
+            probed = qm_controller._probe_devices_on_host(["/dev/video0"])
+
+        assert probed["/dev/video0"]["cgroup_access"] is None
+        assert probed["/dev/video0"]["status"] == "mismatch"
+
+    def test_falls_back_to_exec(self, qm_controller, mock_container_exists):
+        """Test the in-container probe is used when /proc is unusable."""
+        probed = {"/dev/kvm": {"present": True}}
+        with patch.object(qm_controller, '_extract_devices_from_config',
+                          return_value=["/dev/kvm"]), \
+                patch.object(qm_controller, '_probe_devices_on_host',
+                             side_effect=PermissionError("denied")), \
+                patch.object(qm_controller, '_probe_devices',
+                             return_value=probed) as probe:
+            output = qm_controller._collect_available_devices()
+
+        probe.assert_called_once_with(["/dev/kvm"])
+        assert output == {"/dev/kvm": True}
+
+
+class TestQuadletDropins:
+    """Test the config file is merged with its quadlet drop-ins."""
+
+    @pytest.fixture
+    def units(self, tmp_path, monkeypatch):
+        """Lay out a base unit in /usr/share and drop-ins in /etc and /run."""
+        etc, run, usr = (tmp_path / name for name in ("etc", "run", "usr"))
+        for unit_dir in (etc, run, usr):
+            (unit_dir / "qm.container.d").mkdir(parents=True)
+        (usr / "qm.container").write_text(
+            "[Container]\nImage=localhost/qm:latest\n"
+            "AddDevice=-/dev/fuse\n\n[Service]\nRestart=always\n")
+        (etc / "qm.container.d" / "qm_dropin_mount_bind_kvm.conf").write_text(
+            "# kvm\n[Container]\nAddDevice=-/dev/net/tun\n"
+            "AddDevice=-/dev/kvm\n")
+        (usr / "qm.container.d" / "qm_dropin_mount_bind_kvm.conf").write_text(
+            "[Container]\nAddDevice=-/dev/masked\n")
+        video = run / "qm.container.d" / "qm_dropin_mount_bind_video.conf"
+        video.write_text(
+            "[Container]\nAddDevice=-/dev/video0\nImage=localhost/qm:video\n")
+        (usr / "qm.container.d" / "notes.txt").write_text("[Container]\n")
+        monkeypatch.setenv(qmctl.QUADLET_UNIT_DIRS_ENV,
+                           f"{etc}:{run}:{usr}")
+        return etc, run, usr
+
+    @pytest.fixture
+    def controller(self, units):
+        """Create a controller reading the base unit of the layout."""
+        return QmController(config_path=str(units[2] / "qm.container"),
+                            container_name="test-qm", transport="cli")
+
+    def test_dropins_applied_in_name_order_with_masking(self, units,
+                                                        controller):
+        """Test higher priority drop-ins mask same-named lower ones."""
+        etc, run, usr = units
+        config = controller._load_config()
+
+        assert config.files == [
+            str(usr / "qm.container"),
+            str(etc / "qm.container.d" / "qm_dropin_mount_bind_kvm.conf"),
+            str(run / "qm.container.d" / "qm_dropin_mount_bind_video.conf"),
+        ]
+        assert controller._extract_devices_from_config() == [
+            "/dev/fuse", "/dev/net/tun", "/dev/kvm", "/dev/video0"]
+        assert list(controller._read_config_lines("Image=")) == [
+            "Image=localhost/qm:latest", "Image=localhost/qm:video"]
+
+    def test_empty_assignment_resets_list(self, units, controller):
+        """Test an empty AddDevice= clears devices set before it."""
+        (units[0] / "qm.container.d" / "zz_reset.conf").write_text(
+            "[Container]\nAddDevice=\nAddDevice=/dev/null\n")
+        assert controller._extract_devices_from_config() == ["/dev/null"]
+
+    def test_show_container_json_records_provenance(self, units, controller,
+                                                    capsys):
+        """Test JSON output carries merged sections and their origin."""
+        etc, run, usr = units
+        controller.show_container(output_json=True)
+
+        output = json.loads(capsys.readouterr().out)
+        assert output["path"] == str(usr / "qm.container")
+        assert len(output["dropins"]) == 2
+        assert output["sections"]["Container"]["Image"] == \
+            "localhost/qm:video"
+        assert output["provenance"]["Container"]["Image"] == [
+            {"value": "localhost/qm:latest",
+             "file": str(usr / "qm.container"), "line": 2},
+            {"value": "localhost/qm:video",
+             "file": str(run / "qm.container.d" /
+                         "qm_dropin_mount_bind_video.conf"), "line": 3},
+        ]
+        kvm = output["provenance"]["Container"]["AddDevice"][2]
+        assert kvm["file"].startswith(str(etc))
+        assert kvm["line"] == 4
+
+    def test_show_container_text_lists_every_file(self, units, controller,
+                                                  capsys):
+        """Test text output shows each file under its path."""
+        controller.show_container(output_json=False)
+
+        out = capsys.readouterr().out
+        assert f"# {units[2] / 'qm.container'}\n[Container]" in out
+        assert "AddDevice=-/dev/kvm" in out
+        assert "/dev/masked" not in out
+
+    def test_cached_config_skips_reading(self, units, controller):
+        """Test a second invocation reuses the cached merge."""
+        first = controller._load_config()
+        again = QmController(config_path=controller.config_path,
+                             container_name="test-qm", transport="cli")
+
+        with patch.object(qmctl.QuadletConfig, "parse",
+                          side_effect=AssertionError("re-read")):
+            assert again._load_config().entries == first.entries
+            assert controller._load_config() is first
+
+    def test_cache_invalidated_by_changed_or_new_file(self, units,
+                                                      controller):
+        """Test edits and new drop-ins are picked up."""
+        controller._load_config()
+        dropin = units[0] / "qm.container.d" / "qm_dropin_mount_bind_kvm.conf"
+        dropin.write_text("[Container]\nAddDevice=-/dev/kvm\n")
+        assert "/dev/net/tun" not in controller._extract_devices_from_config()
+
+        (units[1] / "qm.container.d" / "qm_dropin_snd.conf").write_text(
+            "[Container]\nAddDevice=-/dev/snd\n")
+        fresh = QmController(config_path=controller.config_path,
+                             container_name="test-qm", transport="cli")
+        assert "/dev/snd" in fresh._extract_devices_from_config()
+
+    def test_continuation_lines_are_joined(self, tmp_path):
+        """Test a trailing backslash continues the value."""
+        unit = tmp_path / "qm.container"
+        unit.write_text("[Container]\nPodmanArgs=--pids-limit=-1 \\\n"
+                        "  --security-opt label=nested\n")
+        files = [str(unit)]
+        config = qmctl.QuadletConfig.parse(
+            files, qmctl.QuadletConfig.file_signature(files))
+        assert [entry.as_list() for entry in config.entries] == [[
+            "Container", "PodmanArgs",
+            "--pids-limit=-1 --security-opt label=nested", str(unit), 2]]
+
+
+class TestConfigModel:
+    """Test the typed config model and its single-pass parser."""
+
+    CONTENT = """[Container]
+Image=localhost/qm:latest
+AddDevice=-/dev/kvm
+Volume=/var/qm:/var:rw
+Annotation=run.oci.keep_original_groups=1
+; comment
+AddDevice=-/dev/fuse
+Volume=/run/qm:/run:rw
+Annotation=org.qm=1
+ReadOnly
+
+[Service]
+Restart=always
+
+[Container]
+Image=localhost/qm:next
+"""
+
+    # Size of the synthetic unit used by the benchmark
+    BENCHMARK_LINES = 20000
+    # Generous bound so slow CI runners do not flake
+    BENCHMARK_BUDGET_MS = 1000
+
+    def test_repeated_keys_keep_every_value(self):
+        """Test multi-value keys are lists and the last scalar wins."""
+        sections = qmctl.QuadletConfig.from_text(self.CONTENT).sections()
+
+        assert sections["Container"]["AddDevice"] == ["-/dev/kvm",
+                                                      "-/dev/fuse"]
+        assert sections["Container"]["Volume"] == ["/var/qm:/var:rw",
+                                                   "/run/qm:/run:rw"]
+        assert sections["Container"]["Annotation"] == [
+            "run.oci.keep_original_groups=1", "org.qm=1"]
+        assert sections["Container"]["Image"] == "localhost/qm:next"
+        assert sections["Container"]["ReadOnly"] is True
+        assert sections["Service"] == {"Restart": "always"}
+
+    def test_entries_track_lines(self):
+        """Test entries are slotted records indexed by section and key."""
+        config = qmctl.QuadletConfig.from_text(self.CONTENT, "qm.container")
+
+        entry = config.index["Container"]["AddDevice"][1]
+        assert (entry.value, entry.path, entry.line) == \
+            ("-/dev/fuse", "qm.container", 7)
+        assert not hasattr(entry, "__dict__")
+        assert [e.line for e in config.index["Container"]["Image"]] == \
+            [2, 16]
+        assert config.lookup("Container", "Image") == "localhost/qm:next"
+        assert config.lookup("Container", "Missing") is None
+
+    def test_cache_round_trip(self):
+        """Test the JSON form rebuilds the same entries and index."""
+        config = qmctl.QuadletConfig.from_text(self.CONTENT)
+        again = qmctl.QuadletConfig.from_dict(
+            json.loads(json.dumps(config.to_dict())))
+
+        assert again.entries == config.entries
+        assert again.sections() == config.sections()
+
+    def test_show_topics_share_one_parse(self, qm_controller):
+        """Test concurrent topics read the config once."""
+        qm_controller.output_config.output_json = True
+        collectors = {
+            "container": qm_controller._collect_container,
+            "devices": qm_controller._extract_devices_from_config,
+            "lines": lambda: list(qm_controller._read_config_lines()),
+        }
+
+        with patch.object(qmctl.QuadletConfig, "parse",
+                          wraps=qmctl.QuadletConfig.parse) as parse:
+            results = dict(qm_controller._gather(collectors))
+
+        assert parse.call_count == 1
+        assert results["container"]["sections"]["Container"]["Image"] == \
+            "localhost/qm:latest"
+
+    @pytest.mark.performance
+    def test_parse_large_unit_within_budget(self, tmp_path):
+        """Measure parsing a synthetic unit with thousands of lines."""
+        import tracemalloc
+
+        unit = tmp_path / "qm.container"
+        lines = ["[Container]"]
+        for number in range(self.BENCHMARK_LINES):
+            key = ("AddDevice", "Volume", "Annotation",
+                   "Environment")[number % 4]
+            lines.append(f"{key}=value-{number}")
+            if number % 1000 == 0:
+                lines.append(f"# comment {number}")
+        unit.write_text("\n".join(lines) + "\n")
+        files = [str(unit)]
+        signature = qmctl.QuadletConfig.file_signature(files)
+
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            config = qmctl.QuadletConfig.parse(files, signature)
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        qmctl.QuadletConfig.parse(files, signature)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        parse_ms = statistics.median(timings) * 1000
+        print(f"{self.BENCHMARK_LINES} lines: parse median "
+              f"{parse_ms:.1f} ms, peak "
+              f"{peak / self.BENCHMARK_LINES:.0f} B/line")
+        sections = config.sections()
+        assert len(sections["Container"]["Volume"]) == \
+            self.BENCHMARK_LINES // 4
+        assert parse_ms < self.BENCHMARK_BUDGET_MS
+
+
+class TestShowWatch:
+    """Test `show --watch` waking on inotify events."""
+
+    @pytest.fixture
+    def unit(self, tmp_path, monkeypatch):
+        """Create a unit with an empty drop-in directory."""
+        units = tmp_path / "units"
+        (units / "qm.container.d").mkdir(parents=True)
+        path = units / "qm.container"
+        path.write_text("[Container]\nImage=localhost/qm:latest\n")
+        monkeypatch.setenv(qmctl.QUADLET_UNIT_DIRS_ENV, str(units))
+        return path
+
+    @staticmethod
+    def later(delay, action):
+        """Run action on a timer thread and return the started timer."""
+        timer = threading.Timer(delay, action)
+        timer.start()
+        return timer
+
+    def test_json_patch(self):
+        """Test objects are diffed per key and other values replaced."""
+        old = {"a": 1, "b": {"c": [1], "d/e": 2}, "gone": True}
+        new = {"a": 1, "b": {"c": [1, 2], "d/e": 3}, "f": None}
+
+        assert qmctl.json_patch(old, new) == [
+            {"op": "remove", "path": "/gone"},
+            {"op": "replace", "path": "/b/c", "value": [1, 2]},
+            {"op": "replace", "path": "/b/d~1e", "value": 3},
+            {"op": "add", "path": "/f", "value": None},
+        ]
+        assert qmctl.json_patch("x", "x") == []
+
+    def test_watcher_reports_changed_paths(self, tmp_path):
+        """Test events are read back as paths and timeouts return none."""
+        watched = tmp_path / "watched"
+        watched.write_text("1")
+        watcher = qmctl.InotifyWatcher()
+        try:
+            assert watcher.add(str(watched), qmctl.WATCH_FILE_MASK)
+            assert watcher.add(str(tmp_path), qmctl.WATCH_DIR_MASK)
+            assert not watcher.add(str(tmp_path / "missing"),
+                                   qmctl.WATCH_FILE_MASK)
+            assert watcher.wait(0.01) == []
+
+            watched.write_text("2")
+            (tmp_path / "new").write_text("")
+            changed = set(watcher.wait(1))
+        finally:
+            watcher.close()
+
+        assert str(watched) in changed
+        assert str(tmp_path / "new") in changed
+
+    def test_container_emits_snapshot_then_patch(self, unit, capsys):
+        """Test a new drop-in produces one NDJSON patch."""
+        controller = QmController(config_path=str(unit),
+                                  container_name="test-qm", transport="cli")
+        dropin = unit.parent / "qm.container.d" / "kvm.conf"
+        timer = self.later(0.2, lambda: dropin.write_text(
+            "[Container]\nAddDevice=-/dev/kvm\n"))
+
+        controller.watch_topic("container", output_json=True, count=2)
+        timer.join()
+
+        snapshot, update = map(json.loads,
+                               capsys.readouterr().out.splitlines())
+        assert snapshot["topic"] == "container"
+        assert snapshot["snapshot"]["dropins"] == []
+        assert {"op": "add", "path": "/sections/Container/AddDevice",
+                "value": ["-/dev/kvm"]} in update["patch"]
+        assert {"op": "replace", "path": "/dropins",
+                "value": [str(dropin)]} in update["patch"]
+
+    def test_text_rendered_only_when_data_changes(self, unit, capsys):
+        """Test a touch without a content change prints nothing."""
+        controller = QmController(config_path=str(unit),
+                                  container_name="test-qm", transport="cli")
+        timers = [
+            self.later(0.1, lambda: os.utime(unit)),
+            self.later(0.4, lambda: unit.write_text(
+                "[Container]\nImage=localhost/qm:next\n")),
+        ]
+
+        with patch.object(qmctl.QuadletConfig, "parse",
+                          wraps=qmctl.QuadletConfig.parse) as parse:
+            controller.watch_topic("container", count=2)
+        for timer in timers:
+            timer.join()
+
+        out = capsys.readouterr().out
+        assert out.count("qmctl show container") == 2
+        assert out.index("qm:latest") < out.index("qm:next")
+        assert parse.call_count == 3  # Initial, touched, rewritten
+
+    def test_cgroup_events_wake_proc_topics(self, qm_controller,
+                                            fake_cgroup, capsys):
+        """Test cgroup.events modifications re-collect /proc topics."""
+        cgroup = fake_cgroup("qm.service")
+        (cgroup / "cgroup.events").write_text("populated 1\n")
+        results = iter([{"Namespaces": [1]}, {"Namespaces": [1, 2]}])
+        timer = self.later(0.2, lambda: (cgroup / "cgroup.events").write_text(
+            "populated 1\nfrozen 0\n"))
+
+        with patch.object(qm_controller, "_collect_namespaces",
+                          side_effect=lambda: next(results)):
+            qm_controller.watch_topic("namespaces", output_json=True,
+                                      interval=0, count=2)
+        timer.join()
+
+        update = json.loads(capsys.readouterr().out.splitlines()[1])
+        assert update["patch"] == [{"op": "replace", "path": "/Namespaces",
+                                    "value": [1, 2]}]
+        paths = dict(qm_controller._watch_paths("namespaces"))
+        assert paths[str(cgroup / "cgroup.events")] == qmctl.IN_MODIFY
+
+    def test_resources_rejected(self, qm_controller, capsys):
+        """Test resources points to its own sampling options."""
+        with pytest.raises(SystemExit) as exc_info:
+            qm_controller.watch_topic("resources")
+        assert exc_info.value.code == QmError.EXIT_CODE_GENERAL_ERROR
+        assert "--interval and --count" in capsys.readouterr().err
+
+    def test_cli_watch_passes_options(self, qm_controller):
+        """Test show --watch is routed to watch_topic."""
+        parser = create_argument_parser(qmctl.get_description())
+        qmctl.configure_subcommands(parser)
+        args = parser.parse_args(["show", "available-devices", "--watch",
+                                  "--details", "--count", "3"])
+
+        with patch.object(qm_controller, "watch_topic") as watch:
+            args.func(args, qm_controller)
+        watch.assert_called_once_with("available-devices", output_json=False,
+                                      pretty=True, count=3, details=True)
+
+
+class TestMetrics:
+    """Test the OpenMetrics exporter."""
+
+    NESTED_ID = "c" * 64
+    # Scrape budget for qm.service and BENCHMARK_CONTAINERS nested ones
+    BENCHMARK_CONTAINERS = 50
+    BENCHMARK_BUDGET_MS = 100
+
+    @pytest.fixture
+    def cgroups(self, fake_cgroup):
+        """Lay out qm.service with one nested container and PSI files."""
+        qm = fake_cgroup("qm.service", usage_usec=2500000, memory=8192,
+                         rbytes=4096, wbytes=1024)
+        nested = fake_cgroup(
+            f"qm.service/qm.slice/libpod-{self.NESTED_ID}.scope",
+            usage_usec=500000, memory=2048)
+        for path in (qm, nested):
+            (path / "memory.events").write_text(
+                "low 0\nhigh 0\nmax 3\noom 2\noom_kill 1\n")
+            for resource in qmctl.PSI_RESOURCES:
+                (path / f"{resource}.pressure").write_text(
+                    "some avg10=0.00 avg60=0.00 avg300=0.00 total=1500000\n"
+                    "full avg10=0.00 avg60=0.00 avg300=0.00 total=0\n")
+        return qm, nested
+
+    @pytest.fixture
+    def controller(self, qm_controller):
+        """Name nested containers without podman and keep QM stopped."""
+        with patch.object(qm_controller, "_nested_container_ids",
+                          return_value={self.NESTED_ID: "radio"}), \
+                patch.object(qm_controller, "_container_state",
+                             side_effect=QmError("not running")):
+            yield qm_controller
+
+    @staticmethod
+    def samples(text):
+        """Return {sample line without value: value} of an exposition."""
+        return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+                for line in text.splitlines() if not line.startswith("#")}
+
+    def test_openmetrics_exposition(self, cgroups, controller):
+        """Test qm.service and nested containers are exported."""
+        text = controller.collect_metrics()
+        samples = self.samples(text)
+        qm = 'container="test-qm",cgroup="qm.service"'
+        radio = ('container="radio",cgroup="qm.service/qm.slice/'
+                 f'libpod-{self.NESTED_ID}.scope"')
+
+        assert text.endswith("# EOF\n")
+        assert "# TYPE qm_cpu_usage_seconds counter\n" \
+               "# UNIT qm_cpu_usage_seconds seconds\n" in text
+        assert samples["qm_up"] == 1
+        assert samples["qm_nested_containers"] == 1
+        assert samples["qm_devices_configured"] == 0
+        assert samples[f"qm_cpu_usage_seconds_total{{{qm}}}"] == 2.5
+        assert samples[f"qm_cpu_usage_seconds_total{{{radio}}}"] == 0.5
+        assert samples[f"qm_memory_bytes{{{qm}}}"] == 8192
+        assert samples[f"qm_memory_oom_events_total{{{radio}}}"] == 2
+        assert samples[f"qm_memory_oom_kills_total{{{qm}}}"] == 1
+        assert samples[f"qm_io_read_bytes_total{{{qm}}}"] == 4096
+        assert samples["qm_pressure_stalled_seconds_total"
+                       f'{{{qm},resource="cpu",kind="some"}}'] == 1.5
+        assert "qm_devices{" not in text  # Availability needs QM running
+
+    def test_prometheus_text_format(self, cgroups, controller):
+        """Test the textfile format names counter families with _total."""
+        text = controller.collect_metrics(openmetrics=False)
+
+        assert "# TYPE qm_cpu_usage_seconds_total counter" in text
+        assert "# UNIT" not in text
+        assert "# EOF" not in text
+
+    def test_collection_is_incremental(self, cgroups, controller):
+        """Test files stay open and names are looked up once per ID."""
+        qm, nested = cgroups
+        controller.collect_metrics()
+        opened = dict(controller._metrics_reader.fds)
+        (qm / "cpu.stat").write_text("usage_usec 4000000\n")
+
+        with patch("qmctl.qmctl.os.open", wraps=os.open) as os_open:
+            samples = self.samples(controller.collect_metrics())
+        os_open.assert_not_called()
+        assert controller._metrics_reader.fds == opened
+        assert samples['qm_cpu_usage_seconds_total{container="test-qm",'
+                       'cgroup="qm.service"}'] == 4.0
+        assert controller._nested_container_ids.call_count == 1
+
+        shutil.rmtree(nested)
+        samples = self.samples(controller.collect_metrics())
+        assert samples["qm_nested_containers"] == 0
+        assert not [path for path in controller._metrics_reader.fds
+                    if path.startswith(str(nested))]
+
+    def test_names_retried_after_podman_failure(self, cgroups, controller):
+        """Test the short-ID fallback label is not cached."""
+        names = controller._nested_container_ids
+        names.side_effect = QmError("podman unreachable")
+        short = f'container="{self.NESTED_ID[:12]}"'
+        assert short in controller.collect_metrics()
+
+        names.side_effect = None
+        text = controller.collect_metrics()
+        assert 'container="radio"' in text
+        assert short not in text
+        assert names.call_count == 2
+
+    def test_device_availability(self, cgroups, qm_controller):
+        """Test configured devices are counted per status."""
+        probed = {"/dev/kvm": {"status": "available"},
+                  "/dev/fuse": {"status": "missing"}}
+        with patch.object(qm_controller, "_extract_devices_from_config",
+                          return_value=list(probed)), \
+                patch.object(qm_controller, "_probe_devices_on_host",
+                             return_value=probed), \
+                patch.object(qm_controller, "_nested_container_ids",
+                             return_value={}):
+            samples = self.samples(qm_controller.collect_metrics())
+
+        assert samples["qm_devices_configured"] == 2
+        assert samples['qm_devices{status="available"}'] == 1
+        assert samples['qm_devices{status="missing"}'] == 1
+        assert samples['qm_devices{status="mismatch"}'] == 0
+
+    def test_textfile_written_atomically(self, cgroups, controller,
+                                         tmp_path):
+        """Test the textfile is replaced without leftovers."""
+        textfile = tmp_path / "textfile" / "qm.prom"
+        textfile.parent.mkdir()
+        textfile.write_text("stale\n")
+
+        controller.export_metrics(textfile=str(textfile))
+
+        assert "qm_up 1" in textfile.read_text()
+        assert os.listdir(textfile.parent) == ["qm.prom"]
+
+    def test_http_listener(self, cgroups, controller):
+        """Test scrapes are answered in the negotiated format."""
+        import urllib.request
+
+        server = controller._metrics_server("127.0.0.1:0")
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            request = urllib.request.Request(
+                f"{url}/metrics",
+                headers={"Accept": "application/openmetrics-text"})
+            with urllib.request.urlopen(request) as response:
+                assert response.headers["Content-Type"] == \
+                    qmctl.OPENMETRICS_CONTENT_TYPE
+                assert response.read().endswith(b"# EOF\n")
+            with urllib.request.urlopen(f"{url}/metrics") as response:
+                assert response.headers["Content-Type"] == \
+                    qmctl.PROMETHEUS_CONTENT_TYPE
+            with pytest.raises(urllib.error.HTTPError) as exc_info:
+                urllib.request.urlopen(f"{url}/other")
+            assert exc_info.value.code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join(timeout=5)
+
+    @pytest.mark.parametrize("options", [
+        {"listen": "localhost:http"},
+        {"interval": 5},
+        {"textfile": "/tmp/qm.prom", "listen": "9883"},
+    ])
+    def test_invalid_options(self, qm_controller, options, capsys):
+        """Test invalid option combinations are rejected."""
+        with pytest.raises(SystemExit) as exc_info:
+            qm_controller.export_metrics(**options)
+        assert exc_info.value.code == QmError.EXIT_CODE_GENERAL_ERROR
+
+    def test_cli_options(self, qm_controller):
+        """Test metrics options are parsed and passed through."""
+        parser = create_argument_parser("Test")
+        qmctl.configure_subcommands(parser)
+        args = parser.parse_args(["metrics", "--listen"])
+
+        with patch.object(qm_controller, "export_metrics") as export:
+            args.func(args, qm_controller)
+        export.assert_called_once_with(listen=qmctl.METRICS_LISTEN)
+        assert qmctl.forward_to_server(["metrics", "--listen"]) is None
+
+    @pytest.mark.performance
+    def test_scrape_within_budget(self, fake_cgroup, controller):
+        """Measure warm scrapes of qm.service and many nested containers."""
+        fake_cgroup("qm.service")
+        for index in range(self.BENCHMARK_CONTAINERS):
+            fake_cgroup(f"qm.service/libpod-{index:064x}.scope",
+                        usage_usec=index)
+        controller.collect_metrics()  # Opens the files
+
+        timings = []
+        for _ in range(10):
+            start = time.perf_counter()
+            controller.collect_metrics()
+            timings.append(time.perf_counter() - start)
+
+        scrape_ms = statistics.median(timings) * 1000
+        print(f"{self.BENCHMARK_CONTAINERS} nested containers: scrape "
+              f"median {scrape_ms:.2f} ms")
+        assert scrape_ms < self.BENCHMARK_BUDGET_MS
+
+
+class TestContainerStateCache:
+    """Test the cross-invocation container state cache."""
+
+    def test_read_process_start_time(self):
+        """Test start time lookup for live and missing processes."""
+        assert isinstance(read_process_start_time(os.getpid()), int)
+        assert read_process_start_time(2 ** 22 + 1) is None
+
+    def test_put_get_roundtrip(self, isolated_state_cache):
+        """Test a live init PID keeps the entry valid."""
+        cache = ContainerStateCache()
+        stored = cache.put("qm", "abc123", os.getpid())
+
+        assert cache.cache_dir == str(isolated_state_cache)
+        assert cache.get("qm") == stored
+        assert stored["id"] == "abc123"
+
+    def test_get_rejects_reused_pid(self):
+        """Test a start time mismatch invalidates the entry."""
+        cache = ContainerStateCache()
+        cache.put("qm", "abc123", os.getpid())
+        path = cache._entry_path("qm")
+        with open(path) as f:
+            state = json.load(f)
+        state["start_time"] += 1
+        with open(path, "w") as f:
+            json.dump(state, f)
+
+        assert cache.get("qm") is None
+        assert not os.path.exists(path)
+
+    @pytest.mark.parametrize("mode, owner, link", [
+        (0o755, None, False),
+        (0o700, 65534, False),
+        (0o700, None, True),
+    ])
+    def test_untrusted_directory_disables_cache(
+        self, tmp_path, mode, owner, link
+    ):
+        """Test a shared, foreign or symlinked directory is never used."""
+        target = tmp_path / "planted"
+        target.mkdir()
+        os.chmod(target, mode)
+        if owner is not None:
+            os.chown(target, owner, owner)
+        cache_dir = tmp_path / "link" if link else target
+        if link:
+            cache_dir.symlink_to(target)
+        cache = ContainerStateCache(str(cache_dir))
+
+        assert not private_directory(str(cache_dir))
+        assert cache.write_json(cache.keyed_path("x", "y"), {"a": 1}) is False
+        assert cache.put("qm", "abc", os.getpid()) is None
+        assert cache.get("qm") is None
+        assert os.listdir(target) == []
+
+    def test_private_directory_created(self, tmp_path):
+        """Test missing directories are created with mode 0700."""
+        path = tmp_path / "qmctl-1000" / "qmctl"
+
+        assert private_directory(str(path))
+        assert oct(os.stat(path).st_mode & 0o777) == "0o700"
+
+    def test_container_exists_cache_hit(self, qm_controller):
+        """Test a valid cache entry skips podman entirely."""
+        ContainerStateCache().put("test-qm", "abc", os.getpid())
+        qm_controller._transport = Mock()
+
+        assert qm_controller._container_exists("test-qm") is True
+        qm_controller._transport.container_exists.assert_not_called()
+
+    def test_container_exists_cache_miss_populates(self, qm_controller):
+        """Test a miss inspects once and caches the result."""
+        transport = Mock()
+        transport.inspect.return_value = {
+            "Id": "abc", "State": {"Pid": os.getpid()}
+        }
+        qm_controller._transport = transport
+
+        assert qm_controller._container_exists("test-qm") is True
+        assert qm_controller._container_exists("test-qm") is True
+        assert qm_controller._container_state("test-qm")["id"] == "abc"
+        assert transport.inspect.call_count == 1
+        transport.container_exists.assert_not_called()
+
+    def test_container_exists_cache_miss_not_found(self, qm_controller):
+        """Test a miss on a missing container costs one inspect."""
+        transport = Mock()
+        transport.inspect.side_effect = ContainerNotFoundError("test-qm")
+        qm_controller._transport = transport
+
+        assert qm_controller._container_exists("test-qm") is False
+        assert transport.inspect.call_count == 1
+        transport.container_exists.assert_not_called()
+
+    def test_container_exists_without_cache(self, temp_config_file):
+        """Test --no-cache always asks podman."""
+        controller = QmController(
+            config_path=temp_config_file, container_name="test-qm",
+            use_cache=False
+        )
+        controller._transport = Mock()
+        controller._transport.container_exists.return_value = True
+
+        controller._container_exists("test-qm")
+        controller._container_exists("test-qm")
+
+        assert controller._transport.container_exists.call_count == 2
+        controller._transport.inspect.assert_not_called()
+
+
+class TestShowAll:
+    """Test concurrent gathering of `show all` topics."""
+
+    def test_gather_runs_concurrently(self, qm_controller):
+        """Test collectors overlap instead of running one by one."""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def collector(name):
+            def collect():
+                barrier.wait()  # Deadlocks unless all three run together
+                return {name: "ok"}
+            return collect
+
+        collectors = {name: collector(name) for name in ("a", "b", "c")}
+        results = qm_controller._gather(collectors, workers=3)
+
+        assert [topic for topic, _ in results] == ["a", "b", "c"]
+        assert results[1][1] == {"b": "ok"}
+
+    def test_gather_records_errors(self, qm_controller):
+        """Test a failing topic does not abort the others."""
+        def broken():
+            raise QmError("boom", QmError.EXIT_CODE_TEST_CUSTOM)
+
+        results = dict(qm_controller._gather(
+            {"bad": broken, "good": lambda: {"k": "v"}}
+        ))
+
+        assert isinstance(results["bad"], QmError)
+        assert results["good"] == {"k": "v"}
+
+    def test_show_all_json_merges_topics(self, qm_controller, capsys):
+        """Test --json produces one document keyed by topic in order."""
+        collectors = {
+            "container": lambda: {"path": "/x"},
+            "namespaces": lambda: {"Namespaces": "ns"},
+        }
+        with patch.object(
+            qm_controller, '_show_collectors', return_value=collectors
+        ):
+            qm_controller.show_all(output_json=True)
+
+        output = json.loads(capsys.readouterr().out)
+        assert list(output) == ["container", "namespaces"]
+        assert output["namespaces"] == {"Namespaces": "ns"}
+
+    def test_show_all_exits_with_first_failure(self, qm_controller, capsys):
+        """Test failures are reported after every topic is printed."""
+        def broken():
+            raise QmError("boom", QmError.EXIT_CODE_TEST_CUSTOM)
+
+        collectors = {"bad": broken, "good": lambda: "config text\n"}
+        with patch.object(
+            qm_controller, '_show_collectors', return_value=collectors
+        ):
+            with pytest.raises(SystemExit) as exc_info:
+                qm_controller.show_all()
+
+        captured = capsys.readouterr()
+        assert exc_info.value.code == QmError.EXIT_CODE_TEST_CUSTOM
+        assert "config text" in captured.out
+        assert "boom" in captured.err
+
+
+class TestPodmanTransport:
+    """Test the podman CLI and REST API transports."""
+
+    def test_select_transport_cli(self):
+        """Test that the CLI transport can be forced."""
+        transport = select_transport(Mock(), "cli")
+        assert isinstance(transport, CliTransport)
+
+    def test_select_transport_invalid_mode(self):
+        """Test that unknown transport modes are rejected."""
+        with pytest.raises(ValidationError):
+            select_transport(Mock(), "carrier-pigeon")
+
+    def test_select_transport_auto_fallback(self):
+        """Test auto mode falls back to the CLI without a socket."""
+        transport = select_transport(
+            Mock(), "auto", socket_path="/nonexistent/podman.sock"
+        )
+        assert isinstance(transport, CliTransport)
+
+    def test_select_transport_api_unreachable(self):
+        """Test api mode fails loudly without a socket."""
+        with pytest.raises(PodmanApiError):
+            select_transport(
+                Mock(), "api", socket_path="/nonexistent/podman.sock"
+            )
+
+    def test_select_transport_auto_uses_api(self, fake_podman_api):
+        """Test auto mode prefers a reachable API socket."""
+        _, socket_path = fake_podman_api
+        transport = select_transport(Mock(), "auto", socket_path=socket_path)
+        assert isinstance(transport, PodmanApiTransport)
+
+    def test_api_container_exists(self, fake_podman_api):
+        """Test container existence over the API."""
+        _, socket_path = fake_podman_api
+        transport = PodmanApiTransport(socket_path)
+        assert transport.container_exists("test-qm") is True
+        assert transport.container_exists("missing") is False
+
+    def test_api_inspect(self, fake_podman_api):
+        """Test container inspection over the API."""
+        _, socket_path = fake_podman_api
+        transport = PodmanApiTransport(socket_path)
+        assert transport.inspect("test-qm")["State"]["Pid"] == 42
+        with pytest.raises(ContainerNotFoundError):
+            transport.inspect("missing")
+
+    def test_api_exec_demultiplexes_streams(self, fake_podman_api):
+        """Test exec output is split into stdout and stderr."""
+        server, socket_path = fake_podman_api
+        server.exit_code = 3
+        transport = PodmanApiTransport(socket_path)
+        result = transport.exec("test-qm", ["echo", "hi"])
+        assert result.stdout == "echo hi\n"
+        assert result.stderr == "warning\n"
+        assert result.returncode == 3
+        assert server.commands == [["echo", "hi"]]
+
+    def test_api_connection_is_persistent(self, fake_podman_api):
+        """Test several operations share a single socket connection."""
+        server, socket_path = fake_podman_api
+        transport = PodmanApiTransport(socket_path)
+        transport.container_exists("test-qm")
+        transport.exec("test-qm", ["true"])
+        transport.inspect("test-qm")
+        assert server.connections == 1
+
+    def test_api_copy_roundtrip(self, fake_podman_api):
+        """Test copying a file into and out of a container."""
+        server, socket_path = fake_podman_api
+        transport = PodmanApiTransport(socket_path)
+        with tempfile.TemporaryDirectory() as workdir:
+            src = os.path.join(workdir, "in.txt")
+            with open(src, "w") as f:
+                f.write("payload")
+            result = transport.copy(src, "test-qm:/tmp/copied.txt")
+            assert result.returncode == 0
+            assert server.files["/tmp/copied.txt"] == b"payload"
+
+            dst = os.path.join(workdir, "out.txt")
+            result = transport.copy("test-qm:/tmp/copied.txt", dst)
+            assert result.returncode == 0
+            with open(dst) as f:
+                assert f.read() == "payload"
+
+    def test_controller_exec_over_api(
+        self, fake_podman_api, temp_config_file, capsys
+    ):
+        """Test QmController routes exec through the API transport."""
+        _, socket_path = fake_podman_api
+        controller = QmController(
+            config_path=temp_config_file, container_name="test-qm"
+        )
+        controller._transport = PodmanApiTransport(socket_path)
+        with patch('qmctl.qmctl.subprocess.run') as mock_run:
+            controller.exec_in_container(["hostname"])
+            mock_run.assert_not_called()
+        assert "hostname" in capsys.readouterr().out
+
+
 class TestCLICommands:
     """Test CLI command handling functions."""
 
@@ -452,6 +3208,21 @@ class TestCLICommands:
             handle_show_command(args, qm_controller)
             mock_show.assert_called_once_with(output_json=True, pretty=True)
 
+    def test_handle_show_command_device_details(self, qm_controller):
+        """Test --details is forwarded to available-devices."""
+        args = Mock(
+            show_command_topic='available-devices', json=True, details=True,
+            watch=False
+        )
+
+        with patch.object(
+            qm_controller, 'show_available_devices'
+        ) as mock_show:
+            handle_show_command(args, qm_controller)
+            mock_show.assert_called_once_with(
+                output_json=True, pretty=True, details=True
+            )
+
     def test_handle_exec_command(self, sample_cli_args, qm_controller):
         """Test exec command handling."""
         args = sample_cli_args['exec_ls']
@@ -535,6 +3306,59 @@ class TestArgumentParser:
         parsed_args = parser.parse_args(["-v", "show"])
         assert parsed_args.verbose is True
 
+    def test_selected_subcommand_builds_only_its_arguments(self):
+        """Unselected subcommands are registered by name only."""
+        parser = create_argument_parser("Test")
+        qmctl.configure_subcommands(parser, selected="show")
+
+        parsed_args = parser.parse_args(["show", "--json"])
+        assert parsed_args.json is True
+        with pytest.raises(SystemExit):
+            parser.parse_args(["exec", "--stream", "ls"])
+
+
+class TestStartupTime:
+    """Keep the import path of every invocation lean."""
+
+    # Modules imported on behalf of qmctl; its own compile time is excluded
+    # because it depends on whether bytecode can be cached.
+    DEPENDENCY_BUDGET_MS = 75
+    LAZY_MODULES = (
+        "concurrent.futures", "email", "http.client", "pty", "shutil",
+        "socket", "ssl", "tarfile", "tempfile", "urllib.parse",
+    )
+
+    @staticmethod
+    def _import_times():
+        """Return {module: (self_us, cumulative_us)} for a fresh import."""
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(
+            os.path.dirname(os.path.abspath(qmctl.__file__))
+        ))
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import qmctl.qmctl"],
+            env=env, capture_output=True, text=True, check=True
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+            if len(fields) == 3 and fields[1].isdigit():
+                own = int(fields[0].rpartition(" ")[2])
+                times.setdefault(fields[2], (own, int(fields[1])))
+        return times
+
+    def test_heavy_modules_not_imported(self):
+        """Modules needed by only some subcommands load on demand."""
+        times = self._import_times()
+        assert not [m for m in self.LAZY_MODULES if m in times]
+
+    @pytest.mark.performance
+    def test_import_within_budget(self):
+        """Importing qmctl's dependencies stays within the startup budget."""
+        own_us, cumulative_us = self._import_times()["qmctl.qmctl"]
+        dependencies_ms = (cumulative_us - own_us) / 1000
+        print(f"qmctl.qmctl dependencies {dependencies_ms:.1f} ms")
+        assert dependencies_ms < self.DEPENDENCY_BUDGET_MS
+
 
 class TestIntegration:
     """Integration tests for qmctl functionality."""
@@ -716,6 +3540,21 @@ class TestMainFunction:
                     main()
                 assert exec_info.value.code == errno.EINVAL
 
+    def test_completion_only_when_requested(self):
+        """Argcomplete runs only when the shell asks for completions."""
+        parser = create_argument_parser("Test")
+        with patch.dict(sys.modules, {"argcomplete": Mock()}) as modules:
+            with patch.dict(os.environ, clear=False) as env:
+                env.pop("_ARGCOMPLETE", None)
+                qmctl.enable_completion(parser)
+                modules["argcomplete"].autocomplete.assert_not_called()
+
+                env["_ARGCOMPLETE"] = "1"
+                qmctl.enable_completion(parser)
+                modules["argcomplete"].autocomplete.assert_called_once_with(
+                    parser
+                )
+
 
 @pytest.mark.parametrize(
     "device_results,expected_output",
@@ -755,5 +3594,6 @@ Type=notify
     assert "Container" in result
     assert "Service" in result
     assert result["Container"]["Image"] == "localhost/qm:latest"
-    assert result["Container"]["Volume"] == "/host:/container:rw"
+    assert result["Container"]["Volume"] == ["/host:/container:rw"]
+    assert result["Container"]["Environment"] == ["DISPLAY=:0"]
     assert result["Service"]["Restart"] == "always"